@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import curses
+import json
+import math
+import os
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import linuxlofi  # noqa: E402
+
+
+class VirtualWindow:
+    # Just enough of a curses window for Screen.flush(): writes land in a
+    # cell grid and are counted, nothing touches a terminal.
+    def __init__(self, h, w):
+        self.h = h
+        self.w = w
+        self.rows = [[" "] * w for _ in range(h)]
+        self.cursor = (0, 0)
+        self.addstr_calls = 0
+        self.chars_written = 0
+
+    def getmaxyx(self):
+        return self.h, self.w
+
+    def erase(self):
+        self.rows = [[" "] * self.w for _ in range(self.h)]
+
+    def move(self, y, x):
+        self.cursor = (y, x)
+
+    def clrtoeol(self):
+        y, x = self.cursor
+        self.rows[y][x:] = [" "] * (self.w - x)
+
+    def addstr(self, y, x, text, attr=0):
+        self.rows[y][x : x + len(text)] = text
+        self.addstr_calls += 1
+        self.chars_written += len(text)
+
+    def refresh(self):
+        pass
+
+
+def use_virtual_curses(h):
+    # The draw functions read curses.LINES and color pairs, which need a
+    # real terminal; point them at fixed values instead.
+    curses.LINES = h
+    curses.color_pair = lambda n: n << 8
+
+
+def frame_inputs(frame, cores):
+    levels = [0.5 + 0.45 * math.sin(frame * 0.7 + i) for i in range(8)]
+    usage = array("d", (0.5 + 0.5 * math.sin(frame * 0.3 + i * 0.11) for i in range(cores)))
+    rows = [
+        (str(1000 + i), "user", f"{(37 * (i + frame // 8)) % 100 / 3.0:.1f}", "0.4", f"proc-{i}")
+        for i in range(60)
+    ]
+    footer = f" cpu={20 + frame % 7:4.1f}% bpm={96 + math.sin(frame * 0.05):5.1f}  music=bench/synced "
+    return levels, usage, rows, footer
+
+
+def bench_frames(meters, h, w, cores=8, frames=200):
+    use_virtual_curses(h)
+    win = VirtualWindow(h, w)
+    screen = linuxlofi.Screen(win)
+    online = array("b", [1] * cores)
+    inputs = [frame_inputs(frame, cores) for frame in range(frames)]
+    t0 = time.process_time()
+    for levels, usage, rows, footer in inputs:
+        screen.erase()
+        if not screen.static_rows:
+            screen.static_rows = linuxlofi.draw_header(screen, w, "scifi")
+        if meters == "cores":
+            used = linuxlofi.draw_cores(screen, screen.static_rows, w, usage, online)
+        else:
+            used = linuxlofi.draw_bars(screen, screen.static_rows, w, levels)
+        linuxlofi.draw_process_table(screen, screen.static_rows + used + 1, w, rows)
+        screen.addstr(h - 1, 0, footer.ljust(w - 1), curses.color_pair(1))
+        screen.flush()
+    cpu = time.process_time() - t0
+    return {
+        "terminal": f"{w}x{h}",
+        "cores": cores,
+        "frame_ms": 1000.0 * cpu / frames,
+        "addstr_per_frame": win.addstr_calls / frames,
+        "chars_per_frame": win.chars_written / frames,
+    }
+
+
+def run(frames=200):
+    return {
+        "music_120x40": bench_frames("music", 40, 120, frames=frames),
+        "music_240x70": bench_frames("music", 70, 240, frames=frames),
+        "cores64_120x40": bench_frames("cores", 40, 120, cores=64, frames=frames),
+        "cores192_120x40": bench_frames("cores", 40, 120, cores=192, frames=frames),
+        "cores512_240x70": bench_frames("cores", 70, 240, cores=512, frames=frames),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import gpu  # noqa: E402
+
+FAKE_SMI = """#!/bin/sh
+# Stand-in for nvidia-smi: one CSV line per GPU, repeated for --loop-ms.
+loop=0
+for arg in "$@"; do
+  case "$arg" in --loop-ms=*) loop=1 ;; esac
+done
+while :; do
+  case "$1" in *index*) echo "0, 37, 2048, 8192"; echo "1, 55, 1024, 8192" ;; *) echo "37, 2048, 8192" ;; esac
+  [ "$loop" = 1 ] || exit 0
+  sleep 0.05
+done
+"""
+
+
+def make_sysfs(cards=2):
+    root = tempfile.mkdtemp(prefix="linuxlofi-fakedrm-")
+    for i in range(cards):
+        device = os.path.join(root, f"card{i}", "device")
+        os.makedirs(device)
+        for name, value in (
+            ("gpu_busy_percent", 20 + 30 * i),
+            ("mem_info_vram_used", (1 + i) << 30),
+            ("mem_info_vram_total", 8 << 30),
+        ):
+            with open(os.path.join(device, name), "w", encoding="utf-8") as f:
+                f.write(f"{value}\n")
+    # An Intel card without the amdgpu files must be ignored.
+    os.makedirs(os.path.join(root, f"card{cards}", "device"))
+    return root
+
+
+def make_smi():
+    root = tempfile.mkdtemp(prefix="linuxlofi-fakesmi-")
+    path = os.path.join(root, "nvidia-smi")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(FAKE_SMI)
+    os.chmod(path, 0o755)
+    return root, path
+
+
+def legacy_read(command):
+    # The old per-sample fork of `nvidia-smi --query-gpu=...`.
+    out = subprocess.check_output(
+        [command, "--query-gpu=utilization.gpu,memory.used,memory.total", "--format=csv,noheader,nounits"],
+        stderr=subprocess.DEVNULL,
+        timeout=0.35,
+        text=True,
+    ).strip()
+    gpu_s, used_s, total_s = [x.strip() for x in out.split(",")[:3]]
+    return float(gpu_s), 100.0 * float(used_s) / max(1.0, float(total_s))
+
+
+def measure(read, calls):
+    value = read()
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    for _ in range(calls):
+        read()
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    return {
+        "usec_per_sample": 1e6 * wall / calls,
+        "cpu_usec_per_sample": 1e6 * cpu / calls,
+        "value": value,
+    }
+
+
+def run(calls=2000):
+    results = {}
+    drm = make_sysfs()
+    smi_dir, smi = make_smi()
+    try:
+        sysfs = gpu.SysfsBackend(drm)
+        results["sysfs"] = measure(sysfs.read, calls)
+        results["sysfs"]["cards"] = len(sysfs.cards)
+        sysfs.close()
+
+        loop = gpu.SmiLoopBackend(50, command=smi)
+        deadline = time.monotonic() + 2.0
+        while loop.read() is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        results["nvidia_smi_loop"] = measure(loop.read, calls)
+        loop.close()
+
+        results["nvidia_smi_fork"] = measure(lambda: legacy_read(smi), max(1, calls // 100))
+        results["fork_vs_sysfs"] = (
+            results["nvidia_smi_fork"]["usec_per_sample"] / results["sysfs"]["usec_per_sample"]
+        )
+
+        try:
+            nvml = gpu.NvmlBackend()
+        except (OSError, AttributeError) as exc:
+            results["nvml"] = {"skipped": str(exc)}
+        else:
+            results["nvml"] = measure(nvml.read, calls)
+            nvml.close()
+        results["detected"] = gpu.open_backend().name
+    finally:
+        shutil.rmtree(drm, ignore_errors=True)
+        shutil.rmtree(smi_dir, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
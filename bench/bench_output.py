@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import alsa  # noqa: E402
+from audiofmt import AudioFormat  # noqa: E402
+from control import ControlServer  # noqa: E402
+from output import AudioWriter, PcmRing, block_bytes, lookahead_bytes  # noqa: E402
+from sinks import AlsaSink, FileSink, PlayerSink, TeeSink  # noqa: E402
+
+
+def bench_block(block_ms, fmt, seconds, tempo=96.0, extra_sinks=()):
+    # Pushes `seconds` of 16th-note steps through the ring and writer into a
+    # pipe and counts wakeups and state publishes per second of audio.
+    # `extra_sinks` are (kind, path) pairs teed off after the pipe.
+    step = max(256, int(fmt.rate * (60.0 / tempo / 4.0))) * fmt.frame_bytes
+    pcm = bytes(step)
+    block = block_bytes(block_ms, fmt.bytes_per_sec, fmt.frame_bytes)
+    ring = PcmRing(max(lookahead_bytes(300, fmt.bytes_per_sec), 2 * block))
+    # Stand-in player that reads as fast as the pipe delivers.
+    player = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    sink = PlayerSink(player, "cat", fmt, block)
+    if extra_sinks:
+        sink = TeeSink([sink] + [FileSink(path, fmt, 2 * block) for path in extra_sinks])
+    published = []
+    writer = AudioWriter(ring, sink, block, published.append)
+    writer.start()
+
+    total = int(fmt.bytes_per_sec * seconds)
+    c0 = time.process_time()
+    sent = 0
+    while sent < total:
+        ring.put(pcm, {})
+        sent += len(pcm)
+    ring.close()
+    writer.join()
+    cpu = time.process_time() - c0
+    stats = writer.buffer_stats()
+    sink.close()
+    player.wait()
+    audio_sec = sent / fmt.bytes_per_sec
+    return {
+        "block_ms": 1000.0 * block / fmt.bytes_per_sec,
+        "audio_sec": audio_sec,
+        "publishes_per_audio_sec": len(published) / audio_sec,
+        "wakeups_per_audio_sec": (writer.wakeups + ring.waits) / audio_sec,
+        "cpu_per_audio_sec": cpu / audio_sec,
+        "sink_drops": stats["sink_drops"],
+    }
+
+
+def bench_tee(fmt, seconds, block_ms=100):
+    # The pipe teed into /dev/null and a FIFO nobody reads: the FIFO fills,
+    # then drops blocks without slowing the pipe down.
+    tmp = tempfile.mkdtemp(prefix="linuxlofi-bench-output-")
+    fifo = os.path.join(tmp, "audio.fifo")
+    os.mkfifo(fifo)
+    try:
+        return bench_block(block_ms, fmt, seconds, extra_sinks=(os.devnull, fifo))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_alsa(fmt, seconds, block_ms=100):
+    # In-process writei into ALSA's "null" device, which takes audio as fast
+    # as it comes: the cost per second of audio without the player pipe.
+    if not alsa.available():
+        return {"skipped": "libasound not found"}
+    block = block_bytes(block_ms, fmt.bytes_per_sec, fmt.frame_bytes)
+    try:
+        sink = AlsaSink("null", fmt, block, 25)
+    except OSError as exc:
+        return {"skipped": str(exc)}
+    pcm = memoryview(bytes(block))
+    blocks = int(seconds * 1000 / block_ms)
+    c0 = time.process_time()
+    try:
+        for _ in range(blocks):
+            sink.write([pcm])
+    finally:
+        sink.close()
+    cpu = time.process_time() - c0
+    return {
+        "period_frames": sink.pcm.period,
+        "buffer_frames": sink.pcm.buffer,
+        "cpu_per_audio_sec": cpu / seconds,
+        "xruns": sink.drops,
+    }
+
+
+# Listen-along client: asks for audio and throws it away.
+LISTENER = """
+import socket, sys
+s = socket.socket(socket.AF_UNIX)
+s.connect(sys.argv[1])
+s.sendall(b"audio\\n")
+while s.recv(65536):
+    pass
+"""
+
+
+def bench_listeners(count, fmt, seconds, block_ms=100):
+    # Daemon-side cost of fanning `seconds` of blocks out to `count` audio
+    # listeners over the control socket, paced at 20x real time.
+    tmp = tempfile.mkdtemp(prefix="linuxlofi-bench-output-")
+    server = ControlServer(["bench"], os.path.join(tmp, "control.sock"), audio_format=fmt)
+    server.start()
+    procs = [subprocess.Popen([sys.executable, "-c", LISTENER, server.path]) for _ in range(count)]
+    try:
+        while server.listeners < count:
+            time.sleep(0.01)
+        block = bytes(block_bytes(block_ms, fmt.bytes_per_sec, fmt.frame_bytes))
+        blocks = int(seconds * 1000 / block_ms)
+        c0 = time.process_time()
+        for _ in range(blocks):
+            server.publish_pcm([memoryview(block)])
+            time.sleep(block_ms / 1000.0 / 20)
+        cpu = time.process_time() - c0
+        drops = sum(client.drops for client in server.clients.values())
+    finally:
+        server.stop()
+        server.join(timeout=1.0)
+        for proc in procs:
+            proc.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {"listeners": count, "cpu_per_audio_sec": cpu / seconds, "dropped_blocks": drops}
+
+
+def run(seconds=60.0):
+    fmt = AudioFormat(48000, 2, "f32")
+    results = {f"block_{ms}ms": bench_block(ms, fmt, seconds) for ms in (10, 50, 100, 250)}
+    results["tee_devnull_fifo"] = bench_tee(fmt, seconds)
+    results["alsa_null"] = bench_alsa(fmt, seconds)
+    for count in (0, 1, 8, 32):
+        results[f"listeners_{count}"] = bench_listeners(count, fmt, seconds)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
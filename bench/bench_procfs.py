@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import fractal_music  # noqa: E402
+import procfs  # noqa: E402
+
+
+def legacy_cpu_pair():
+    with open("/proc/stat", "r", encoding="utf-8") as f:
+        p = f.readline().split()[1:]
+    vals = [int(x) for x in p]
+    return sum(vals), vals[3] + vals[4]
+
+
+def legacy_ram_pct():
+    total = 1
+    avail = 0
+    with open("/proc/meminfo", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                total = int(line.split()[1])
+            elif line.startswith("MemAvailable:"):
+                avail = int(line.split()[1])
+    return 100.0 * max(0, total - avail) / max(1, total)
+
+
+def procfs_ram_pct():
+    total, avail = procfs.mem_totals()
+    return 100.0 * max(0, total - avail) / max(1, total)
+
+
+_opens = [0]
+
+
+def _audit(event, _args):
+    if event == "open":
+        _opens[0] += 1
+
+
+def read_syscalls():
+    with open("/proc/self/io", "rb") as f:
+        for line in f:
+            if line.startswith(b"syscr:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _raw(fn, calls):
+    fn()
+    opens0 = _opens[0]
+    reads0 = read_syscalls()
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    elapsed = time.perf_counter() - t0
+    return elapsed, read_syscalls() - reads0, _opens[0] - opens0
+
+
+def measure(fn, calls):
+    # Subtract the harness' own /proc/self/io reads using an empty callable.
+    _, base_reads, base_opens = _raw(lambda: None, 1)
+    elapsed, reads, opens = _raw(fn, calls)
+    return {
+        "usec_per_sample": 1e6 * elapsed / calls,
+        "read_syscalls_per_sample": (reads - base_reads) / calls,
+        "opens_per_sample": (opens - base_opens) / calls,
+    }
+
+
+def run(calls=20000):
+    if procfs.cpu_totals() is None:
+        return {"skipped": "procfs unavailable"}
+    sys.addaudithook(_audit)
+    results = {}
+    for name, fn in (
+        ("cpu_legacy", legacy_cpu_pair),
+        ("cpu_procfs", procfs.cpu_totals),
+        ("ram_legacy", legacy_ram_pct),
+        ("ram_procfs", procfs_ram_pct),
+        ("read_cpu_pair", fractal_music.read_cpu_pair),
+        ("read_ram_pct", fractal_music.read_ram_pct),
+    ):
+        results[name] = measure(fn, calls)
+    for kind in ("cpu", "ram"):
+        results[f"{kind}_speedup"] = (
+            results[f"{kind}_legacy"]["usec_per_sample"] / results[f"{kind}_procfs"]["usec_per_sample"]
+        )
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import linuxlofi  # noqa: E402
+import procfs  # noqa: E402
+
+STAT_TAIL = "0 0 0 0 0 0 20 0 1 0 {start} 123456789 {rss} 18446744073709551615 0 0 0 0 0 0 0 0 0 0 0 0 17 3 0 0 0 0 0"
+
+
+def write_pid(root, pid, ticks, start=100, rss=1000):
+    d = os.path.join(root, str(pid))
+    os.makedirs(d, exist_ok=True)
+    utime = ticks // 2
+    stime = ticks - utime
+    head = f"{pid} (worker {pid}) S 1 {pid} {pid} 0 -1 4194560 100 0 0 0 {utime} {stime} "
+    with open(os.path.join(d, "stat"), "w", encoding="utf-8") as f:
+        f.write(head + STAT_TAIL.format(start=start, rss=rss) + "\n")
+    with open(os.path.join(d, "status"), "w", encoding="utf-8") as f:
+        f.write(f"Name:\tworker\nState:\tS (sleeping)\nPid:\t{pid}\nUid:\t{os.getuid()}\t0\t0\t0\n")
+
+
+def write_uptime(root, uptime):
+    with open(os.path.join(root, "uptime"), "w", encoding="utf-8") as f:
+        f.write(f"{uptime:.2f} 0.00\n")
+
+
+def make_tree(count):
+    root = tempfile.mkdtemp(prefix="linuxlofi-fakeproc-")
+    with open(os.path.join(root, "stat"), "w", encoding="utf-8") as f:
+        f.write("cpu  1 0 1 100 0 0 0 0 0 0\n")
+    with open(os.path.join(root, "meminfo"), "w", encoding="utf-8") as f:
+        f.write("MemTotal:       16000000 kB\nMemAvailable:    8000000 kB\n")
+    write_uptime(root, 1000.0)
+    ticks = {}
+    for pid in range(1, count + 1):
+        ticks[pid] = random.randrange(0, 5000)
+        write_pid(root, pid, ticks[pid])
+    return root, ticks
+
+
+def churn(root, ticks, changed, uptime):
+    # Bump the jiffies of `changed` random processes and advance the clock.
+    for pid in random.sample(sorted(ticks), changed):
+        ticks[pid] += random.randrange(1, 50)
+        write_pid(root, pid, ticks[pid])
+    write_uptime(root, uptime)
+
+
+def bench_scanner(count, scans=20, changed_frac=0.05, limit=40):
+    random.seed(count)
+    root, ticks = make_tree(count)
+    scanner = procfs.ProcScanner(root)
+    try:
+        t0 = time.perf_counter()
+        scanner.scan(limit)
+        first = time.perf_counter() - t0
+        # One untimed refresh settles the lifetime-average CPU of every pid.
+        uptime = 1001.0
+        churn(root, ticks, max(1, int(count * changed_frac)), uptime)
+        scanner.scan(limit)
+        # Enough settling scans for the sleepers to go idle.
+        for _ in range(procfs.IDLE_SCANS + 1):
+            uptime += 1.0
+            churn(root, ticks, max(1, int(count * changed_frac)), uptime)
+            scanner.scan(limit)
+        total = 0.0
+        changed = 0
+        reads = 0
+        for _ in range(scans):
+            uptime += 1.0
+            churn(root, ticks, max(1, int(count * changed_frac)), uptime)
+            t0 = time.perf_counter()
+            scanner.scan(limit)
+            total += time.perf_counter() - t0
+            changed += scanner.changed
+            reads += scanner.reads
+        return {
+            "processes": count,
+            "changed_per_scan": changed / scans,
+            "reads_per_scan": reads / scans,
+            "first_scan_ms": 1000.0 * first,
+            "scan_ms": 1000.0 * total / scans,
+            "scan_us_per_process": 1e6 * total / scans / count,
+        }
+    finally:
+        scanner.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def bench_reader(count, calls=20, limit=40):
+    # linuxlofi.ProcessReader.top_processes as the TUI calls it: one refresh
+    # per PROC_REFRESH_SECONDS, cached top rows in between.
+    random.seed(count)
+    root, ticks = make_tree(count)
+    reader = linuxlofi.ProcessReader()
+    if reader.scanner is not None:
+        reader.scanner.close()
+    reader.scanner = procfs.ProcScanner(root)
+    try:
+        reader.top_processes(limit)
+        refresh = 0.0
+        for i in range(calls):
+            churn(root, ticks, max(1, count // 20), 1001.0 + i)
+            reader.last_fetch = 0.0
+            t0 = time.perf_counter()
+            reader.top_processes(limit)
+            refresh += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for _ in range(calls * 50):
+            reader.top_processes(limit)
+        cached = time.perf_counter() - t0
+        return {
+            "processes": count,
+            "refresh_ms": 1000.0 * refresh / calls,
+            "cached_us": 1e6 * cached / (calls * 50),
+        }
+    finally:
+        reader.scanner.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def bench_ps(runs=5):
+    cmd = ["ps", "-eo", "pid,user,pcpu,pmem,comm", "--sort=-pcpu", "--no-headers"]
+    if not shutil.which("ps"):
+        return {"skipped": "ps not found"}
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        subprocess.check_output(cmd, text=True, stderr=subprocess.DEVNULL)
+    pids = sum(1 for name in os.listdir("/proc") if name.isdigit())
+    return {"processes": pids, "scan_ms": 1000.0 * (time.perf_counter() - t0) / runs}
+
+
+def bench_live(runs=5):
+    scanner = procfs.ProcScanner()
+    if not scanner.available():
+        return {"skipped": "procfs unavailable"}
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        scanner.scan()
+    return {"scan_ms": 1000.0 * (time.perf_counter() - t0) / runs}
+
+
+def run(counts=(1000, 2500, 5000, 10000)):
+    results = {"ps_live": bench_ps(), "scanner_live": bench_live()}
+    for count in counts:
+        results[f"scanner_{count}"] = bench_scanner(count)
+        results[f"process_reader_{count}"] = bench_reader(count)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
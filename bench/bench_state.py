@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import fractal_music  # noqa: E402
+import linuxlofi  # noqa: E402
+from statechan import StateReader, StateWriter  # noqa: E402
+
+
+def make_payload(i):
+    return {
+        "ts": time.monotonic(),
+        "tempo": 90.0 + i % 10,
+        "cpu": 25.0,
+        "ram": 48.0,
+        "gpu": 12.0,
+        "vram": 30.0,
+        "preset": "Neon Drift",
+        "preset_index": 8,
+        "audio_backend": "bench",
+        "next_in": 120.0,
+        "tempo_bias": 0.0,
+        "paused": False,
+        "levels": [((i + k) % 10) / 10.0 for k in range(8)],
+        "drum_cache": {"hits": i, "misses": 3, "entries": 3},
+        "sampler_overruns": {"cpu": 0, "ram": 0, "gpu": 0},
+        "components": {"cpu_drive": 0.25, "ram_warmth": 0.48, "gpu_motion": 0.12, "vram_spark": 0.3},
+    }
+
+
+def round_trip(publish, reader, calls):
+    # Time from handing a payload to the daemon-side writer until the TUI
+    # reader has picked it up.
+    payloads = [make_payload(i) for i in range(calls)]
+    worst = 0.0
+    t0 = time.perf_counter()
+    for payload in payloads:
+        t1 = time.perf_counter()
+        publish(payload)
+        reader.read()
+        worst = max(worst, time.perf_counter() - t1)
+    total = time.perf_counter() - t0
+    return {"usec_per_round_trip": 1e6 * total / calls, "worst_usec": 1e6 * worst}
+
+
+def run(calls=5000):
+    tmp = tempfile.mkdtemp(prefix="linuxlofi-bench-state-")
+    results = {}
+    try:
+        writer = StateWriter(os.path.join(tmp, "state.bin"))
+        reader = linuxlofi.MusicStateReader()
+        reader.channel = StateReader(writer.path)
+        results["mmap_channel"] = round_trip(writer.write, reader, calls)
+        writer.close()
+
+        # The JSON file both sides used before the channel.
+        json_path = os.path.join(tmp, "state.json")
+        fractal_music.STATE_FILE = json_path
+        linuxlofi.STATE_FILE = json_path
+        reader = linuxlofi.MusicStateReader()
+        reader.channel = StateReader(os.path.join(tmp, "missing.bin"))
+        results["json_file"] = round_trip(fractal_music.write_state, reader, max(1, calls // 5))
+        results["speedup"] = (
+            results["json_file"]["usec_per_round_trip"] / results["mmap_channel"]["usec_per_round_trip"]
+        )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+import json
+import math
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import fractal_music  # noqa: E402
+import render  # noqa: E402
+import synth  # noqa: E402
+from fractal_music import SR, clamp, midi_to_hz, softclip  # noqa: E402
+
+
+def make_voices(step16, cpu=0.45, ram=0.6, gpu=0.3, vram=0.4):
+    chord_root = 49
+    key_note = chord_root + 7 if step16 % 2 == 0 else None
+    bass_hz = midi_to_hz(chord_root - 12)
+    kick = step16 % 4 == 0
+    snare = step16 % 8 == 4
+    hat = step16 % 2 == 1
+    return {
+        "bass_hz": bass_hz,
+        "sub_hz": bass_hz * 0.5,
+        "pad_hz": [midi_to_hz(chord_root), midi_to_hz(chord_root + 3), midi_to_hz(chord_root + 7)],
+        "key_hz": midi_to_hz(key_note) if key_note is not None else None,
+        "bass_gain": 0.12 + 0.14 * cpu,
+        "sub_gain": 0.08 + 0.12 * cpu,
+        "pad_gain": 0.05 + 0.12 * ram,
+        "pad_exp": 0.28 + 0.35 * (1.0 - ram),
+        "key_gain": 0.07 + 0.15 * gpu,
+        "kick_amp": (0.72 + 0.33 * cpu) if kick else 0.0,
+        "snare_amp": (0.20 + 0.22 * vram) if snare else 0.0,
+        "hat_amp": (0.10 + 0.30 * vram) if hat else 0.0,
+    }
+
+
+class LegacySynth:
+    # The original per-sample loop from fractal_music.main, kept as the reference.
+    def __init__(self, sr):
+        self.sr = sr
+        self.ph_bass = 0.0
+        self.ph_sub = 0.0
+        self.ph_pad = [0.0, 0.0, 0.0]
+        self.ph_key = 0.0
+
+    def render(self, n, v):
+        SR = self.sr
+        ph_pad = self.ph_pad
+        buf = bytearray()
+        for i in range(n):
+            g = i / n
+
+            self.ph_bass += (2.0 * math.pi * v["bass_hz"]) / SR
+            self.ph_sub += (2.0 * math.pi * v["sub_hz"]) / SR
+            bass_env = (1.0 - g) ** 1.08
+            bass = math.sin(self.ph_bass) * v["bass_gain"] * bass_env
+            sub = math.sin(self.ph_sub) * v["sub_gain"] * bass_env
+
+            pad = 0.0
+            pad_env = (1.0 - g) ** v["pad_exp"]
+            for j in range(3):
+                ph_pad[j] += (2.0 * math.pi * v["pad_hz"][j]) / SR
+                pad += math.sin(ph_pad[j])
+            pad = (pad / 3.0) * v["pad_gain"] * pad_env
+
+            key = 0.0
+            if v["key_hz"] is not None:
+                self.ph_key += (2.0 * math.pi * v["key_hz"]) / SR
+                key_env = (1.0 - g) ** 1.9
+                key = (math.sin(self.ph_key) + 0.45 * math.sin(self.ph_key * 2.0)) * v["key_gain"] * key_env
+
+            kick = 0.0
+            if v["kick_amp"]:
+                k_env = math.exp(-13.0 * g)
+                kf = 145.0 - 95.0 * g
+                kick = math.sin(2.0 * math.pi * kf * (i / SR)) * v["kick_amp"] * k_env
+
+            snare = 0.0
+            if v["snare_amp"]:
+                s_env = math.exp(-22.0 * g)
+                s1 = math.sin(2.0 * math.pi * 180.0 * (i / SR))
+                s2 = math.sin(2.0 * math.pi * 330.0 * (i / SR))
+                snare = (0.7 * s1 + 0.3 * s2) * v["snare_amp"] * s_env
+
+            hat = 0.0
+            if v["hat_amp"]:
+                h_env = math.exp(-56.0 * g)
+                h1 = math.sin(2.0 * math.pi * 5200.0 * (i / SR))
+                h2 = math.sin(2.0 * math.pi * 7200.0 * (i / SR))
+                hat = (0.65 * h1 + 0.35 * h2) * v["hat_amp"] * h_env
+
+            mix = bass + sub + pad + key + kick + snare + hat
+            mix = softclip(mix * 1.35) * 0.72
+            sample = int(clamp(mix, -1.0, 1.0) * 32767)
+            buf += struct.pack("<h", sample)
+        return bytes(buf)
+
+
+def render_steps(engine, steps, n):
+    out = []
+    for step in range(steps):
+        out.append(engine.render(n, make_voices(step % 16)))
+    return b"".join(out)
+
+
+def max_abs_diff(a, b):
+    sa = struct.unpack(f"<{len(a) // 2}h", a)
+    sb = struct.unpack(f"<{len(b) // 2}h", b)
+    return max(abs(x - y) for x, y in zip(sa, sb))
+
+
+def time_engine(engine, steps, n):
+    t0 = time.process_time()
+    render_steps(engine, steps, n)
+    cpu = time.process_time() - t0
+    audio_sec = steps * n / SR
+    return {
+        "cpu_sec": cpu,
+        "audio_sec": audio_sec,
+        "cpu_per_audio_sec": cpu / audio_sec,
+        "samples_per_cpu_sec": steps * n / max(1e-12, cpu),
+    }
+
+
+def time_pipeline(seconds=30.0):
+    # The whole step pipeline (presets, tempo, voices, synth) as the daemon
+    # runs it, on seeded synthetic metrics.
+    engine = fractal_music.Engine(SR, rng=random.Random(0))
+    metrics = render.SyntheticMetrics(0)
+    total = int(SR * seconds)
+    t0 = time.process_time()
+    while engine.frames < total:
+        t = engine.frames / SR
+        engine.render_step(t, metrics.at(t))
+    cpu = time.process_time() - t0
+    return {
+        "cpu_sec": cpu,
+        "audio_sec": engine.frames / SR,
+        "cpu_per_audio_sec": cpu / (engine.frames / SR),
+        "samples_per_cpu_sec": engine.frames / max(1e-12, cpu),
+        "steps": engine.step,
+    }
+
+
+# (rate, channels, sample) combinations the players negotiate.
+FORMATS = [(44100, 1, "s16"), (44100, 2, "s16"), (48000, 2, "s16"), (48000, 2, "f32")]
+
+
+def time_formats(steps, tempo, use_numpy):
+    # Synth cost per output format; steps are sized for each rate so every
+    # entry renders the same stretch of music.
+    out = {}
+    for rate, channels, sample in FORMATS:
+        n = max(256, int(rate * (60.0 / tempo / 4.0)))
+        engine = synth.BlockSynth(rate, use_numpy=use_numpy, channels=channels, sample=sample)
+        t0 = time.process_time()
+        render_steps(engine, steps, n)
+        cpu = time.process_time() - t0
+        audio_sec = steps * n / rate
+        out[f"{rate}_{channels}ch_{sample}"] = {
+            "cpu_per_audio_sec": cpu / audio_sec,
+            "frames_per_cpu_sec": steps * n / max(1e-12, cpu),
+        }
+    return out
+
+
+def run(steps=64, tempo=96.0):
+    n = max(256, int(SR * (60.0 / tempo / 4.0)))
+    engines = {"legacy": LegacySynth(SR), "array": synth.BlockSynth(SR, use_numpy=False)}
+    if synth.np is not None:
+        engines["numpy"] = synth.BlockSynth(SR, use_numpy=True)
+
+    reference = render_steps(LegacySynth(SR), 16, n)
+    results = {"samples_per_step": n, "steps": steps}
+    for name, engine in engines.items():
+        res = time_engine(engine, steps, n)
+        if name != "legacy":
+            fresh = synth.BlockSynth(SR, use_numpy=(name == "numpy"))
+            res["max_abs_diff_lsb"] = max_abs_diff(reference, render_steps(fresh, 16, n))
+            res["drum_cache"] = engine.drums.stats()
+            res["envelope_cache"] = engine.envelopes.stats()
+        results[name] = res
+    base = results["legacy"]["cpu_per_audio_sec"]
+    for name in engines:
+        results[name]["speedup"] = base / max(1e-12, results[name]["cpu_per_audio_sec"])
+    results["formats"] = {"array": time_formats(steps // 4, tempo, False)}
+    if synth.np is not None:
+        results["formats"]["numpy"] = time_formats(steps, tempo, True)
+    results["pipeline"] = time_pipeline()
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import curses
+import fcntl
+import json
+import math
+import os
+import pty
+import select
+import struct
+import sys
+import tempfile
+import termios
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+ROWS, COLS = 40, 120
+
+
+class CountingWindow:
+    # Forwards to a curses window and counts addstr calls, for the legacy
+    # erase-and-redraw path.
+    def __init__(self, win):
+        self.win = win
+        self.addstr_calls = 0
+
+    def addstr(self, *args):
+        self.addstr_calls += 1
+        try:
+            self.win.addstr(*args)
+        except curses.error:
+            pass
+
+
+def synthetic_inputs(frame, fps):
+    levels = [0.5 + 0.45 * math.sin(frame * 0.7 + i) for i in range(8)]
+    tick = int(frame / fps)
+    rows = [
+        (str(1000 + i), "user", f"{(37 * (i + tick)) % 100 / 3.0:.1f}", "0.4", f"proc-{i}")
+        for i in range(40)
+    ]
+    footer = f" cpu={20 + tick % 7:4.1f}% bpm={96 + math.sin(frame * 0.05):5.1f}  music=bench/synced "
+    return levels, rows, footer
+
+
+def child(stdscr, mode, fps, seconds, out_path):
+    import linuxlofi
+
+    linuxlofi.init_colors(stdscr, linuxlofi.PALETTES["scifi"])
+    screen = linuxlofi.Screen(stdscr)
+    legacy = CountingWindow(stdscr)
+    # BENCH_TRACE replays a recorded metrics trace through the music engine
+    # for the meter levels and footer instead of the synthetic sines.
+    trace = os.environ.get("BENCH_TRACE")
+    replay = linuxlofi.ReplayStateReader(trace, 1.0 / fps) if trace else None
+    frames = int(fps * seconds)
+    h, w = stdscr.getmaxyx()
+    t0 = time.process_time()
+    for frame in range(frames):
+        levels, rows, footer = synthetic_inputs(frame, fps)
+        if replay is not None:
+            levels, stats, _synced = replay.read()
+            footer = f" cpu={stats['cpu']:4.1f}% bpm={stats['tempo']:5.1f}  music=replay/synced "
+        if mode == "full":
+            stdscr.erase()
+            top = linuxlofi.draw_header(legacy, w, "scifi")
+            used = linuxlofi.draw_bars(legacy, top, w, levels)
+            linuxlofi.draw_process_table(legacy, top + used + 1, w, rows)
+            legacy.addstr(h - 1, 0, footer.ljust(w - 1), curses.color_pair(1))
+            stdscr.refresh()
+        else:
+            screen.erase()
+            if not screen.static_rows:
+                screen.static_rows = linuxlofi.draw_header(screen, w, "scifi")
+            used = linuxlofi.draw_bars(screen, screen.static_rows, w, levels)
+            linuxlofi.draw_process_table(screen, screen.static_rows + used + 1, w, rows)
+            screen.addstr(h - 1, 0, footer.ljust(w - 1), curses.color_pair(1))
+            screen.flush()
+        time.sleep(1.0 / fps)
+    cpu = time.process_time() - t0
+    calls = legacy.addstr_calls if mode == "full" else screen.addstr_calls
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"frames": frames, "addstr_calls": calls, "cpu_sec": cpu}, f)
+
+
+def measure(mode, fps, seconds):
+    fd_out, out_path = tempfile.mkstemp(prefix="linuxlofi-bench-tui-")
+    os.close(fd_out)
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.environ["TERM"] = os.environ.get("BENCH_TERM", "xterm-256color")
+        os.execv(sys.executable, [sys.executable, __file__, "--child", mode, str(fps), str(seconds), out_path])
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", ROWS, COLS, 0, 0))
+    total = 0
+    while True:
+        ready, _, _ = select.select([fd], [], [], 0.2)
+        if not ready:
+            if os.waitpid(pid, os.WNOHANG)[0]:
+                break
+            continue
+        try:
+            data = os.read(fd, 65536)
+        except OSError:
+            break
+        if not data:
+            break
+        total += len(data)
+    os.waitpid(pid, 0)
+    os.close(fd)
+    with open(out_path, encoding="utf-8") as f:
+        stats = json.load(f)
+    os.unlink(out_path)
+    return {
+        "bytes_per_sec": total / seconds,
+        "addstr_per_frame": stats["addstr_calls"] / max(1, stats["frames"]),
+        "cpu_ms_per_frame": 1000.0 * stats["cpu_sec"] / max(1, stats["frames"]),
+    }
+
+
+def run(fps=8, seconds=3.0):
+    results = {"fps": fps, "terminal": f"{COLS}x{ROWS}", "trace": os.environ.get("BENCH_TRACE")}
+    for mode in ("full", "diff"):
+        results[mode] = measure(mode, fps, seconds)
+    results["bytes_ratio"] = results["diff"]["bytes_per_sec"] / max(1.0, results["full"]["bytes_per_sec"])
+    results["cpu_ratio"] = results["diff"]["cpu_ms_per_frame"] / max(1e-9, results["full"]["cpu_ms_per_frame"])
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _, _, mode, fps, seconds, out_path = sys.argv
+        curses.wrapper(child, mode, int(fps), float(seconds), out_path)
+    else:
+        print(json.dumps(run(), indent=2))
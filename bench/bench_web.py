@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from webserver import MAX_HEADER, WebServer  # noqa: E402
+
+
+def start_server():
+    # The server on its own loop and thread, like a separate process would be.
+    server = WebServer()
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(
+        asyncio.start_server(server.handle, "127.0.0.1", 0, limit=MAX_HEADER, backlog=512)
+    )
+    port = listener.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    return server, loop, listener, port
+
+
+async def shutdown(listener):
+    listener.close()
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def client(port, path, requests, headers):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = f"GET {path} HTTP/1.1\r\nHost: bench\r\n{headers}\r\n".encode("latin-1")
+    received = 0
+    for _ in range(requests):
+        writer.write(request)
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int(head.split(b"Content-Length: ", 1)[1].split(b"\r\n", 1)[0])
+        received += len(head) + len(await reader.readexactly(length))
+    writer.close()
+    await writer.wait_closed()
+    return received
+
+
+def bench_path(port, path, clients, requests, headers=""):
+    # `clients` keep-alive connections, each making `requests` requests.
+    async def all_clients():
+        return await asyncio.gather(*(client(port, path, requests, headers) for _ in range(clients)))
+
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    received = sum(asyncio.run(all_clients()))
+    cpu = time.process_time() - c0
+    wall = time.perf_counter() - t0
+    total = clients * requests
+    return {
+        "clients": clients,
+        "requests": total,
+        "requests_per_sec": total / wall,
+        "cpu_usec_per_request": 1e6 * cpu / total,
+        "bytes_per_request": received / total,
+    }
+
+
+async def subscriber(port, frames, delay, counts):
+    # Slow subscribers also get small receive buffers, like a client on a
+    # slow link, so the frames they can't take stay on the server side.
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=4096 if delay else 65536)
+    if delay:
+        writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    writer.write(b"GET /api/stream HTTP/1.1\r\nHost: bench\r\n\r\n")
+    received = 0
+    try:
+        while True:
+            line = await reader.readline()
+            if not line or line.startswith(b"data: end"):
+                break
+            if line.startswith(b"data: "):
+                received += 1
+                if delay:
+                    await asyncio.sleep(delay)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    counts.append(received)
+
+
+def bench_stream(server, loop, port, clients, frames=300, rate=200.0, slow=10):
+    # `clients` SSE subscribers, `slow` of which take 50 ms per frame, fed
+    # `frames` updates at `rate` per second. Slow clients should receive
+    # fewer frames rather than pile them up.
+    async def all_clients():
+        fast, lagging = [], []
+        tasks = [subscriber(port, frames, 0.0, fast) for _ in range(clients - slow)]
+        tasks += [subscriber(port, frames, 0.05, lagging) for _ in range(slow)]
+        return fast, lagging, await asyncio.gather(publisher(), *tasks)
+
+    async def publisher():
+        await asyncio.sleep(0.5)
+        # About the size of a daemon state line.
+        payload = json.dumps({"levels": [0.5] * 8, "tempo": 96.0, "pad": "x" * 900}).encode()
+        for _ in range(frames):
+            asyncio.run_coroutine_threadsafe(server.hub.publish(payload), loop).result()
+            await asyncio.sleep(1.0 / rate)
+        await asyncio.sleep(0.5)
+        asyncio.run_coroutine_threadsafe(server.hub.publish(b"end"), loop).result()
+
+    c0 = time.process_time()
+    fast, lagging, _ = asyncio.run(all_clients())
+    cpu = time.process_time() - c0
+    # One more frame lets the server notice the closed streams.
+    asyncio.run_coroutine_threadsafe(server.hub.publish(b"end"), loop).result()
+    time.sleep(0.2)
+    return {
+        "clients": clients,
+        "frames": frames,
+        "cpu_usec_per_frame_per_client": 1e6 * cpu / (frames * clients),
+        "fast_client_frames_min": min(fast),
+        "slow_client_frames_max": max(lagging),
+    }
+
+
+def run(clients=200, requests=25):
+    server, loop, listener, port = start_server()
+
+    async def no_feed():
+        await asyncio.Event().wait()
+
+    # Frames come from the bench instead of the daemon socket.
+    server.hub.run = no_feed
+    try:
+        return {
+            "api_metrics": bench_path(port, "/api/metrics", clients, requests),
+            "app_js_gzip": bench_path(port, "/app.js", clients, requests, "Accept-Encoding: gzip\r\n"),
+            "app_js_plain": bench_path(port, "/app.js", clients // 4, requests),
+            "stream": bench_stream(server, loop, port, clients),
+        }
+    finally:
+        asyncio.run_coroutine_threadsafe(shutdown(listener), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        server.metrics.close()
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
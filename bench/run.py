@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import traceback
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+# name -> module; each module has run() returning a JSON-able dict.
+SUITES = {
+    "synth": "bench_synth",
+    "procfs": "bench_procfs",
+    "gpu": "bench_gpu",
+    "state": "bench_state",
+    "output": "bench_output",
+    "web": "bench_web",
+    "proctable": "bench_proctable",
+    "draw": "bench_draw",
+    "tui": "bench_tui",
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "-C", HERE, "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def numeric_leaves(data, prefix=""):
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from numeric_leaves(value, f"{prefix}{key}.")
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix[:-1], float(data)
+
+
+def compare(base, current):
+    # Relative change of every numeric result present in both runs.
+    old = dict(numeric_leaves(base.get("results", {})))
+    out = {}
+    for key, value in numeric_leaves(current.get("results", {})):
+        if key in old and old[key]:
+            out[key] = round(value / old[key] - 1.0, 4)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="run the linuxlofi benchmarks and print JSON")
+    parser.add_argument("suites", nargs="*", help="suites to run: " + ", ".join(SUITES) + " (default: all)")
+    parser.add_argument("-o", "--output", help="also write the results to this file")
+    parser.add_argument("--compare", metavar="JSON", help="add relative changes against an earlier run")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        parser.error("unknown suite: " + ", ".join(unknown))
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "started": time.time(),
+        "results": {},
+    }
+    for name in args.suites or SUITES:
+        print(f"[bench] {name}", file=sys.stderr)
+        t0 = time.perf_counter()
+        try:
+            result = importlib.import_module(SUITES[name]).run()
+        except Exception as exc:
+            traceback.print_exc()
+            result = {"error": f"{type(exc).__name__}: {exc}"}
+        result["wall_sec"] = time.perf_counter() - t0
+        report["results"][name] = result
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        report["compare"] = {"base_commit": base.get("commit"), "changes": compare(base, report)}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0 if all("error" not in r for r in report["results"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
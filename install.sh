@@ -26,8 +26,14 @@ need_cmd() {
   }
 }
 
+has_libasound() {
+  # The daemon plays in-process through libasound when it can load it.
+  ldconfig -p 2>/dev/null | grep -q 'libasound\.so\.2'
+}
+
 has_audio_backend() {
-  command -v pw-play >/dev/null 2>&1 \
+  has_libasound \
+    || command -v pw-play >/dev/null 2>&1 \
     || command -v aplay >/dev/null 2>&1 \
     || command -v ffplay >/dev/null 2>&1 \
     || command -v mpv >/dev/null 2>&1
@@ -59,7 +65,10 @@ install_missing_deps() {
   command -v curl >/dev/null 2>&1 || need_curl=1
   has_audio_backend || need_audio=1
 
-  if [ "$need_python" -eq 0 ] && [ "$need_tar" -eq 0 ] && [ "$need_curl" -eq 0 ] && [ "$need_audio" -eq 0 ]; then
+  # Audio is optional (the daemon runs silent without it), so it never
+  # triggers an install on its own; it rides along when something else is
+  # being installed anyway.
+  if [ "$need_python" -eq 0 ] && [ "$need_tar" -eq 0 ] && [ "$need_curl" -eq 0 ]; then
     return
   fi
 
@@ -136,7 +145,7 @@ install_missing_deps() {
   fi
 
   echo "[linuxlofi] couldn't auto-install dependencies (unsupported package manager)." >&2
-  echo "[linuxlofi] please install: python3, tar, curl, and one of pw-play/aplay/ffplay/mpv" >&2
+  echo "[linuxlofi] please install: python3, tar and curl (plus one of pw-play/aplay/ffplay/mpv for sound)" >&2
   exit 1
 }
 
@@ -150,14 +159,15 @@ if ! command -v python3 >/dev/null 2>&1 && ! command -v python >/dev/null 2>&1;
 fi
 
 if ! has_audio_backend; then
-  echo "[linuxlofi] no supported audio backend found." >&2
-  echo "[linuxlofi] install one of: pw-play, aplay, ffplay, mpv" >&2
+  # Not fatal: the daemon falls back to the null sink and still publishes
+  # state and levels, which is all headless hosts need.
+  echo "[linuxlofi] warning: no supported audio backend found; music will run silent." >&2
+  echo "[linuxlofi] for sound install libasound or one of: pw-play, aplay, ffplay, mpv" >&2
   if [ -n "${TERMUX_VERSION:-}" ] || [ -n "${PREFIX:-}" ] && [ "${PREFIX#*com.termux}" != "$PREFIX" ]; then
     echo "[linuxlofi] Termux tip: pkg install mpv" >&2
   else
     echo "[linuxlofi] Linux/macOS tip: install ffmpeg (ffplay) or mpv" >&2
   fi
-  exit 1
 fi
 
 ARCHIVE_URL="$REPO_URL/archive/refs/heads/$BRANCH.tar.gz"
@@ -220,6 +230,18 @@ if [ -z "\$PYTHON_BIN" ]; then
   exit 1
 fi
 
+# With arguments, talk to the running daemon over its control socket:
+#   linuxlofi-music next|prev|pause|status|subscribe|audio|set-preset N|set-tempo-bias BPM
+# or render offline without touching the daemon:
+#   linuxlofi-music render out.wav [--duration SEC] [--seed N] [--trace FILE] [--format RATE:CH:SAMPLE]
+if [ "\${1:-}" = "render" ]; then
+  shift
+  exec "\$PYTHON_BIN" "\$SCRIPT" --render "\$@"
+fi
+if [ "\$#" -gt 0 ]; then
+  exec "\$PYTHON_BIN" "\$APP_DIR/src/control.py" "\$@"
+fi
+
 if [ -f "\$PIDFILE" ]; then
   PID="\$(cat "\$PIDFILE" 2>/dev/null || true)"
   if [ -n "\$PID" ] && kill -0 "\$PID" 2>/dev/null; then
@@ -250,8 +272,7 @@ if [ -z "\$PYTHON_BIN" ]; then
   echo "[linuxlofi] python3/python not found" >&2
   exit 1
 fi
-cd "\$APP_DIR/webui"
-exec "\$PYTHON_BIN" -m http.server "\$PORT" --bind 127.0.0.1
+exec "\$PYTHON_BIN" "\$APP_DIR/src/webserver.py" "\$PORT" --root "\$APP_DIR/webui"
 EOF
 
 chmod +x "$BIN_DIR/linuxlofi" "$BIN_DIR/linuxlofi-music" "$BIN_DIR/linuxlofi-webui"
@@ -0,0 +1,163 @@
+import ctypes
+import ctypes.util
+
+SND_PCM_STREAM_PLAYBACK = 0
+SND_PCM_ACCESS_RW_INTERLEAVED = 3
+# SND_PCM_FORMAT_S16_LE and SND_PCM_FORMAT_FLOAT_LE.
+SND_PCM_FORMATS = {"s16": 2, "f32": 14}
+
+_uframes = ctypes.c_ulong
+_sframes = ctypes.c_long
+_lib = None
+
+
+def _load():
+    # libasound with the prototypes used below, loaded once. Raises OSError
+    # when it isn't installed.
+    global _lib
+    if _lib is not None:
+        return _lib
+    lib = ctypes.CDLL(ctypes.util.find_library("asound") or "libasound.so.2")
+    vp = ctypes.c_void_p
+    protos = {
+        "snd_pcm_open": (ctypes.c_int, [ctypes.POINTER(vp), ctypes.c_char_p, ctypes.c_int, ctypes.c_int]),
+        "snd_pcm_close": (ctypes.c_int, [vp]),
+        "snd_pcm_drop": (ctypes.c_int, [vp]),
+        "snd_pcm_recover": (ctypes.c_int, [vp, ctypes.c_int, ctypes.c_int]),
+        "snd_pcm_writei": (_sframes, [vp, vp, _uframes]),
+        "snd_pcm_avail_update": (_sframes, [vp]),
+        "snd_pcm_delay": (ctypes.c_int, [vp, ctypes.POINTER(_sframes)]),
+        "snd_pcm_hw_params_malloc": (ctypes.c_int, [ctypes.POINTER(vp)]),
+        "snd_pcm_hw_params_free": (None, [vp]),
+        "snd_pcm_hw_params_any": (ctypes.c_int, [vp, vp]),
+        "snd_pcm_hw_params_set_access": (ctypes.c_int, [vp, vp, ctypes.c_int]),
+        "snd_pcm_hw_params_set_format": (ctypes.c_int, [vp, vp, ctypes.c_int]),
+        "snd_pcm_hw_params_set_channels": (ctypes.c_int, [vp, vp, ctypes.c_uint]),
+        "snd_pcm_hw_params_set_rate_near": (
+            ctypes.c_int, [vp, vp, ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(ctypes.c_int)]
+        ),
+        "snd_pcm_hw_params_set_period_size_near": (
+            ctypes.c_int, [vp, vp, ctypes.POINTER(_uframes), ctypes.POINTER(ctypes.c_int)]
+        ),
+        "snd_pcm_hw_params_set_buffer_size_near": (ctypes.c_int, [vp, vp, ctypes.POINTER(_uframes)]),
+        "snd_pcm_hw_params": (ctypes.c_int, [vp, vp]),
+        "snd_pcm_sw_params_malloc": (ctypes.c_int, [ctypes.POINTER(vp)]),
+        "snd_pcm_sw_params_free": (None, [vp]),
+        "snd_pcm_sw_params_current": (ctypes.c_int, [vp, vp]),
+        "snd_pcm_sw_params_set_start_threshold": (ctypes.c_int, [vp, vp, _uframes]),
+        "snd_pcm_sw_params_set_avail_min": (ctypes.c_int, [vp, vp, _uframes]),
+        "snd_pcm_sw_params": (ctypes.c_int, [vp, vp]),
+        "snd_strerror": (ctypes.c_char_p, [ctypes.c_int]),
+    }
+    for name, (restype, argtypes) in protos.items():
+        func = getattr(lib, name)
+        func.restype = restype
+        func.argtypes = argtypes
+    _lib = lib
+    return lib
+
+
+def available():
+    try:
+        _load()
+    except OSError:
+        return False
+    return True
+
+
+# One interleaved playback PCM opened through libasound, with the period
+# and buffer sizes (in frames) asked for up front. The device may round
+# them and the rate; the values in effect are in .rate, .period and
+# .buffer. Errors come out as OSError with the ALSA message.
+class AlsaPcm:
+    def __init__(self, device, fmt, period_frames, buffer_frames):
+        self.lib = _load()
+        self.frame_bytes = fmt.frame_bytes
+        self.handle = ctypes.c_void_p()
+        self._check(
+            self.lib.snd_pcm_open(ctypes.byref(self.handle), device.encode(), SND_PCM_STREAM_PLAYBACK, 0),
+            f"open {device}",
+        )
+        try:
+            self._configure(fmt, period_frames, buffer_frames)
+        except OSError:
+            self.close()
+            raise
+        self.delay_frames = _sframes()
+
+    def _check(self, ret, what):
+        if ret < 0:
+            raise OSError(-ret, f"alsa {what}: {self.lib.snd_strerror(ret).decode(errors='replace')}")
+        return ret
+
+    def _configure(self, fmt, period_frames, buffer_frames):
+        lib, pcm = self.lib, self.handle
+        hw = ctypes.c_void_p()
+        self._check(lib.snd_pcm_hw_params_malloc(ctypes.byref(hw)), "hw params")
+        try:
+            self._check(lib.snd_pcm_hw_params_any(pcm, hw), "hw params")
+            self._check(lib.snd_pcm_hw_params_set_access(pcm, hw, SND_PCM_ACCESS_RW_INTERLEAVED), "access")
+            self._check(lib.snd_pcm_hw_params_set_format(pcm, hw, SND_PCM_FORMATS[fmt.sample]), fmt.sample)
+            self._check(lib.snd_pcm_hw_params_set_channels(pcm, hw, fmt.channels), f"{fmt.channels} channels")
+            rate = ctypes.c_uint(fmt.rate)
+            period = _uframes(period_frames)
+            buffer = _uframes(max(buffer_frames, 2 * period_frames))
+            direction = ctypes.c_int(0)
+            self._check(
+                lib.snd_pcm_hw_params_set_rate_near(pcm, hw, ctypes.byref(rate), ctypes.byref(direction)), "rate"
+            )
+            self._check(
+                lib.snd_pcm_hw_params_set_period_size_near(pcm, hw, ctypes.byref(period), ctypes.byref(direction)),
+                "period size",
+            )
+            self._check(lib.snd_pcm_hw_params_set_buffer_size_near(pcm, hw, ctypes.byref(buffer)), "buffer size")
+            self._check(lib.snd_pcm_hw_params(pcm, hw), "hw params")
+        finally:
+            lib.snd_pcm_hw_params_free(hw)
+        self.rate, self.period, self.buffer = rate.value, period.value, buffer.value
+
+        # Start once half the buffer is queued; wake writers a period at a
+        # time.
+        sw = ctypes.c_void_p()
+        self._check(lib.snd_pcm_sw_params_malloc(ctypes.byref(sw)), "sw params")
+        try:
+            self._check(lib.snd_pcm_sw_params_current(pcm, sw), "sw params")
+            self._check(lib.snd_pcm_sw_params_set_start_threshold(pcm, sw, self.buffer // 2), "start threshold")
+            self._check(lib.snd_pcm_sw_params_set_avail_min(pcm, sw, self.period), "avail min")
+            self._check(lib.snd_pcm_sw_params(pcm, sw), "sw params")
+        finally:
+            lib.snd_pcm_sw_params_free(sw)
+
+    def write(self, address, frames):
+        # Blocks until all frames are queued. Returns the number of xruns
+        # recovered from on the way.
+        xruns = 0
+        while frames > 0:
+            ret = self.lib.snd_pcm_writei(self.handle, address, frames)
+            if ret < 0:
+                self._check(self.lib.snd_pcm_recover(self.handle, ret, 1), "recover")
+                xruns += 1
+                continue
+            frames -= ret
+            address += ret * self.frame_bytes
+        return xruns
+
+    def avail(self):
+        # Frames that can be written without blocking.
+        ret = self.lib.snd_pcm_avail_update(self.handle)
+        if ret < 0:
+            self._check(self.lib.snd_pcm_recover(self.handle, ret, 1), "recover")
+            return self.buffer
+        return ret
+
+    def delay(self):
+        # Frames between the next frame written and the speaker.
+        if self.lib.snd_pcm_delay(self.handle, ctypes.byref(self.delay_frames)) < 0:
+            return 0
+        return max(0, self.delay_frames.value)
+
+    def close(self):
+        if self.handle:
+            self.lib.snd_pcm_drop(self.handle)
+            self.lib.snd_pcm_close(self.handle)
+            self.handle = ctypes.c_void_p()
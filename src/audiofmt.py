@@ -0,0 +1,58 @@
+import os
+from collections import namedtuple
+
+SAMPLE_BYTES = {"s16": 2, "f32": 4}
+
+
+class AudioFormat(namedtuple("AudioFormat", "rate channels sample")):
+    __slots__ = ()
+
+    @property
+    def frame_bytes(self):
+        return self.channels * SAMPLE_BYTES[self.sample]
+
+    @property
+    def bytes_per_sec(self):
+        return self.rate * self.frame_bytes
+
+    def label(self):
+        return f"{self.rate}/{self.channels}/{self.sample}"
+
+
+def parse_format(spec):
+    # "RATE:CHANNELS:SAMPLE" with any part left empty, e.g. "48000",
+    # "::f32" or "44100:1:s16". Returns only the fields that were given.
+    out = {}
+    parts = (spec or "").strip().lower().split(":")
+    if len(parts) > 3:
+        raise ValueError(f"bad audio format {spec!r}, expected RATE:CHANNELS:SAMPLE")
+    rate, channels, sample = parts + [""] * (3 - len(parts))
+    if rate:
+        out["rate"] = int(rate)
+        if not 8000 <= out["rate"] <= 192000:
+            raise ValueError(f"unsupported sample rate {rate}")
+    if channels:
+        out["channels"] = int(channels)
+        if out["channels"] not in (1, 2):
+            raise ValueError("channels must be 1 or 2")
+    if sample:
+        if sample not in SAMPLE_BYTES:
+            raise ValueError(f"sample format must be one of {', '.join(SAMPLE_BYTES)}")
+        out["sample"] = sample
+    return out
+
+
+def format_overrides(cli_spec=None):
+    # CLI wins over LINUXLOFI_AUDIO_FORMAT.
+    env = parse_format(os.environ.get("LINUXLOFI_AUDIO_FORMAT", ""))
+    env.update(parse_format(cli_spec))
+    return env
+
+
+def negotiate(preferred, overrides, samples=tuple(SAMPLE_BYTES)):
+    # The backend's preferred format with any overrides applied; None when
+    # the backend can't take the requested sample format.
+    fmt = preferred._replace(**overrides)
+    if fmt.sample not in samples:
+        return None
+    return fmt
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+import json
+import os
+import selectors
+import socket
+import sys
+import threading
+from collections import deque
+
+from statechan import runtime_dir
+
+SOCKET_NAME = "linuxlofi-control.sock"
+MAX_LINE = 1024
+MAX_OUT = 64 * 1024
+AUDIO_RING_SECONDS = 0.5
+MAX_SEND_BUFFERS = 64
+COMMANDS = ("next", "prev", "set-preset", "set-tempo-bias", "pause", "status", "subscribe", "audio")
+
+
+def socket_path():
+    return os.path.join(runtime_dir(), SOCKET_NAME)
+
+
+class _Client:
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = b""
+        self.outbuf = b""
+        self.subscribed = False
+        # Audio listeners: a ring of PCM blocks waiting to be sent.
+        self.audio = False
+        self.pcm = deque()
+        self.pcm_bytes = 0
+        self.drops = 0
+
+
+# Line-based control socket for the music daemon. All socket work happens on
+# the server's own thread; parsed commands are queued on `commands` and the
+# audio loop drains that deque between steps without blocking.
+#
+# Protocol, one command per line:
+#   next | prev | set-preset <index|name> | set-tempo-bias <bpm>
+#   pause [on|off|toggle] | status | subscribe | audio
+# Replies are "ok", "ok <json>" for status, or "err <reason>". After
+# "subscribe" the connection receives one JSON state line per update; a
+# subscriber that can't keep up skips frames instead of queueing them.
+# After "audio" it gets "ok <json format>" and then the raw PCM the player
+# is fed. Every listener is sent the same blocks from its own ring of
+# AUDIO_RING_SECONDS; a listener that falls behind loses its oldest blocks.
+class ControlServer(threading.Thread):
+    def __init__(self, preset_names, path=None, audio_format=None):
+        super().__init__(name="linuxlofi-control", daemon=True)
+        self.path = path or socket_path()
+        self.preset_names = [name.lower() for name in preset_names]
+        self.audio_format = audio_format
+        self.commands = deque()
+        self.latest = None
+        self.latest_line = None
+        self.pcm_pending = deque()
+        self.listeners = 0
+        self.running = True
+        self.sel = selectors.DefaultSelector()
+        self.clients = {}
+
+        self.listener = self._bind()
+        self.listener.setblocking(False)
+        self.sel.register(self.listener, selectors.EVENT_READ, None)
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.sel.register(self.wake_r, selectors.EVENT_READ, None)
+
+    def _bind(self):
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                probe.close()
+                raise RuntimeError(f"control socket {self.path} is in use by another daemon")
+            finally:
+                probe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        sock.listen(8)
+        return sock
+
+    def publish(self, payload):
+        # Called from the writer thread; serialization happens lazily on the
+        # server thread, once per update.
+        self.latest = payload
+        try:
+            self.wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def publish_pcm(self, views):
+        # Called from the writer thread after each block. Nothing is copied
+        # unless someone is listening; then the block is joined once and
+        # shared by every listener.
+        if not self.listeners:
+            return
+        self.pcm_pending.append(b"".join(views))
+        try:
+            self.wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def stop(self):
+        self.running = False
+        try:
+            self.wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def run(self):
+        try:
+            while self.running:
+                for key, events in self.sel.select(timeout=1.0):
+                    if key.fileobj is self.listener:
+                        self._accept()
+                    elif key.fileobj is self.wake_r:
+                        self._drain_wakeups()
+                    else:
+                        client = key.data
+                        if events & selectors.EVENT_READ:
+                            self._read(client)
+                        if events & selectors.EVENT_WRITE and client.sock in self.clients:
+                            self._flush(client)
+        finally:
+            self._close_all()
+
+    def _accept(self):
+        try:
+            sock, _addr = self.listener.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        client = _Client(sock)
+        self.clients[sock] = client
+        self.sel.register(sock, selectors.EVENT_READ, client)
+
+    def _drop(self, client):
+        if self.clients.pop(client.sock, None) is not None and client.audio:
+            self.listeners -= 1
+        try:
+            self.sel.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+
+    def _drain_wakeups(self):
+        try:
+            while self.wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+        while self.pcm_pending:
+            self._fan_out(self.pcm_pending.popleft())
+        if self.latest is None:
+            return
+        self.latest_line = None
+        for client in list(self.clients.values()):
+            # Backpressure: a subscriber still sending an older frame just
+            # misses this one.
+            if client.subscribed and not client.outbuf:
+                self._send(client, self._state_line())
+
+    def _fan_out(self, block):
+        limit = int(self.audio_format.bytes_per_sec * AUDIO_RING_SECONDS)
+        for client in list(self.clients.values()):
+            if not client.audio:
+                continue
+            client.pcm.append(block)
+            client.pcm_bytes += len(block)
+            # The head may be partly sent already; drop from behind it so
+            # the stream stays frame aligned.
+            while client.pcm_bytes > limit and len(client.pcm) > 2:
+                client.pcm_bytes -= len(client.pcm[1])
+                del client.pcm[1]
+                client.drops += 1
+            self._flush(client)
+
+    def _state_line(self):
+        if self.latest_line is None:
+            self.latest_line = (json.dumps(self.latest, separators=(",", ":")) + "\n").encode("utf-8")
+        return self.latest_line
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(client)
+            return
+        client.inbuf += data
+        while b"\n" in client.inbuf:
+            line, client.inbuf = client.inbuf.split(b"\n", 1)
+            self._send(client, self.handle(client, line.decode("utf-8", "replace").strip()))
+        if len(client.inbuf) > MAX_LINE:
+            self._drop(client)
+
+    def handle(self, client, line):
+        parts = line.split(None, 1)
+        if not parts:
+            return b""
+        cmd = parts[0].lower()
+        arg = parts[1].strip() if len(parts) > 1 else ""
+        if cmd in ("next", "prev"):
+            self.commands.append((cmd, None))
+        elif cmd == "set-preset":
+            idx = self._preset_index(arg)
+            if idx is None:
+                return b"err unknown preset\n"
+            self.commands.append((cmd, idx))
+        elif cmd == "set-tempo-bias":
+            try:
+                self.commands.append((cmd, float(arg)))
+            except ValueError:
+                return b"err expected a number\n"
+        elif cmd == "pause":
+            mode = arg.lower() or "toggle"
+            if mode not in ("on", "off", "toggle"):
+                return b"err expected on, off or toggle\n"
+            self.commands.append((cmd, mode))
+        elif cmd == "status":
+            if self.latest is None:
+                return b"err no state yet\n"
+            return b"ok " + self._state_line()
+        elif cmd == "subscribe":
+            client.subscribed = True
+            if self.latest is not None:
+                return b"ok\n" + self._state_line()
+        elif cmd == "audio":
+            if self.audio_format is None:
+                return b"err no audio output\n"
+            if not client.audio:
+                client.audio = True
+                self.listeners += 1
+            fmt = self.audio_format._asdict()
+            return b"ok " + json.dumps(fmt, separators=(",", ":")).encode("utf-8") + b"\n"
+        else:
+            return b"err unknown command\n"
+        return b"ok\n"
+
+    def _preset_index(self, arg):
+        if arg.isdigit():
+            idx = int(arg)
+            return idx if 0 <= idx < len(self.preset_names) else None
+        try:
+            return self.preset_names.index(arg.lower())
+        except ValueError:
+            return None
+
+    def _send(self, client, data):
+        if not data:
+            return
+        client.outbuf += data
+        if len(client.outbuf) > MAX_OUT:
+            self._drop(client)
+            return
+        self._flush(client)
+
+    def _flush(self, client):
+        try:
+            sent = client.sock.send(client.outbuf) if client.outbuf else 0
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self._drop(client)
+            return
+        client.outbuf = client.outbuf[sent:]
+        if client.pcm and not client.outbuf:
+            self._flush_pcm(client)
+            if client.sock not in self.clients:
+                return
+        pending = client.outbuf or client.pcm
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+        self.sel.modify(client.sock, events, client)
+
+    def _flush_pcm(self, client):
+        # One sendmsg over the queued blocks, no joining.
+        try:
+            sent = client.sock.sendmsg(list(client.pcm)[:MAX_SEND_BUFFERS])
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._drop(client)
+            return
+        client.pcm_bytes -= sent
+        while sent:
+            head = client.pcm[0]
+            if sent >= len(head):
+                client.pcm.popleft()
+                sent -= len(head)
+            else:
+                client.pcm[0] = memoryview(head)[sent:]
+                sent = 0
+
+    def _close_all(self):
+        for client in list(self.clients.values()):
+            self._drop(client)
+        for sock in (self.listener, self.wake_r, self.wake_w):
+            try:
+                sock.close()
+            except OSError:
+                pass
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        self.sel.close()
+
+
+def connect(path=None, timeout=0.5):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path or socket_path())
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def send_command(line, path=None, timeout=0.5):
+    # One-shot request; returns the reply line, or None when the daemon
+    # isn't reachable.
+    try:
+        sock = connect(path, timeout)
+    except OSError:
+        return None
+    try:
+        sock.sendall(line.strip().encode("utf-8") + b"\n")
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            reply += chunk
+        return reply.decode("utf-8", "replace").strip()
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+
+def stream_audio():
+    # Raw PCM to stdout, e.g. `linuxlofi-music audio | aplay ...`; the
+    # format goes to stderr.
+    try:
+        sock = connect(timeout=None)
+    except OSError:
+        print("[linuxlofi] music daemon is not running", file=sys.stderr)
+        return 1
+    try:
+        sock.sendall(b"audio\n")
+        with sock.makefile("rb") as stream:
+            reply = stream.readline().decode("utf-8", "replace").strip()
+            print(reply, file=sys.stderr)
+            if not reply.startswith("ok"):
+                return 1
+            out = sys.stdout.buffer
+            while True:
+                chunk = stream.read1(65536)
+                if not chunk:
+                    break
+                out.write(chunk)
+                out.flush()
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        sock.close()
+    return 0
+
+
+def main(argv):
+    if not argv or argv[0] not in COMMANDS:
+        print("usage: linuxlofi-music [" + "|".join(COMMANDS) + "] [arg]", file=sys.stderr)
+        return 2
+    line = " ".join(argv)
+    if argv[0] == "audio":
+        return stream_audio()
+    if argv[0] != "subscribe":
+        reply = send_command(line)
+        if reply is None:
+            print("[linuxlofi] music daemon is not running", file=sys.stderr)
+            return 1
+        print(reply)
+        return 0 if reply.startswith("ok") else 1
+
+    try:
+        sock = connect(timeout=None)
+    except OSError:
+        print("[linuxlofi] music daemon is not running", file=sys.stderr)
+        return 1
+    try:
+        sock.sendall(b"subscribe\n")
+        with sock.makefile("r", encoding="utf-8") as stream:
+            for line in stream:
+                sys.stdout.write(line)
+                sys.stdout.flush()
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
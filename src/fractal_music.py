@@ -1,22 +1,38 @@
 #!/usr/bin/env python3
+import argparse
 import json
 import math
 import os
 import platform
 import random
 import signal
-import shutil
-import struct
 import subprocess
+import sys
 import time
 
+import gpu
+import procfs
+import render
+from audiofmt import SAMPLE_BYTES, AudioFormat, format_overrides
+from control import ControlServer
+from output import DEFAULT_BLOCK_MS, DEFAULT_LOOKAHEAD_MS, AudioWriter, PcmRing, block_bytes, lookahead_bytes
+from perf import StageTimes
+from sampler import MetricsSampler
+from sinks import open_sinks, sink_specs
+from statechan import StateWriter
+from synth import BlockSynth
+from tracefile import TraceReader, TraceWriter, is_trace
+
 SR = 44100
 STATE_FILE = "/tmp/linuxlofi-state.json"
-NEXT_TRACK_FILE = "/tmp/linuxlofi-next-track.flag"
+STATE_JSON = os.environ.get("LINUXLOFI_STATE_JSON", "").strip().lower() in ("1", "yes", "true", "on")
 ROTATE_SECONDS = 300
+DEFAULT_SAMPLE_MS = 250
+GPU_SAMPLE_SECONDS = 1.2
+GPU_TIMEOUT = 0.35
+DAEMON_STAGES = ("sample_cpu", "sample_ram", "sample_gpu", "synth", "write", "state")
 IS_LINUX = platform.system().lower() == "linux"
 IS_DARWIN = platform.system().lower() == "darwin"
-IS_TERMUX = bool(os.environ.get("TERMUX_VERSION")) or "com.termux" in os.environ.get("PREFIX", "")
 
 PRESETS = [
     {
@@ -132,84 +148,16 @@ PRESETS = [
 ]
 
 
-def get_player_candidates():
-    forced = os.environ.get("LINUXLOFI_AUDIO_BACKEND", "").strip().lower()
-    base = [
-        ("pw-play", ["pw-play", "--rate", str(SR), "--channels", "1", "--format", "s16", "-"]),
-        ("aplay", ["aplay", "-q", "-f", "S16_LE", "-r", str(SR), "-c", "1"]),
-        (
-            "mpv",
-            [
-                "mpv",
-                "--no-video",
-                "--really-quiet",
-                "--audio-display=no",
-                "--demuxer=rawaudio",
-                "--demuxer-rawaudio-format=s16le",
-                f"--demuxer-rawaudio-rate={SR}",
-                "--demuxer-rawaudio-channels=1",
-                "-",
-            ],
-        ),
-        ("ffplay", ["ffplay", "-v", "error", "-nostats", "-nodisp", "-f", "s16le", "-ar", str(SR), "-ac", "1", "-i", "-"]),
-    ]
-
-    # Termux tends to work best with mpv; prefer it there.
-    if IS_TERMUX:
-        preferred = ["mpv", "ffplay", "pw-play", "aplay"]
-    else:
-        preferred = ["pw-play", "aplay", "mpv", "ffplay"]
-
-    ordered = []
-    for name in preferred:
-        for n, cmd in base:
-            if n == name:
-                ordered.append((n, cmd))
-                break
-
-    if forced:
-        ordered = [(n, cmd) for n, cmd in ordered if n == forced]
-    return ordered
-
-
-def start_player():
-    for name, cmd in get_player_candidates():
-        if not shutil.which(cmd[0]):
-            continue
-        try:
-            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            if proc.stdin is None:
-                continue
-            proc.stdin.write(b"\x00" * 4096)
-            proc.stdin.flush()
-            return proc, name
-        except Exception:
-            try:
-                proc.terminate()
-            except Exception:
-                pass
-            continue
-    forced = os.environ.get("LINUXLOFI_AUDIO_BACKEND", "").strip().lower()
-    if forced:
-        raise RuntimeError(f"Forced backend '{forced}' is unavailable or failed to start")
-    raise RuntimeError("No working audio backend found (tried pw-play, aplay, mpv, ffplay)")
-
-
 def read_cpu_pair():
-    if not IS_LINUX or not os.path.exists("/proc/stat"):
-        return None
-    with open("/proc/stat", "r", encoding="utf-8") as f:
-        p = f.readline().split()[1:]
-    vals = [int(x) for x in p]
-    idle = vals[3] + vals[4]
-    total = sum(vals)
-    return total, idle
+    return procfs.cpu_totals()
 
 
-def read_cpu_pct_fallback():
+def read_cpu_pct_fallback(timeout=None):
     cores = max(1, os.cpu_count() or 1)
     try:
-        out = subprocess.check_output(["ps", "-A", "-o", "%cpu"], text=True, stderr=subprocess.DEVNULL)
+        out = subprocess.check_output(
+            ["ps", "-A", "-o", "%cpu"], text=True, stderr=subprocess.DEVNULL, timeout=timeout
+        )
         vals = [float(x.strip()) for x in out.splitlines()[1:] if x.strip()]
         return clamp(sum(vals) / cores, 0.0, 100.0)
     except Exception:
@@ -221,24 +169,20 @@ def read_cpu_pct_fallback():
         return 0.0
 
 
-def read_ram_pct():
-    if IS_LINUX and os.path.exists("/proc/meminfo"):
-        total = 1
-        avail = 0
-        with open("/proc/meminfo", "r", encoding="utf-8") as f:
-            for line in f:
-                if line.startswith("MemTotal:"):
-                    total = int(line.split()[1])
-                elif line.startswith("MemAvailable:"):
-                    avail = int(line.split()[1])
+def read_ram_pct(timeout=None):
+    mem = procfs.mem_totals()
+    if mem is not None:
+        total, avail = mem
         return 100.0 * max(0, total - avail) / max(1, total)
 
     if IS_DARWIN:
         try:
             total_b = int(
-                subprocess.check_output(["sysctl", "-n", "hw.memsize"], text=True, stderr=subprocess.DEVNULL).strip()
+                subprocess.check_output(
+                    ["sysctl", "-n", "hw.memsize"], text=True, stderr=subprocess.DEVNULL, timeout=timeout
+                ).strip()
             )
-            vm = subprocess.check_output(["vm_stat"], text=True, stderr=subprocess.DEVNULL)
+            vm = subprocess.check_output(["vm_stat"], text=True, stderr=subprocess.DEVNULL, timeout=timeout)
             page_size = 4096
             for line in vm.splitlines():
                 if "page size of" in line:
@@ -274,26 +218,56 @@ def read_ram_pct():
     return 100.0 * max(0, total - avail) / max(1, total)
 
 
-def read_gpu_metrics(last_ok):
+class CpuSource:
+    def __init__(self):
+        self.pair = read_cpu_pair()
+
+    def __call__(self, timeout):
+        if self.pair is not None:
+            cpu_t0, cpu_i0 = self.pair
+            next_pair = read_cpu_pair()
+            if next_pair is not None:
+                cpu_t1, cpu_i1 = next_pair
+                dt = max(1, cpu_t1 - cpu_t0)
+                self.pair = next_pair
+                return {"cpu": 100.0 * max(0, dt - (cpu_i1 - cpu_i0)) / dt}
+            self.pair = None
+        return {"cpu": read_cpu_pct_fallback(timeout)}
+
+
+class GpuSource:
+    def __init__(self):
+        self.backend = gpu.open_backend(interval_ms=GPU_SAMPLE_SECONDS * 1000)
+        self.last = (0.0, 0.0)
+
+    def __call__(self, timeout):
+        self.last = self.backend.read() or self.last
+        return {"gpu": self.last[0], "vram": self.last[1]}
+
+    def close(self):
+        self.backend.close()
+
+
+def get_sample_ms():
     try:
-        out = subprocess.check_output(
-            [
-                "nvidia-smi",
-                "--query-gpu=utilization.gpu,memory.used,memory.total",
-                "--format=csv,noheader,nounits",
-            ],
-            stderr=subprocess.DEVNULL,
-            timeout=0.35,
-            text=True,
-        ).strip()
-        if not out:
-            return last_ok
-        gpu_s, used_s, total_s = [x.strip() for x in out.split(",")[:3]]
-        gpu = float(gpu_s)
-        vram = 100.0 * float(used_s) / max(1.0, float(total_s))
-        return gpu, vram
-    except Exception:
-        return last_ok
+        return max(20, int(os.environ.get("LINUXLOFI_SAMPLE_MS", DEFAULT_SAMPLE_MS)))
+    except ValueError:
+        return DEFAULT_SAMPLE_MS
+
+
+def make_sampler(times=None):
+    interval = get_sample_ms() / 1000.0
+    sampler = MetricsSampler(times)
+    # Fork-based fallbacks (ps, sysctl, vm_stat) need more than one tick.
+    budget = max(1.0, interval * 2)
+    sampler.add("cpu", CpuSource(), interval, budget)
+    sampler.add("ram", lambda timeout: {"ram": read_ram_pct(timeout)}, interval * 2, budget)
+    gpu_source = GpuSource()
+    # NVML and sysfs reads cost microseconds, so they keep pace with the CPU
+    # sampler; the nvidia-smi loop only produces a line every GPU_SAMPLE_SECONDS.
+    gpu_interval = GPU_SAMPLE_SECONDS if gpu_source.backend.name == "nvidia-smi" else interval
+    sampler.add("gpu", gpu_source, gpu_interval, GPU_TIMEOUT)
+    return sampler
 
 
 def midi_to_hz(midi):
@@ -318,57 +292,94 @@ def write_state(payload):
         pass
 
 
-def consume_next_track_flag():
-    if not os.path.exists(NEXT_TRACK_FILE):
-        return False
+def make_state_publisher():
+    # The mmap channel is the primary output; the JSON file is only written
+    # for older readers when asked for, or when the channel can't be created.
     try:
-        os.remove(NEXT_TRACK_FILE)
-    except OSError:
-        pass
-    return True
-
-
-def main():
-    player, backend_name = start_player()
-    if player.stdin is None:
-        return
-
-    running = True
+        channel = StateWriter()
+    except (OSError, ValueError):
+        return write_state
+    if not STATE_JSON:
+        return channel.write
 
-    def stop_handler(_sig, _frm):
-        nonlocal running
-        running = False
+    def publish(payload):
+        channel.write(payload)
+        write_state(payload)
 
-    signal.signal(signal.SIGINT, stop_handler)
-    signal.signal(signal.SIGTERM, stop_handler)
+    return publish
 
-    cpu_pair = read_cpu_pair()
-    last_gpu = (0.0, 0.0)
-    last_gpu_poll = 0.0
 
-    current_idx = 8  # Neon Drift default
-    last_change = time.monotonic()
-    pending_track_change = False
-    live_tempo = float(PRESETS[current_idx]["base_tempo"])
-    smooth_load = 0.0
+def start_control_server(audio_format=None):
+    try:
+        control = ControlServer([p["name"] for p in PRESETS], audio_format=audio_format)
+    except (OSError, RuntimeError) as exc:
+        print(f"[linuxlofi] control socket disabled: {exc}", file=sys.stderr)
+        return None
+    control.start()
+    return control
 
-    step = 0
-    ph_bass = 0.0
-    ph_sub = 0.0
-    ph_pad = [0.0, 0.0, 0.0]
-    ph_key = 0.0
 
-    while running:
-        now = time.monotonic()
+def get_lookahead_ms():
+    try:
+        return int(os.environ.get("LINUXLOFI_LOOKAHEAD_MS", DEFAULT_LOOKAHEAD_MS))
+    except ValueError:
+        return DEFAULT_LOOKAHEAD_MS
 
-        if consume_next_track_flag() or (now - last_change >= ROTATE_SECONDS):
-            pending_track_change = True
-        if pending_track_change and step % 16 == 0:
-            current_idx = (current_idx + 1) % len(PRESETS)
-            last_change = now
-            pending_track_change = False
 
-        preset = PRESETS[current_idx]
+def get_block_ms():
+    # Audio handed to the player per write: small blocks keep latency low,
+    # large ones let the daemon sleep longer between wakeups.
+    try:
+        return int(os.environ.get("LINUXLOFI_BLOCK_MS", DEFAULT_BLOCK_MS))
+    except ValueError:
+        return DEFAULT_BLOCK_MS
+
+
+# The preset, tempo and voice pipeline, one 16th-note step at a time. It
+# owns no clock, metrics source or output: callers pass the time and the
+# metrics snapshot for each step, so the live daemon and offline renders
+# produce the same music from the same inputs and seed.
+class Engine:
+    def __init__(self, sr=SR, preset_index=8, rng=None, now=0.0, audio=True, channels=1, sample="s16"):
+        self.sr = sr
+        self.frame_bytes = channels * SAMPLE_BYTES[sample]
+        self.audio = audio
+        self.rng = rng or random.Random()
+        self.current_idx = preset_index
+        self.last_change = now
+        self.pending_idx = None
+        self.live_tempo = float(PRESETS[preset_index]["base_tempo"])
+        self.smooth_load = 0.0
+        self.tempo_bias = 0.0
+        self.paused = False
+        self.step = 0
+        self.frames = 0
+        self.synth = BlockSynth(sr, channels=channels, sample=sample)
+
+    def command(self, cmd, arg):
+        target = self.current_idx if self.pending_idx is None else self.pending_idx
+        if cmd == "next":
+            self.pending_idx = (target + 1) % len(PRESETS)
+        elif cmd == "prev":
+            self.pending_idx = (target - 1) % len(PRESETS)
+        elif cmd == "set-preset":
+            self.pending_idx = arg
+        elif cmd == "set-tempo-bias":
+            self.tempo_bias = clamp(arg, -30.0, 30.0)
+        elif cmd == "pause":
+            self.paused = (not self.paused) if arg == "toggle" else arg == "on"
+
+    def render_step(self, now, snap):
+        # Returns (pcm, payload) for the next step; pcm is None when the
+        # engine was built with audio=False.
+        if self.pending_idx is None and now - self.last_change >= ROTATE_SECONDS:
+            self.pending_idx = (self.current_idx + 1) % len(PRESETS)
+        if self.pending_idx is not None and self.step % 16 == 0:
+            self.current_idx = self.pending_idx
+            self.last_change = now
+            self.pending_idx = None
+
+        preset = PRESETS[self.current_idx]
         base_tempo = float(preset["base_tempo"])
         scale = preset["scale"]
         progression = preset["progression"]
@@ -378,42 +389,23 @@ def main():
         hat_pat = preset["hat"]
         root_midi = int(preset["root_midi"])
 
-        if cpu_pair is not None:
-            cpu_t0, cpu_i0 = cpu_pair
-            next_pair = read_cpu_pair()
-            if next_pair is not None:
-                cpu_t1, cpu_i1 = next_pair
-                dt = max(1, cpu_t1 - cpu_t0)
-                cpu_pct = 100.0 * max(0, dt - (cpu_i1 - cpu_i0)) / dt
-                cpu_pair = next_pair
-            else:
-                cpu_pct = read_cpu_pct_fallback()
-                cpu_pair = None
-        else:
-            cpu_pct = read_cpu_pct_fallback()
-
-        ram_pct = read_ram_pct()
-
-        if now - last_gpu_poll > 1.2:
-            last_gpu = read_gpu_metrics(last_gpu)
-            last_gpu_poll = now
-        gpu_pct, vram_pct = last_gpu
+        cpu_pct, ram_pct, gpu_pct, vram_pct = snap.cpu, snap.ram, snap.gpu, snap.vram
 
         weighted = cpu_pct * 0.34 + ram_pct * 0.20 + gpu_pct * 0.27 + vram_pct * 0.19
         load = clamp(weighted / 100.0, 0.0, 1.0)
         peak = max(cpu_pct, gpu_pct)
         rush = clamp((peak - 85.0) / 15.0, 0.0, 1.0)
 
-        smooth_load += 0.14 * (load - smooth_load)
-        target_tempo = base_tempo + (smooth_load * 22.0) + (rush * 12.0) - 6.0
-        live_tempo += 0.12 * (target_tempo - live_tempo)
-        live_tempo = clamp(live_tempo, 58.0, 128.0)
+        self.smooth_load += 0.14 * (load - self.smooth_load)
+        target_tempo = base_tempo + (self.smooth_load * 22.0) + (rush * 12.0) - 6.0 + self.tempo_bias
+        self.live_tempo += 0.12 * (target_tempo - self.live_tempo)
+        live_tempo = self.live_tempo = clamp(self.live_tempo, 58.0, 128.0)
 
         step_sec = 60.0 / live_tempo / 4.0
-        n = max(256, int(SR * step_sec))
+        n = max(256, int(self.sr * step_sec))
 
-        bar = step // 16
-        step16 = step % 16
+        bar = self.step // 16
+        step16 = self.step % 16
 
         cpu_drive = clamp(cpu_pct / 100.0, 0.0, 1.0)
         ram_warmth = clamp(ram_pct / 100.0, 0.0, 1.0)
@@ -425,12 +417,12 @@ def main():
         chord = [chord_root, chord_root + 3, chord_root + 7]
 
         bass_note = chord_root - 12
-        if step16 in (8, 9) and random.random() < 0.35:
+        if step16 in (8, 9) and self.rng.random() < 0.35:
             bass_note += 7
 
         motif_note = motif[step16]
         key_note = None if motif_note is None else chord_root + motif_note
-        if key_note is not None and gpu_motion > 0.65 and random.random() < (gpu_motion - 0.55) * 0.25:
+        if key_note is not None and gpu_motion > 0.65 and self.rng.random() < (gpu_motion - 0.55) * 0.25:
             key_note += 12
 
         kick_hit = kick_pat[step16] == 1
@@ -450,54 +442,28 @@ def main():
         key_hz = midi_to_hz(key_note) if key_note is not None else 0.0
         pad_hz = [midi_to_hz(chord[0]), midi_to_hz(chord[1]), midi_to_hz(chord[2])]
 
-        buf = bytearray()
-
-        for i in range(n):
-            g = i / n
-
-            ph_bass += (2.0 * math.pi * bass_hz) / SR
-            ph_sub += (2.0 * math.pi * sub_hz) / SR
-            bass_env = (1.0 - g) ** 1.08
-            bass = math.sin(ph_bass) * bass_gain * bass_env
-            sub = math.sin(ph_sub) * sub_gain * bass_env
-
-            pad = 0.0
-            pad_env = (1.0 - g) ** (0.28 + 0.35 * (1.0 - ram_warmth))
-            for j in range(3):
-                ph_pad[j] += (2.0 * math.pi * pad_hz[j]) / SR
-                pad += math.sin(ph_pad[j])
-            pad = (pad / 3.0) * pad_gain * pad_env
-
-            key = 0.0
-            if key_note is not None:
-                ph_key += (2.0 * math.pi * key_hz) / SR
-                key_env = (1.0 - g) ** 1.9
-                key = (math.sin(ph_key) + 0.45 * math.sin(ph_key * 2.0)) * key_gain * key_env
-
-            kick = 0.0
-            if kick_hit:
-                k_env = math.exp(-13.0 * g)
-                kf = 145.0 - 95.0 * g
-                kick = math.sin(2.0 * math.pi * kf * (i / SR)) * kick_amp * k_env
-
-            snare = 0.0
-            if snare_hit:
-                s_env = math.exp(-22.0 * g)
-                s1 = math.sin(2.0 * math.pi * 180.0 * (i / SR))
-                s2 = math.sin(2.0 * math.pi * 330.0 * (i / SR))
-                snare = (0.7 * s1 + 0.3 * s2) * snare_amp * s_env
-
-            hat = 0.0
-            if hat_hit:
-                h_env = math.exp(-56.0 * g)
-                h1 = math.sin(2.0 * math.pi * 5200.0 * (i / SR))
-                h2 = math.sin(2.0 * math.pi * 7200.0 * (i / SR))
-                hat = (0.65 * h1 + 0.35 * h2) * hat_amp * h_env
-
-            mix = bass + sub + pad + key + kick + snare + hat
-            mix = softclip(mix * 1.35) * 0.72
-            sample = int(clamp(mix, -1.0, 1.0) * 32767)
-            buf += struct.pack("<h", sample)
+        if not self.audio:
+            buf = None
+        elif self.paused:
+            buf = bytes(self.frame_bytes * n)
+        else:
+            buf = self.synth.render(
+                n,
+                {
+                    "bass_hz": bass_hz,
+                    "sub_hz": sub_hz,
+                    "pad_hz": pad_hz,
+                    "key_hz": key_hz if key_note is not None else None,
+                    "bass_gain": bass_gain,
+                    "sub_gain": sub_gain,
+                    "pad_gain": pad_gain,
+                    "pad_exp": 0.28 + 0.35 * (1.0 - ram_warmth),
+                    "key_gain": key_gain,
+                    "kick_amp": kick_amp,
+                    "snare_amp": snare_amp,
+                    "hat_amp": hat_amp,
+                },
+            )
 
         vis_levels = [
             clamp(kick_amp, 0.0, 1.0),
@@ -509,45 +475,224 @@ def main():
             clamp(hat_amp * 2.2, 0.0, 1.0),
             clamp((kick_amp + bass_gain + pad_gain + key_gain + snare_amp + hat_amp) / 2.4, 0.0, 1.0),
         ]
-        write_state(
-            {
-                "ts": now,
-                "tempo": live_tempo,
-                "cpu": cpu_pct,
-                "ram": ram_pct,
-                "gpu": gpu_pct,
-                "vram": vram_pct,
-                "preset": preset["name"],
-                "preset_index": current_idx,
-                "audio_backend": backend_name,
-                "next_in": max(0.0, ROTATE_SECONDS - (now - last_change)),
-                "levels": vis_levels,
-                "components": {
-                    "cpu_drive": cpu_drive,
-                    "ram_warmth": ram_warmth,
-                    "gpu_motion": gpu_motion,
-                    "vram_spark": vram_spark,
-                },
-            }
-        )
-
-        step += 1
+        if self.paused:
+            vis_levels = [0.0] * 8
+        payload = {
+            "ts": now,
+            "tempo": live_tempo,
+            "cpu": cpu_pct,
+            "ram": ram_pct,
+            "gpu": gpu_pct,
+            "vram": vram_pct,
+            "preset": preset["name"],
+            "preset_index": self.current_idx,
+            "next_in": max(0.0, ROTATE_SECONDS - (now - self.last_change)),
+            "tempo_bias": self.tempo_bias,
+            "paused": self.paused,
+            "levels": vis_levels,
+            "drum_cache": self.synth.drums.stats(),
+            "components": {
+                "cpu_drive": cpu_drive,
+                "ram_warmth": ram_warmth,
+                "gpu_motion": gpu_motion,
+                "vram_spark": vram_spark,
+            },
+        }
+
+        self.step += 1
+        self.frames += n
+        return buf, payload
+
+
+def seed_arg(value):
+    # Traces store the seed as an unsigned 64-bit integer.
+    seed = int(value)
+    if not 0 <= seed < 1 << 64:
+        raise argparse.ArgumentTypeError("seed must be between 0 and 2**64 - 1")
+    return seed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="linuxlofi music daemon")
+    parser.add_argument("--render", metavar="PATH", help="render offline to a .wav, .flac or raw s16le file")
+    parser.add_argument("--duration", type=float, default=300.0, help="seconds to render (default 300)")
+    parser.add_argument(
+        "--seed", type=seed_arg, default=None, help="random seed (default: 0 for renders, random live)"
+    )
+    parser.add_argument("--trace", metavar="PATH", help="metrics trace to render against instead of a synthetic one")
+    parser.add_argument("--record", metavar="PATH", help="record live metrics, control commands and the seed to a binary trace")
+    parser.add_argument("--replay", metavar="PATH", help="play live from a recorded trace instead of the samplers")
+    parser.add_argument("--preset", default=None, help="starting preset index or name")
+    parser.add_argument(
+        "--format",
+        metavar="RATE:CH:SAMPLE",
+        help="output format override, e.g. 48000:2:f32 or ::s16 (default: per backend; renders 44100:1:s16)",
+    )
+    parser.add_argument(
+        "--sink",
+        action="append",
+        metavar="SPEC",
+        help="where live audio goes: player, null or file:PATH; repeat or comma separate to tee (default: player)",
+    )
+    return parser.parse_args(argv)
+
+
+def preset_index(value, default=8):
+    if value is None:
+        return default
+    if value.isdigit() and int(value) < len(PRESETS):
+        return int(value)
+    for i, preset in enumerate(PRESETS):
+        if preset["name"].lower() == value.lower():
+            return i
+    raise SystemExit(f"[linuxlofi] unknown preset: {value}")
+
+
+def open_replay(path, args):
+    # (metrics, seed, preset index, format overrides) for a binary trace;
+    # explicit --seed, --preset and --format still win.
+    reader = TraceReader(path)
+    seed = reader.seed if args.seed is None else args.seed
+    overrides = reader.format._asdict()
+    overrides.update(format_overrides(args.format))
+    return reader, seed, preset_index(args.preset, reader.preset_index), overrides
+
+
+def run_render(args):
+    try:
+        fmt = AudioFormat(SR, 1, "s16")._replace(**format_overrides(args.format))
+        if args.trace and is_trace(args.trace):
+            metrics, seed, start_idx, overrides = open_replay(args.trace, args)
+            fmt = fmt._replace(**overrides)
+        else:
+            seed = args.seed or 0
+            start_idx = preset_index(args.preset)
+            if args.trace:
+                metrics = render.TraceMetrics(args.trace)
+            else:
+                metrics = render.SyntheticMetrics(seed)
+        out = render.open_output(args.render, fmt)
+    except (OSError, RuntimeError, ValueError) as exc:
+        print(f"[linuxlofi] {exc}", file=sys.stderr)
+        return 1
+    engine = Engine(fmt.rate, start_idx, random.Random(seed), channels=fmt.channels, sample=fmt.sample)
+    commands = metrics.commands_until if isinstance(metrics, TraceReader) else None
+    audio_sec, wall_sec = render.render_offline(engine, metrics, out, args.duration, commands)
+    print(
+        f"[linuxlofi] rendered {audio_sec:.1f}s to {args.render} in {wall_sec:.2f}s "
+        f"({audio_sec / max(1e-9, wall_sec):.1f}x real time, {fmt.label()})",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.render:
+        return run_render(args)
 
+    try:
+        overrides = format_overrides(args.format)
+        specs = sink_specs(args.sink)
+    except ValueError as exc:
+        print(f"[linuxlofi] {exc}", file=sys.stderr)
+        return 1
+
+    replay = None
+    if args.replay:
         try:
-            player.stdin.write(buf)
-            player.stdin.flush()
-        except (BrokenPipeError, OSError):
-            break
+            replay, seed, start_idx, overrides = open_replay(args.replay, args)
+        except (OSError, ValueError) as exc:
+            print(f"[linuxlofi] {exc}", file=sys.stderr)
+            return 1
+    else:
+        seed = random.SystemRandom().randrange(1 << 32) if args.seed is None else args.seed
+        start_idx = preset_index(args.preset)
 
+    block_ms = get_block_ms()
     try:
-        player.stdin.close()
-    except Exception:
-        pass
-    try:
-        player.terminate()
-    except Exception:
-        pass
+        sink, fmt = open_sinks(specs, overrides, block_ms)
+    except (OSError, RuntimeError, ValueError) as exc:
+        print(f"[linuxlofi] {exc}", file=sys.stderr)
+        return 1
+    backend_name = sink.name
+    print(f"[linuxlofi] {backend_name} {fmt.label()}", file=sys.stderr)
+
+    block = block_bytes(block_ms, fmt.bytes_per_sec, fmt.frame_bytes)
+    ring = PcmRing(max(lookahead_bytes(get_lookahead_ms(), fmt.bytes_per_sec), 2 * block))
+    control = start_control_server(fmt)
+    publish_state = make_state_publisher()
+
+    def on_block(payload):
+        publish_state(payload)
+        if control is not None:
+            control.publish(payload)
+
+    times = StageTimes(DAEMON_STAGES)
+    writer = AudioWriter(ring, sink, block, on_block, times, control.publish_pcm if control else None)
+    writer.start()
+
+    running = True
+
+    def stop_handler(_sig, _frm):
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGINT, stop_handler)
+    signal.signal(signal.SIGTERM, stop_handler)
+
+    # A replay takes its metrics from the trace; don't open GPU backends
+    # that would never be read.
+    sampler = None
+    if replay is None:
+        sampler = make_sampler(times)
+        sampler.prime("ram")
+        sampler.start()
+    recorder = TraceWriter(args.record, seed, start_idx, fmt) if args.record else None
+
+    # The engine runs on audio time, so a trace replays step for step no
+    # matter how far ahead of the player the ring is.
+    engine = Engine(fmt.rate, start_idx, random.Random(seed), channels=fmt.channels, sample=fmt.sample)
+
+    while running:
+        # Recorded commands replay at the frame they ran at live; both
+        # kinds are recorded, so a replay can itself be re-recorded.
+        commands = replay.commands_until(engine.frames) if replay is not None else []
+        while control is not None and control.commands:
+            commands.append(control.commands.popleft())
+        for cmd, arg in commands:
+            engine.command(cmd, arg)
+            if recorder is not None:
+                recorder.command(engine.frames, cmd, arg)
+
+        t = engine.frames / fmt.rate
+        snap = sampler.snapshot if sampler is not None else replay.at(t)
+        if recorder is not None:
+            recorder.record(t, snap)
+        t0 = time.monotonic()
+        buf, payload = engine.render_step(t, snap)
+        t1 = time.monotonic()
+        times.add("synth", t1 - t0)
+        payload["ts"] = t1
+        payload["perf"] = times.summary()
+        payload["audio_backend"] = backend_name
+        payload["audio_format"] = fmt.label()
+        payload["sampler_overruns"] = dict(sampler.overruns) if sampler is not None else {}
+
+        if not ring.put(buf, payload):
+            break
+
+    if recorder is not None:
+        recorder.close()
+    if sampler is not None:
+        sampler.stop()
+    if control is not None:
+        control.stop()
+    ring.close()
+    writer.join(timeout=1.0)
+    sink.close()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
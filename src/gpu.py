@@ -0,0 +1,173 @@
+import ctypes
+import ctypes.util
+import glob
+import os
+import shutil
+import subprocess
+import threading
+
+from procfs import ProcFile
+
+SMI_QUERY = "--query-gpu=index,utilization.gpu,memory.used,memory.total"
+
+
+class _NvmlUtilization(ctypes.Structure):
+    _fields_ = [("gpu", ctypes.c_uint), ("memory", ctypes.c_uint)]
+
+
+class _NvmlMemory(ctypes.Structure):
+    _fields_ = [("total", ctypes.c_ulonglong), ("free", ctypes.c_ulonglong), ("used", ctypes.c_ulonglong)]
+
+
+def _combine(samples):
+    # Busiest GPU drives the music; VRAM is pooled across all of them.
+    busy = max(s[0] for s in samples)
+    used = sum(s[1] for s in samples)
+    total = sum(s[2] for s in samples)
+    return float(busy), 100.0 * used / max(1, total)
+
+
+# Every backend's read() returns (gpu %, vram %) or None when the sample
+# failed; construction raises OSError when the backend isn't usable here.
+class NvmlBackend:
+    name = "nvml"
+
+    def __init__(self, libname=None):
+        libname = libname or ctypes.util.find_library("nvidia-ml") or "libnvidia-ml.so.1"
+        self.lib = ctypes.CDLL(libname)
+        if self.lib.nvmlInit_v2() != 0:
+            raise OSError("nvmlInit failed")
+        count = ctypes.c_uint()
+        if self.lib.nvmlDeviceGetCount_v2(ctypes.byref(count)) != 0 or not count.value:
+            self.lib.nvmlShutdown()
+            raise OSError("no NVML devices")
+        self.handles = []
+        for i in range(count.value):
+            handle = ctypes.c_void_p()
+            if self.lib.nvmlDeviceGetHandleByIndex_v2(i, ctypes.byref(handle)) == 0:
+                self.handles.append(handle)
+        self.util = _NvmlUtilization()
+        self.mem = _NvmlMemory()
+
+    def read(self):
+        samples = []
+        for handle in self.handles:
+            if self.lib.nvmlDeviceGetUtilizationRates(handle, ctypes.byref(self.util)) != 0:
+                continue
+            if self.lib.nvmlDeviceGetMemoryInfo(handle, ctypes.byref(self.mem)) != 0:
+                continue
+            samples.append((self.util.gpu, self.mem.used, self.mem.total))
+        return _combine(samples) if samples else None
+
+    def close(self):
+        self.lib.nvmlShutdown()
+
+
+# amdgpu exposes load and VRAM as plain numbers under each card's device
+# directory; the files stay open and are re-read with pread.
+class SysfsBackend:
+    name = "sysfs"
+
+    def __init__(self, root="/sys/class/drm"):
+        self.cards = []
+        for busy in sorted(glob.glob(os.path.join(root, "card*", "device", "gpu_busy_percent"))):
+            device = os.path.dirname(busy)
+            try:
+                files = [ProcFile(os.path.join(device, name), 64) for name in (
+                    "gpu_busy_percent", "mem_info_vram_used", "mem_info_vram_total",
+                )]
+            except OSError:
+                continue
+            self.cards.append(files)
+        if not self.cards:
+            raise OSError("no amdgpu sysfs cards")
+
+    def read(self):
+        samples = []
+        for files in self.cards:
+            try:
+                samples.append(tuple(int(f.read().tobytes()) for f in files))
+            except (OSError, ValueError):
+                continue
+        return _combine(samples) if samples else None
+
+    def close(self):
+        for files in self.cards:
+            for f in files:
+                f.close()
+
+
+# Last resort: one long-lived nvidia-smi in --loop-ms mode. A reader thread
+# keeps the newest line, so read() never forks or blocks.
+class SmiLoopBackend:
+    name = "nvidia-smi"
+
+    def __init__(self, interval_ms=1000, command="nvidia-smi"):
+        if shutil.which(command) is None:
+            raise OSError(f"{command} not found")
+        self.proc = subprocess.Popen(
+            [command, SMI_QUERY, "--format=csv,noheader,nounits", f"--loop-ms={int(interval_ms)}"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        self.latest = None
+        self.thread = threading.Thread(target=self._pump, name="linuxlofi-nvidia-smi", daemon=True)
+        self.thread.start()
+
+    def _pump(self):
+        gpus = {}
+        for line in self.proc.stdout:
+            try:
+                index, busy, used, total = (float(x) for x in line.split(",")[:4])
+            except ValueError:
+                continue
+            gpus[index] = (busy, used, total)
+            self.latest = _combine(list(gpus.values()))
+
+    def read(self):
+        if self.proc.poll() is not None:
+            return None
+        return self.latest
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+class NullBackend:
+    name = "none"
+
+    def read(self):
+        return None
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    "nvml": NvmlBackend,
+    "sysfs": SysfsBackend,
+    "nvidia-smi": SmiLoopBackend,
+}
+
+
+def open_backend(preferred=None, interval_ms=1000):
+    # Tries NVML, amdgpu sysfs and a looping nvidia-smi in that order, or
+    # just `preferred` when set (e.g. from LINUXLOFI_GPU_BACKEND).
+    preferred = (preferred or os.environ.get("LINUXLOFI_GPU_BACKEND", "")).strip().lower()
+    if preferred in ("none", "off"):
+        return NullBackend()
+    names = [preferred] if preferred in BACKENDS else list(BACKENDS)
+    for name in names:
+        try:
+            if name == "nvidia-smi":
+                return SmiLoopBackend(interval_ms)
+            return BACKENDS[name]()
+        except (OSError, AttributeError):
+            continue
+    return NullBackend()
@@ -6,18 +6,30 @@ import math
 import os
 import platform
 import random
+import selectors
 import signal
+import socket
 import subprocess
+import sys
 import time
-from typing import List, Tuple
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import control
+import procfs
+from perf import StageTimes
+from statechan import StateReader
+from tracefile import TraceReader, is_trace
 
 DEFAULT_REFRESH = 0.12
 PROC_REFRESH_SECONDS = 1.0
+FRAME_COST_SECONDS = 1.0
+MAX_OUTPUT_DELAY = 2.0
 STATE_FILE = "/tmp/linuxlofi-state.json"
-NEXT_TRACK_FILE = "/tmp/linuxlofi-next-track.flag"
 APP_HOME = os.environ.get("LINUXLOFI_HOME", os.path.dirname(os.path.abspath(__file__)))
 MUSIC_SCRIPT = os.path.join(APP_HOME, "fractal_music.py")
 IS_LINUX = platform.system().lower() == "linux"
+IS_TERMUX = bool(os.environ.get("TERMUX_VERSION")) or "com.termux" in os.environ.get("PREFIX", "")
 
 PALETTES = {
     "auto": None,
@@ -52,18 +64,15 @@ class CPUReader:
         self.prev_idle = None
 
     def total_usage(self) -> float:
-        if not IS_LINUX or not os.path.exists("/proc/stat"):
+        pair = procfs.cpu_totals()
+        if pair is None:
             try:
                 load = os.getloadavg()[0]
                 cores = max(1, os.cpu_count() or 1)
                 return max(0.0, min(100.0, (load / cores) * 100.0))
             except Exception:
                 return 0.0
-        with open("/proc/stat", "r", encoding="utf-8") as f:
-            parts = f.readline().split()[1:]
-        vals = [int(x) for x in parts]
-        idle = vals[3] + vals[4]
-        total = sum(vals)
+        total, idle = pair
 
         if self.prev_total is None:
             self.prev_total = total
@@ -81,12 +90,26 @@ class ProcessReader:
     def __init__(self) -> None:
         self.cache: List[Tuple[str, str, str, str, str]] = []
         self.last_fetch = 0.0
+        self.scanner = procfs.ProcScanner() if IS_LINUX and not IS_TERMUX else None
+        if self.scanner is not None and not self.scanner.available():
+            self.scanner = None
 
     def top_processes(self, limit: int) -> List[Tuple[str, str, str, str, str]]:
         now = time.monotonic()
+        if self.scanner is not None:
+            try:
+                if now - self.last_fetch >= PROC_REFRESH_SECONDS:
+                    self.scanner.refresh()
+                    self.last_fetch = now
+                return self.scanner.top(limit)
+            except OSError:
+                self.scanner.close()
+                self.scanner = None
+
         if now - self.last_fetch < PROC_REFRESH_SECONDS and self.cache:
             return self.cache[:limit]
 
+        # ps fallback for macOS, Termux and hosts without a usable /proc.
         commands = [
             ["ps", "-eo", "pid,user,pcpu,pmem,comm", "--sort=-pcpu", "--no-headers"],
             ["ps", "-axo", "pid,user,%cpu,%mem,comm", "-r"],
@@ -123,14 +146,45 @@ class MusicStateReader:
         self.last_good = 0.0
         self.levels = [0.08] * 8
         self.peaks = [0.25] * 8
-        self.stats = {"cpu": 0.0, "ram": 0.0, "gpu": 0.0, "vram": 0.0, "tempo": 0.0, "preset": "unknown", "next_in": 0.0}
+        self.stats = {
+            "cpu": 0.0, "ram": 0.0, "gpu": 0.0, "vram": 0.0, "tempo": 0.0, "preset": "unknown", "next_in": 0.0,
+            "perf": {}, "audio_format": "", "wakeups": 0.0, "sink_drops": 0,
+        }
+        self.channel = StateReader()
+        self.last_data: Optional[dict] = None
+        # (show at, state) waiting out the daemon's output delay, so the
+        # bars move when the audio is heard rather than when it is queued.
+        self.delayed: Deque[Tuple[float, dict]] = deque(maxlen=64)
+
+    def _read_json(self) -> Optional[dict]:
+        # Compatibility path for daemons that only write the JSON state file.
+        try:
+            if os.stat(STATE_FILE).st_mtime < time.time() - 2.0:
+                return None
+            with open(STATE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _fetch(self) -> Tuple[Optional[dict], bool]:
+        data, changed = self.channel.read()
+        if data is None:
+            data = self._read_json()
+            changed = data is not None
+        return data, changed
 
     def read(self) -> Tuple[List[float], dict, bool]:
         now = time.monotonic()
+        data, changed = self._fetch()
+        if changed:
+            delay = min(MAX_OUTPUT_DELAY, float(data.get("output_delay_ms", 0.0)) / 1000.0)
+            self.delayed.append((now + max(0.0, delay), data))
+            self.last_good = now
+        while self.delayed and self.delayed[0][0] <= now:
+            self.last_data = self.delayed.popleft()[1]
+        data = self.last_data
         try:
-            with open(STATE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            arr = data.get("levels", [])
+            arr = data.get("levels", []) if data else None
             if isinstance(arr, list) and len(arr) >= 8:
                 for i in range(8):
                     raw = max(0.0, min(1.0, float(arr[i])))
@@ -145,8 +199,11 @@ class MusicStateReader:
                     "tempo": float(data.get("tempo", 0.0)),
                     "preset": str(data.get("preset", "unknown")),
                     "next_in": float(data.get("next_in", 0.0)),
+                    "perf": data.get("perf") or {},
+                    "audio_format": str(data.get("audio_format", "")),
+                    "wakeups": float(data.get("wakeups_per_sec", 0.0)),
+                    "sink_drops": int(data.get("sink_drops", 0)),
                 }
-                self.last_good = now
         except Exception:
             pass
 
@@ -154,6 +211,42 @@ class MusicStateReader:
         return list(self.levels), dict(self.stats), fresh
 
 
+class ReplayStateReader(MusicStateReader):
+    # Drives a silent copy of the music engine from a recorded trace instead
+    # of reading the daemon. Each frame advances the engine by a fixed
+    # frame_step of audio time, so every run draws the same sequence of
+    # frames.
+    def __init__(self, path: str, frame_step: float) -> None:
+        super().__init__()
+        import fractal_music
+
+        self.trace = TraceReader(path)
+        # Same rate as the recording, so steps fall where they did live.
+        fmt = self.trace.format
+        self.engine = fractal_music.Engine(
+            fmt.rate,
+            preset_index=self.trace.preset_index,
+            rng=random.Random(self.trace.seed),
+            audio=False,
+            channels=fmt.channels,
+            sample=fmt.sample,
+        )
+        self.frame_step = frame_step
+        self.t = 0.0
+
+    def _fetch(self) -> Tuple[Optional[dict], bool]:
+        self.t += self.frame_step
+        data = None
+        engine = self.engine
+        while engine.frames / engine.sr <= self.t:
+            for cmd, arg in self.trace.commands_until(engine.frames):
+                engine.command(cmd, arg)
+            _pcm, data = engine.render_step(engine.frames / engine.sr, self.trace.at(engine.frames / engine.sr))
+        if data is None:
+            return self.last_data, False
+        return data, True
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="htop-like terminal view with lo-fi visualizer bars and real process list"
@@ -185,7 +278,26 @@ def parse_args() -> argparse.Namespace:
         help="disable background lo-fi engine startup",
     )
     parser.add_argument("--fps", type=int, default=8, help="refresh rate (4-30)")
-    return parser.parse_args()
+    parser.add_argument(
+        "--replay",
+        metavar="TRACE",
+        help="animate from a trace recorded with fractal_music.py --record instead of the daemon",
+    )
+    parser.add_argument(
+        "--perf",
+        action="store_true",
+        help="show a row with stage timings (p50/p99 ms) and CPU%% of the daemon and the TUI",
+    )
+    parser.add_argument(
+        "--meters",
+        default="music",
+        choices=METER_MODES,
+        help="top panel: music voice meters or real per-core CPU meters",
+    )
+    args = parser.parse_args()
+    if args.replay and not is_trace(args.replay):
+        parser.error(f"{args.replay} is not a linuxlofi trace")
+    return args
 
 
 def detect_dark_bg() -> bool:
@@ -234,7 +346,71 @@ def init_colors(stdscr: curses.window, palette: Tuple[str, str, str]):
     curses.init_pair(8, curses.COLOR_CYAN, -1)
 
 
-def draw_header(stdscr: curses.window, width: int, palette_name: str) -> int:
+HEADER_ROWS = 7
+VIS_ROWS = 10
+METER_MODES = ("music", "cores")
+VOICE_LABELS = ("kick", "bass", "sub", "pad", "keys", "snare", "hat", "mix")
+CORE_SAMPLE_SECONDS = 0.5
+CORE_CELL = 18
+MAX_CORE_ROWS = 16
+HEAT_CHARS = " .:-=+*#%@"
+TUI_STAGES = ("read", "procs", "meters", "table", "flush")
+DAEMON_PERF_STAGES = ("synth", "write", "state", "sample_cpu", "sample_gpu")
+
+
+# Retained-mode model of the terminal. Widgets record their addstr calls
+# per row; flush() replays only the rows whose calls differ from what was
+# last sent and leaves the per-cell diffing to curses' own refresh(). Rows
+# above static_rows (the logo) are kept across frames until the next resize.
+class Screen:
+    def __init__(self, stdscr: curses.window) -> None:
+        self.stdscr = stdscr
+        self.addstr_calls = 0
+        self.resize()
+
+    def resize(self) -> None:
+        self.h, self.w = self.stdscr.getmaxyx()
+        self.rows: List[List[Tuple[int, str, int]]] = [[] for _ in range(self.h)]
+        self.front: List[Optional[List[Tuple[int, str, int]]]] = [None] * self.h
+        self.static_rows = 0
+        self.stdscr.erase()
+
+    def invalidate(self) -> None:
+        self.front = [None] * self.h
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        return self.h, self.w
+
+    def erase(self) -> None:
+        for y in range(self.static_rows, self.h):
+            self.rows[y] = []
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        if y < 0 or y >= self.h or x < 0 or x >= self.w:
+            return
+        self.rows[y].append((x, text[: self.w - x], attr))
+
+    def flush(self) -> None:
+        win = self.stdscr
+        for y in range(self.h):
+            row = self.rows[y]
+            if row == self.front[y]:
+                continue
+            win.move(y, 0)
+            win.clrtoeol()
+            for x, text, attr in row:
+                # The bottom-right cell can't be written without scrolling;
+                # curses still draws the text before raising.
+                try:
+                    win.addstr(y, x, text, attr)
+                except curses.error:
+                    pass
+                self.addstr_calls += 1
+            self.front[y] = row
+        win.refresh()
+
+
+def draw_header(screen: Screen, width: int, palette_name: str) -> int:
     logo = [
         "  _ _                  _         __ _ ",
         " | (_)_ __  _   ___  _| | ___   / _(_)",
@@ -247,7 +423,7 @@ def draw_header(stdscr: curses.window, width: int, palette_name: str) -> int:
     for line in logo:
         if y >= curses.LINES - 1:
             break
-        stdscr.addstr(y, 0, line[: width - 1].ljust(width - 1), curses.color_pair(1) | curses.A_BOLD)
+        screen.addstr(y, 0, line[: width - 1].ljust(width - 1), curses.color_pair(1) | curses.A_BOLD)
         y += 1
 
     # Keep space between logo and visualizer with no extra text.
@@ -270,7 +446,7 @@ def generate_spectrum(usage: float, t: float, prev: List[float]) -> List[float]:
     return vals
 
 
-def draw_bars(stdscr: curses.window, top: int, width: int, levels: List[float]) -> int:
+def draw_bars(screen: Screen, top: int, width: int, levels: List[float]) -> int:
     # htop-like horizontal meter rows.
     inner_left = 1
     inner_right = max(inner_left + 12, width - 3)
@@ -281,11 +457,11 @@ def draw_bars(stdscr: curses.window, top: int, width: int, levels: List[float])
     border_bottom = "+" + "-" * max(1, inner_width) + "+"
 
     if top < curses.LINES - 1:
-        stdscr.addstr(top, inner_left - 1, border_top[: width - inner_left], curses.color_pair(1))
+        screen.addstr(top, inner_left - 1, border_top[: width - inner_left], curses.color_pair(1))
         if len(title) < len(border_top) - 2:
             title_x = inner_left + max(0, (len(border_top) - 2 - len(title)) // 2)
             if title_x < width - 1:
-                stdscr.addstr(top, title_x, title, curses.color_pair(1) | curses.A_BOLD)
+                screen.addstr(top, title_x, title, curses.color_pair(1) | curses.A_BOLD)
     for idx in range(8):
         y = top + 1 + idx
         if y >= curses.LINES - 1:
@@ -293,42 +469,92 @@ def draw_bars(stdscr: curses.window, top: int, width: int, levels: List[float])
         level = max(0.0, min(1.0, levels[idx]))
         fill = int(level * meter_width)
         fill = max(1, fill)
-        line_label = f" core{idx + 1:>2} "
+        line_label = f" {VOICE_LABELS[idx]:<5} "
         pct = f"{int(level * 100):>3}%"
         meter_full = "#" * fill
         meter_rest = "-" * max(0, meter_width - fill)
 
         if inner_left - 1 < width - 1:
-            stdscr.addstr(y, inner_left - 1, "|", curses.color_pair(1))
+            screen.addstr(y, inner_left - 1, "|", curses.color_pair(1))
         x0 = inner_left
         if x0 + len(line_label) < width - 1:
-            stdscr.addstr(y, x0, line_label, curses.color_pair(1))
+            screen.addstr(y, x0, line_label, curses.color_pair(1))
         x0 += len(line_label)
         if x0 < width - 2:
-            stdscr.addstr(y, x0, "[", curses.color_pair(1))
+            screen.addstr(y, x0, "[", curses.color_pair(1))
         if x0 + 1 < width - 2:
-            stdscr.addstr(y, x0 + 1, meter_full, curses.color_pair(2))
+            screen.addstr(y, x0 + 1, meter_full, curses.color_pair(2))
         if x0 + 1 + len(meter_full) < width - 2:
-            stdscr.addstr(y, x0 + 1 + len(meter_full), meter_rest, curses.color_pair(4))
+            screen.addstr(y, x0 + 1 + len(meter_full), meter_rest, curses.color_pair(4))
         right = x0 + 1 + meter_width
         if right < width - 2:
-            stdscr.addstr(y, right, "]", curses.color_pair(1))
+            screen.addstr(y, right, "]", curses.color_pair(1))
         if right + 2 < width - 2:
-            stdscr.addstr(y, right + 2, pct, curses.color_pair(3) | curses.A_BOLD)
+            screen.addstr(y, right + 2, pct, curses.color_pair(3) | curses.A_BOLD)
         if inner_right < width - 1:
-            stdscr.addstr(y, inner_right, "|", curses.color_pair(1))
+            screen.addstr(y, inner_right, "|", curses.color_pair(1))
     bottom_y = top + 9
     if bottom_y < curses.LINES - 1:
-        stdscr.addstr(bottom_y, inner_left - 1, border_bottom[: width - inner_left], curses.color_pair(1))
+        screen.addstr(bottom_y, inner_left - 1, border_bottom[: width - inner_left], curses.color_pair(1))
     return 10
 
 
-def draw_process_table(stdscr: curses.window, top: int, width: int, rows: List[Tuple[str, str, str, str, str]]):
+def core_layout(width: int, count: int) -> Tuple[int, int, bool]:
+    # (columns, rows, heat): meters in as many columns as fit, or one shade
+    # character per core once the meters would take too many rows.
+    inner_width = max(16, width - 5)
+    cols = max(1, inner_width // CORE_CELL)
+    rows = max(1, -(-count // cols))
+    if rows <= min(MAX_CORE_ROWS, max(1, curses.LINES // 3)):
+        return cols, rows, False
+    cols = inner_width
+    return cols, max(1, -(-count // cols)), True
+
+
+def draw_cores(screen: Screen, top: int, width: int, usage, online) -> int:
+    # Per-core CPU panel. Each row is a single addstr so the cost stays flat
+    # at hundreds of cores; offline CPUs show as "x".
+    count = len(usage)
+    cols, rows, heat = core_layout(width, count)
+    inner_width = max(16, width - 5)
+    title = f" CPU cores ({sum(online)}/{count}) "
+    border = "+" + "-" * inner_width + "+"
+    if top < curses.LINES - 1:
+        screen.addstr(top, 0, border[: width - 1], curses.color_pair(1))
+        screen.addstr(top, max(1, (len(border) - len(title)) // 2), title, curses.color_pair(1) | curses.A_BOLD)
+    meter_width = CORE_CELL - 10
+    for r in range(rows):
+        y = top + 1 + r
+        if y >= curses.LINES - 1:
+            break
+        parts = []
+        for i in range(r * cols, min(count, (r + 1) * cols)):
+            if heat:
+                if not online[i]:
+                    parts.append("x")
+                else:
+                    parts.append(HEAT_CHARS[min(len(HEAT_CHARS) - 1, int(usage[i] * len(HEAT_CHARS)))])
+            elif not online[i]:
+                parts.append(f"{i:>3}[" + "x" * meter_width + "] off ")
+            else:
+                fill = int(usage[i] * meter_width + 0.5)
+                parts.append(f"{i:>3}[" + "#" * fill + "-" * (meter_width - fill) + f"]{int(usage[i] * 100):>3}% ")
+        line = "".join(parts)
+        screen.addstr(y, 0, "|", curses.color_pair(1))
+        screen.addstr(y, 1, line[:inner_width], curses.color_pair(2))
+        if inner_width + 1 < width - 1:
+            screen.addstr(y, inner_width + 1, "|", curses.color_pair(1))
+    if top + rows + 1 < curses.LINES - 1:
+        screen.addstr(top + rows + 1, 0, border[: width - 1], curses.color_pair(1))
+    return rows + 2
+
+
+def draw_process_table(screen: Screen, top: int, width: int, rows: List[Tuple[str, str, str, str, str]]):
     if top >= curses.LINES - 2:
         return
-    stdscr.addstr(top, 0, " Processes (real) ".ljust(width - 1), curses.color_pair(1) | curses.A_BOLD)
+    screen.addstr(top, 0, " Processes (real) ".ljust(width - 1), curses.color_pair(1) | curses.A_BOLD)
     header = " PID      USER         CPU%   MEM%   COMMAND"
-    stdscr.addstr(top + 1, 0, header[: width - 1].ljust(width - 1), curses.color_pair(1))
+    screen.addstr(top + 1, 0, header[: width - 1].ljust(width - 1), curses.color_pair(1))
 
     y = top + 2
     for pid, user, cpu, mem, cmd_name in rows:
@@ -347,10 +573,19 @@ def draw_process_table(stdscr: curses.window, top: int, width: int, rows: List[T
             row_color = curses.color_pair(7)
         else:
             row_color = curses.color_pair(8)
-        stdscr.addstr(y, 0, line[: width - 1].ljust(width - 1), row_color)
+        screen.addstr(y, 0, line[: width - 1].ljust(width - 1), row_color)
         y += 1
 
 
+def format_perf(label: str, perf: dict, stages: Tuple[str, ...]) -> str:
+    if not perf:
+        return f"{label} n/a"
+    parts = [f"{label} cpu={perf.get('self_cpu', 0.0):.1f}%"]
+    for stage in stages:
+        parts.append(f"{stage}={perf.get(stage + '_p50', 0.0):.2f}/{perf.get(stage + '_p99', 0.0):.2f}")
+    return " ".join(parts)
+
+
 def next_palette_name(current: str) -> str:
     names = ["scifi", "ice", "neon", "ocean", "aurora", "sunset", "auto", "green", "blue", "amber", "mono", "pink"]
     idx = names.index(current)
@@ -358,11 +593,7 @@ def next_palette_name(current: str) -> str:
 
 
 def request_next_track():
-    try:
-        with open(NEXT_TRACK_FILE, "w", encoding="utf-8") as f:
-            f.write(str(time.time()))
-    except Exception:
-        pass
+    control.send_command("next")
 
 
 def is_lofi_running(script_path: str) -> bool:
@@ -377,6 +608,8 @@ def is_lofi_running(script_path: str) -> bool:
 
 
 def maybe_start_lofi(args: argparse.Namespace) -> Tuple[subprocess.Popen | None, str]:
+    if args.replay:
+        return None, "replay"
     if args.no_music:
         return None, "off"
     script = MUSIC_SCRIPT
@@ -391,82 +624,325 @@ def maybe_start_lofi(args: argparse.Namespace) -> Tuple[subprocess.Popen | None,
         return None, "error"
 
 
+class MusicEvents:
+    # Subscription on the daemon's control socket, used purely as a wakeup
+    # source: every pushed line means a new state block is in the channel.
+    def __init__(self) -> None:
+        self.sock = None
+        self.next_attempt = 0.0
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def connect(self, now: float) -> bool:
+        if self.sock is not None or now < self.next_attempt:
+            return False
+        self.next_attempt = now + 2.0
+        try:
+            sock = control.connect(timeout=0.2)
+            sock.sendall(b"subscribe\n")
+            sock.setblocking(False)
+        except OSError:
+            return False
+        self.sock = sock
+        return True
+
+    def drain(self) -> bool:
+        got = False
+        while self.sock is not None:
+            try:
+                data = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                data = b""
+            if not data:
+                self.close()
+                break
+            got = True
+        return got
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def read_keys(stdscr: curses.window) -> List[int]:
+    keys = []
+    while True:
+        key = stdscr.getch()
+        if key == -1:
+            return keys
+        keys.append(key)
+
+
 def run(stdscr: curses.window, args: argparse.Namespace):
     palette_name = args.palette
     palette = choose_palette(args)
     init_colors(stdscr, palette)
 
+    screen = Screen(stdscr)
     cpu_reader = CPUReader()
     proc_reader = ProcessReader()
-    music_reader = MusicStateReader()
+    max_fps = max(4, min(30, args.fps))
+    music_reader = ReplayStateReader(args.replay, 1.0 / max_fps) if args.replay else MusicStateReader()
+    music_events = MusicEvents()
     levels = [0.1] * 8
-    refresh = 1.0 / max(4, min(30, args.fps))
+    times = StageTimes(TUI_STAGES)
+    show_perf = args.perf
+    meters = args.meters
+    core_stat = procfs.CoreStat() if IS_LINUX else None
+    if core_stat is None:
+        meters = "music"
+    core_usage, core_online = [], []
     music_proc, music_mode = maybe_start_lofi(args)
 
     running = True
+    resized = False
+    focused = True
 
     def stop_handler(_sig, _frm):
         nonlocal running
         running = False
 
+    def winch_handler(_sig, _frm):
+        nonlocal resized
+        resized = True
+
+    # Signals only set flags; the wakeup socket makes select() return.
+    wake_r, wake_w = socket.socketpair()
+    wake_r.setblocking(False)
+    wake_w.setblocking(False)
+    old_wakeup = signal.set_wakeup_fd(wake_w.fileno())
     signal.signal(signal.SIGINT, stop_handler)
     signal.signal(signal.SIGTERM, stop_handler)
+    signal.signal(signal.SIGWINCH, winch_handler)
+
+    sel = selectors.DefaultSelector()
+    sel.register(sys.stdin.fileno(), selectors.EVENT_READ, "stdin")
+    sel.register(wake_r, selectors.EVENT_READ, "wake")
+
+    # Ask the terminal to report focus changes as ESC [ I / ESC [ O.
+    sys.stdout.write("\x1b[?1004h")
+    sys.stdout.flush()
+
+    last_sig = None
+    last_frame = 0.0
+    next_proc = 0.0
+    next_core = 0.0
+    frame_cost = 0.0
+    # The footer shows frame_cost rounded and refreshed on a slow timer, so
+    # the readout itself doesn't force a redraw every frame.
+    shown_cost = 0.0
+    next_cost = 0.0
+    pending = True
+    animating = True
+    pending_keys: List[int] = []
 
     try:
         while running:
-            h, w = stdscr.getmaxyx()
-            stdscr.erase()
+            now = time.monotonic()
+            if not args.replay and music_events.connect(now):
+                sel.register(music_events, selectors.EVENT_READ, "music")
+
+            synced = music_reader.last_good > 0.0 and (now - music_reader.last_good) <= 2.0
+            if not focused:
+                fps = 1
+            elif synced:
+                fps = max_fps
+            else:
+                fps = max(2, max_fps // 3)
+            frame_due = last_frame + 1.0 / fps
+
+            # Without a subscription (daemon down, or too old for the control
+            # socket) the state channel is polled at the frame rate instead.
+            if music_events.sock is None:
+                pending = True
+            if pending or animating:
+                deadline = frame_due
+            else:
+                deadline = next_proc
+                if synced:
+                    deadline = min(deadline, music_reader.last_good + 2.0)
+            deadline = min(deadline, next_proc)
+            if meters == "cores":
+                deadline = min(deadline, next_core)
+            events = sel.select(timeout=max(0.0, deadline - now))
+
+            for key, _mask in events:
+                if key.data == "stdin":
+                    pending_keys.extend(read_keys(stdscr))
+                elif key.data == "wake":
+                    try:
+                        while wake_r.recv(256):
+                            pass
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                elif key.data == "music":
+                    if not music_events.drain():
+                        sel.unregister(music_events)
+                        music_events.close()
+                    pending = True
+
+            while pending_keys:
+                key = pending_keys.pop(0)
+                if key == 27 and pending_keys[:2] in ([91, 73], [91, 79]):
+                    focused = pending_keys[1] == 73
+                    del pending_keys[:2]
+                    pending = True
+                    continue
+                if key in (ord("q"), ord("Q")):
+                    running = False
+                if key in (ord("t"), ord("T")):
+                    request_next_track()
+                if key in (ord("p"), ord("P")):
+                    show_perf = not show_perf
+                    pending = True
+                if key in (ord("m"), ord("M")) and core_stat is not None:
+                    meters = METER_MODES[(METER_MODES.index(meters) + 1) % len(METER_MODES)]
+                    next_core = 0.0
+                    pending = True
+                if key in (ord("c"), ord("C")) and not (args.bar_color or args.peak_color or args.text_color):
+                    palette_name = next_palette_name(palette_name)
+                    args.palette = palette_name
+                    palette = choose_palette(args)
+                    init_colors(stdscr, palette)
+                    screen.invalidate()
+                    pending = True
+            if not running:
+                break
+
+            if resized:
+                resized = False
+                try:
+                    size = os.get_terminal_size(sys.stdout.fileno())
+                    curses.resizeterm(size.lines, size.columns)
+                except OSError:
+                    pass
+                pending = True
+
+            now = time.monotonic()
+            if now >= next_proc:
+                next_proc = now + PROC_REFRESH_SECONDS
+                pending = True
+            if meters == "cores" and core_stat is not None and now >= next_core:
+                next_core = now + CORE_SAMPLE_SECONDS
+                try:
+                    core_usage, core_online = core_stat.sample()
+                except (OSError, ValueError):
+                    core_stat = None
+                    meters = "music"
+                pending = True
+            if synced and now - music_reader.last_good > 2.0:
+                pending = True
+            if not (pending or animating) or now < frame_due:
+                continue
+            pending = False
 
+            t0 = time.process_time()
+            m0 = time.monotonic()
+            h, w = stdscr.getmaxyx()
             usage = cpu_reader.total_usage()
-            t = time.monotonic()
             file_levels, music_stats, synced = music_reader.read()
+            m1 = time.monotonic()
+            times.add("read", m1 - m0)
+            prev_levels = levels
             if synced:
                 levels = file_levels
             else:
-                levels = generate_spectrum(usage, t, levels)
-
-            header_used = draw_header(stdscr, w, palette_name)
-
-            vis_top = header_used
-            vis_used = draw_bars(stdscr, vis_top, w, levels)
+                levels = generate_spectrum(usage, now, levels)
+            # Keep drawing while the smoothed meters are still settling.
+            animating = not synced or any(abs(a - b) > 0.01 for a, b in zip(levels, prev_levels))
 
-            proc_top = vis_top + vis_used + 1
-            max_rows = max(3, h - proc_top - 2)
+            if meters == "cores":
+                _cols, core_rows, _heat = core_layout(w, len(core_usage))
+                proc_top = HEADER_ROWS + core_rows + 3
+            else:
+                proc_top = HEADER_ROWS + VIS_ROWS + 1
+            max_rows = max(3, h - proc_top - (3 if show_perf else 2))
             rows = proc_reader.top_processes(max_rows)
-            draw_process_table(stdscr, proc_top, w, rows)
+            m2 = time.monotonic()
+            times.add("procs", m2 - m1)
 
+            if now >= next_cost:
+                shown_cost = round(frame_cost * 1000, 1)
+                next_cost = now + FRAME_COST_SECONDS
             if synced:
                 footer = (
                     f" cpu={music_stats['cpu']:4.1f}% ram={music_stats['ram']:4.1f}% "
                     f"gpu={music_stats['gpu']:4.1f}% vram={music_stats['vram']:4.1f}% "
                     f"bpm={music_stats['tempo']:5.1f}  preset={music_stats['preset'][:16]} "
                     f"next={int(max(0.0, music_stats['next_in'])):>3}s  music={music_mode}/synced  "
+                    f"fps={fps} frame={shown_cost:.1f}ms  "
                     f"colors: --palette {palette_name} or --bar-color/--peak-color/--text-color "
                 )
             else:
                 footer = (
-                    f" load={usage:5.1f}%  fps={int(1/refresh)}  music={music_mode}/unsynced  "
+                    f" load={usage:5.1f}%  fps={fps} frame={shown_cost:.1f}ms  "
+                    f"music={music_mode}/unsynced  "
                     f"colors: --palette {palette_name} or --bar-color/--peak-color/--text-color "
                 )
             if len(footer) >= w:
                 footer = footer[: w - 1]
-            stdscr.addstr(h - 1, 0, footer.ljust(w - 1), curses.color_pair(1))
-
-            stdscr.refresh()
-
-            key = stdscr.getch()
-            if key in (ord("q"), ord("Q")):
-                break
-            if key in (ord("t"), ord("T")):
-                request_next_track()
-            if key in (ord("c"), ord("C")) and not (args.bar_color or args.peak_color or args.text_color):
-                palette_name = next_palette_name(palette_name)
-                args.palette = palette_name
-                palette = choose_palette(args)
-                init_colors(stdscr, palette)
-
-            time.sleep(refresh)
+            overlay = ""
+            if show_perf:
+                # Timings are p50/p99 in ms; the daemon's come through the
+                # state channel.
+                daemon = "daemon"
+                if synced:
+                    daemon = f"daemon {music_stats['audio_format']} wake={music_stats['wakeups']:.0f}/s"
+                    if music_stats["sink_drops"]:
+                        daemon += f" drops={music_stats['sink_drops']}"
+                overlay = (
+                    " " + format_perf(daemon, music_stats["perf"] if synced else {}, DAEMON_PERF_STAGES)
+                    + " | " + format_perf("tui", times.summary(), TUI_STAGES)
+                )[: w - 1]
+
+            last_frame = now
+            # Skip the redraw entirely when nothing visible changed.
+            if meters == "cores":
+                meter_sig = tuple(int(x * 100) for x in core_usage) + tuple(core_online)
+            else:
+                meter_sig = tuple(int(x * 100) for x in levels)
+            sig = (h, w, palette, meters, meter_sig, tuple(rows), footer, overlay)
+            if sig == last_sig:
+                continue
+            last_sig = sig
+
+            if (h, w) != screen.getmaxyx():
+                screen.resize()
+            screen.erase()
+            if not screen.static_rows:
+                # The logo only changes with the terminal size.
+                screen.static_rows = draw_header(screen, w, palette_name)
+            vis_top = screen.static_rows
+            m3 = time.monotonic()
+            if meters == "cores":
+                vis_used = draw_cores(screen, vis_top, w, core_usage, core_online)
+            else:
+                vis_used = draw_bars(screen, vis_top, w, levels)
+            m4 = time.monotonic()
+            draw_process_table(screen, vis_top + vis_used + 1, w, rows)
+            if overlay:
+                screen.addstr(h - 2, 0, overlay.ljust(w - 1), curses.color_pair(3) | curses.A_BOLD)
+            screen.addstr(h - 1, 0, footer.ljust(w - 1), curses.color_pair(1))
+            m5 = time.monotonic()
+            screen.flush()
+            times.add("meters", m4 - m3)
+            times.add("table", m5 - m4)
+            times.add("flush", time.monotonic() - m5)
+            frame_cost += 0.2 * ((time.process_time() - t0) - frame_cost)
     finally:
+        sys.stdout.write("\x1b[?1004l")
+        sys.stdout.flush()
+        signal.set_wakeup_fd(old_wakeup)
+        sel.close()
+        wake_r.close()
+        wake_w.close()
+        music_events.close()
+        if core_stat is not None:
+            core_stat.close()
         if music_proc is not None and music_proc.poll() is None:
             try:
                 music_proc.terminate()
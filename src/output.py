@@ -0,0 +1,216 @@
+import fcntl
+import os
+import termios
+import threading
+import time
+from array import array
+from collections import deque
+
+DEFAULT_LOOKAHEAD_MS = 300
+DEFAULT_BLOCK_MS = 100
+F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+F_GETPIPE_SZ = getattr(fcntl, "F_GETPIPE_SZ", 1032)
+WAKEUP_WINDOW = 2.0
+PIPE_PAGE = 4096
+PIPE_MIN = 16384
+PACE_TRIES = 4
+PACE_MIN_SLEEP = 0.002
+
+
+# Bounded FIFO of pre-rendered PCM blocks. Capacity is expressed in bytes of
+# audio so the look-ahead stays constant while the step length drifts.
+class PcmRing:
+    def __init__(self, capacity_bytes):
+        self.capacity = max(1, int(capacity_bytes))
+        self.blocks = deque()
+        self.fill = 0
+        self.fill_at_get = 0
+        self.waits = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def put(self, pcm, payload):
+        with self.cond:
+            while not self.closed and self.blocks and self.fill + len(pcm) > self.capacity:
+                self.cond.wait()
+                self.waits += 1
+            if self.closed:
+                return False
+            self.blocks.append((memoryview(pcm), payload))
+            self.fill += len(pcm)
+            self.cond.notify_all()
+            return True
+
+    def take(self, nbytes, timeout):
+        # Up to nbytes of queued PCM as memoryview slices, with the payloads
+        # of the steps that start inside them. Waits for a full block unless
+        # the ring closes or the wait times out. A step that straddles the
+        # end stays queued as a view of its remainder.
+        with self.cond:
+            if self.fill < nbytes and not self.closed:
+                self.cond.wait_for(lambda: self.fill >= nbytes or self.closed, timeout)
+            if not self.blocks:
+                return None
+            views = []
+            payloads = []
+            size = 0
+            while self.blocks and size < nbytes:
+                pcm, payload = self.blocks.popleft()
+                if payload is not None:
+                    payloads.append(payload)
+                if size + len(pcm) > nbytes:
+                    cut = nbytes - size
+                    self.blocks.appendleft((pcm[cut:], None))
+                    pcm = pcm[:cut]
+                views.append(pcm)
+                size += len(pcm)
+            self.fill_at_get = self.fill
+            self.fill -= size
+            self.cond.notify_all()
+            return views, payloads
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+def pipe_queued(fd):
+    # Bytes written to the pipe that the player hasn't read yet.
+    buf = array("i", [0])
+    fcntl.ioctl(fd, termios.FIONREAD, buf)
+    return buf[0]
+
+
+def size_pipe(fd, nbytes):
+    # Ask for a pipe that holds about nbytes (Linux only; the kernel rounds
+    # up to a power of two pages). Returns the size in effect, or None when
+    # it can't be queried.
+    try:
+        fcntl.fcntl(fd, F_SETPIPE_SZ, max(PIPE_MIN, nbytes))
+    except OSError:
+        pass
+    try:
+        return fcntl.fcntl(fd, F_GETPIPE_SZ)
+    except OSError:
+        return None
+
+
+def write_views(fd, views):
+    # One writev per block; short writes resume from a slice of the view.
+    while views:
+        n = os.writev(fd, views)
+        while views and n >= len(views[0]):
+            n -= len(views[0])
+            views.pop(0)
+        if n:
+            views[0] = views[0][n:]
+
+
+# Drains a PcmRing into a sink (see sinks.py) on its own thread, one block
+# of block_bytes per wakeup regardless of the step length. Each block goes
+# out as the ring's views, once the sink has room for all of it. The state
+# payload of the last step in the block is published right before the block
+# is written, so the visualizer follows what is being played rather than
+# what has just been rendered.
+class AudioWriter(threading.Thread):
+    def __init__(self, ring, sink, block_bytes, on_block, times=None, on_pcm=None):
+        super().__init__(name="linuxlofi-writer", daemon=True)
+        self.times = times
+        self.ring = ring
+        self.sink = sink
+        self.bytes_per_sec = sink.fmt.bytes_per_sec
+        self.block_bytes = block_bytes
+        self.on_block = on_block
+        # Optional tap that sees every block's views right before the write.
+        self.on_pcm = on_pcm
+        self.underruns = 0
+        self.failed = False
+        # Wakeups of the render and writer threads, for the power-minded.
+        self.wakeups = 0
+        self.wake_mark = (time.monotonic(), 0)
+        self.wake_rate = 0.0
+
+    def wakeup_rate(self):
+        now = time.monotonic()
+        total = self.wakeups + self.ring.waits
+        since, count = self.wake_mark
+        if now - since >= WAKEUP_WINDOW:
+            self.wake_rate = (total - count) / (now - since)
+            self.wake_mark = (now, total)
+        return self.wake_rate
+
+    def buffer_stats(self):
+        fill = self.ring.fill_at_get
+        sinks = self.sink.stats()
+        return {
+            "underruns": self.underruns,
+            "buffer_ms": 1000.0 * fill / self.bytes_per_sec,
+            "buffer_fill": min(1.0, fill / self.ring.capacity),
+            "block_ms": 1000.0 * self.block_bytes / self.bytes_per_sec,
+            "wakeups_per_sec": self.wakeup_rate(),
+            "sinks": sinks,
+            "sink_latency_ms": max(s["latency_ms"] for s in sinks.values()),
+            "sink_drops": sum(s["drops"] for s in sinks.values()),
+            # How long until this block is heard, for the visualizers.
+            "output_delay_ms": 1000.0 * self.sink.delay(),
+            "output_buffer_ms": 1000.0 * self.sink.buffer_seconds,
+        }
+
+    def run(self):
+        # Track how much audio the sink has been handed against wall time;
+        # if a block shows up after that audio would have run out, the
+        # sink starved.
+        clock_start = None
+        written = 0
+        while True:
+            item = self.ring.take(self.block_bytes, 0.25)
+            self.wakeups += 1
+            if item is None:
+                if self.ring.closed:
+                    break
+                continue
+            views, payloads = item
+            size = sum(len(view) for view in views)
+            try:
+                self.wakeups += self.sink.wait(size)
+            except OSError:
+                self.failed = True
+                self.ring.close()
+                break
+            now = time.monotonic()
+            if clock_start is None:
+                clock_start = now
+            elif now > clock_start + written / self.bytes_per_sec:
+                self.underruns += 1
+                clock_start = now
+                written = 0
+            t0 = time.monotonic()
+            if payloads:
+                payload = payloads[-1]
+                payload.update(self.buffer_stats())
+                self.on_block(payload)
+            if self.on_pcm is not None:
+                self.on_pcm(views)
+            t1 = time.monotonic()
+            try:
+                self.sink.write(views)
+            except OSError:
+                self.failed = True
+                self.ring.close()
+                break
+            written += size
+            if self.times is not None:
+                self.times.add("state", t1 - t0)
+                self.times.add("write", time.monotonic() - t1)
+
+
+def block_bytes(block_ms, bytes_per_sec, frame_bytes):
+    # Frame-aligned write size for block_ms of audio.
+    frames = int(bytes_per_sec * max(5, min(500, block_ms)) / 1000.0) // frame_bytes
+    return max(1, frames) * frame_bytes
+
+
+def lookahead_bytes(lookahead_ms, bytes_per_sec):
+    return int(bytes_per_sec * max(50, min(2000, lookahead_ms)) / 1000.0)
+
@@ -0,0 +1,83 @@
+import os
+import time
+from array import array
+
+import procfs
+
+PERF_WINDOW = 256
+SUMMARY_SECONDS = 0.5
+
+
+# Own CPU share from utime+stime in /proc/self/stat (all threads), read with
+# pread on a persistent handle; process_time() elsewhere.
+class SelfCpu:
+    def __init__(self):
+        self.file = None
+        if procfs.IS_LINUX:
+            try:
+                self.file = procfs.ProcFile(f"/proc/{os.getpid()}/stat", 1024)
+            except OSError:
+                self.file = None
+        self.hz = float(os.sysconf("SC_CLK_TCK")) if hasattr(os, "sysconf") else 100.0
+        self.prev = None
+
+    def _cpu_seconds(self):
+        if self.file is not None:
+            try:
+                _comm, ticks, _start, _rss = procfs.parse_pid_stat(self.file.read().tobytes())
+                return ticks / self.hz
+            except (OSError, ValueError, IndexError):
+                self.file.close()
+                self.file = None
+        return time.process_time()
+
+    def sample(self):
+        # Percent of one core used since the previous call.
+        now = time.monotonic()
+        cpu = self._cpu_seconds()
+        prev, self.prev = self.prev, (now, cpu)
+        if prev is None or now <= prev[0]:
+            return 0.0
+        return 100.0 * (cpu - prev[1]) / (now - prev[0])
+
+
+# Rolling per-stage timings. Each stage keeps the last PERF_WINDOW durations
+# in a ring; add() is a couple of array stores so it can sit on hot paths,
+# and every stage is fed from a single thread. Percentiles are computed on
+# summary(), at most every SUMMARY_SECONDS.
+class StageTimes:
+    def __init__(self, stages, window=PERF_WINDOW):
+        self.window = window
+        self.rings = {name: array("d", [0.0] * window) for name in stages}
+        self.counts = dict.fromkeys(stages, 0)
+        self.cpu = SelfCpu()
+        self.cpu.sample()
+        self.cached = None
+        self.cached_at = 0.0
+
+    def add(self, stage, seconds):
+        n = self.counts[stage]
+        self.rings[stage][n % self.window] = seconds
+        self.counts[stage] = n + 1
+
+    def percentiles(self, stage):
+        n = min(self.counts[stage], self.window)
+        if not n:
+            return 0.0, 0.0
+        vals = sorted(self.rings[stage][:n])
+        return vals[n // 2], vals[min(n - 1, (n * 99) // 100)]
+
+    def summary(self):
+        # {"<stage>_p50": ms, "<stage>_p99": ms, ..., "self_cpu": %}
+        now = time.monotonic()
+        if self.cached is not None and now - self.cached_at < SUMMARY_SECONDS:
+            return self.cached
+        out = {}
+        for stage in self.rings:
+            p50, p99 = self.percentiles(stage)
+            out[f"{stage}_p50"] = 1000.0 * p50
+            out[f"{stage}_p99"] = 1000.0 * p99
+        out["self_cpu"] = self.cpu.sample()
+        self.cached = out
+        self.cached_at = now
+        return out
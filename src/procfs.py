@@ -0,0 +1,394 @@
+import heapq
+import operator
+import os
+import platform
+import pwd
+import resource
+from array import array
+
+IS_LINUX = platform.system().lower() == "linux"
+MAX_PID_FDS = 4096
+# A pid whose stat bytes were unchanged for IDLE_SCANS scans in a row is
+# only re-read every IDLE_EVERY scans.
+IDLE_SCANS = 3
+IDLE_EVERY = 8
+
+
+# A /proc file kept open for the life of the process and re-read with pread
+# into one reusable buffer: one syscall per sample instead of open/read/close.
+class ProcFile:
+    def __init__(self, path, size=4096, grow=True):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+        self.grow = grow
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+
+    def read(self):
+        # Returns a memoryview over the internal buffer; it is only valid
+        # until the next read().
+        while True:
+            if hasattr(os, "preadv"):
+                n = os.preadv(self.fd, [self.buf], 0)
+            else:
+                data = os.pread(self.fd, len(self.buf), 0)
+                n = len(data)
+                self.buf[:n] = data
+            if n < len(self.buf) or not self.grow:
+                return self.view[:n]
+            self.resize(len(self.buf) * 2)
+
+    def resize(self, size):
+        # New buffer, same fd; earlier read() views become invalid.
+        self.view.release()
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+_files = {}
+
+
+def open_proc(path, size=4096, grow=True):
+    # Shared, lazily opened handles; None when the file is not available.
+    if path in _files:
+        return _files[path]
+    handle = None
+    if IS_LINUX:
+        try:
+            handle = ProcFile(path, size, grow)
+        except OSError:
+            handle = None
+    _files[path] = handle
+    return handle
+
+
+def parse_cpu_line(line):
+    vals = [int(x) for x in line.split()[1:]]
+    idle = vals[3] + vals[4]
+    return sum(vals), idle
+
+
+def cpu_totals():
+    # (total, idle) jiffies from the aggregate "cpu" line of /proc/stat. Only
+    # the head of the file is read; the per-IRQ lines after it can be huge.
+    f = open_proc("/proc/stat", 256, grow=False)
+    if f is None:
+        return None
+    data = f.read().tobytes()
+    end = data.find(b"\n")
+    if end < 0:
+        return None
+    return parse_cpu_line(data[:end])
+
+
+# Per-core utilisation from every cpuN line of /proc/stat, parsed in one
+# pass. Counters live in preallocated arrays indexed by CPU id; they grow
+# when a higher id shows up, and a CPU that goes offline reads as 0 until it
+# has two samples again after coming back.
+class CoreStat:
+    def __init__(self, path="/proc/stat", size=16384):
+        self.path = path
+        self.file = None
+        self.size = size
+        self.count = 0
+        self.prev_total = array("Q")
+        self.prev_idle = array("Q")
+        self.seen = array("b")
+        self.usage = array("d")
+        self.online = array("b")
+
+    def _read(self):
+        if self.file is None:
+            self.file = ProcFile(self.path, self.size, grow=False)
+        # Only the head of the file is needed; grow until it reaches the
+        # first line after the cpu block.
+        while True:
+            data = self.file.read().tobytes()
+            if b"\nintr" in data or len(data) < len(self.file.buf):
+                return data
+            self.file.resize(len(self.file.buf) * 2)
+
+    def _resize(self, count):
+        extra = count - self.count
+        self.prev_total.extend([0] * extra)
+        self.prev_idle.extend([0] * extra)
+        self.seen.extend([0] * extra)
+        self.usage.extend([0.0] * extra)
+        self.online.extend([0] * extra)
+        self.count = count
+
+    def sample(self):
+        # Returns (usage, online): per-CPU-id fractions in 0..1 and a 0/1
+        # online flag. Both are the reader's own arrays, updated in place.
+        data = self._read()
+        online = self.online
+        for i in range(self.count):
+            online[i] = 0
+        for line in data.split(b"\n"):
+            if not line.startswith(b"cpu"):
+                if line and self.count:
+                    break
+                continue
+            head, _, rest = line.partition(b" ")
+            if len(head) == 3:
+                continue
+            cpu = int(head[3:])
+            if cpu >= self.count:
+                self._resize(cpu + 1)
+            vals = [int(x) for x in rest.split()]
+            total = sum(vals)
+            idle = vals[3] + vals[4]
+            dt = total - self.prev_total[cpu]
+            if self.seen[cpu] and dt > 0:
+                self.usage[cpu] = max(0.0, min(1.0, (dt - (idle - self.prev_idle[cpu])) / dt))
+            else:
+                self.usage[cpu] = 0.0
+            self.prev_total[cpu] = total
+            self.prev_idle[cpu] = idle
+            self.seen[cpu] = 1
+            online[cpu] = 1
+        for i in range(self.count):
+            if not online[i]:
+                self.seen[i] = 0
+                self.usage[i] = 0.0
+        return self.usage, online
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def _meminfo_field(data, key):
+    i = data.find(key)
+    if i < 0:
+        return None
+    i += len(key)
+    end = data.find(b"k", i)
+    return int(data[i:end])
+
+
+def mem_totals():
+    # (MemTotal, MemAvailable) in kB from /proc/meminfo.
+    f = open_proc("/proc/meminfo")
+    if f is None:
+        return None
+    data = f.read().tobytes()
+    total = _meminfo_field(data, b"MemTotal:")
+    avail = _meminfo_field(data, b"MemAvailable:")
+    if total is None:
+        return None
+    return total, avail or 0
+
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def parse_pid_stat(data):
+    # comm may contain spaces and parentheses, so split around the last ")".
+    lpar = data.find(b"(")
+    rpar = data.rfind(b")")
+    comm = data[lpar + 1 : rpar].decode("utf-8", "replace")
+    fields = data[rpar + 2 :].split()
+    ticks = int(fields[11]) + int(fields[12])
+    start = int(fields[19])
+    rss = int(fields[21])
+    return comm, ticks, start, rss
+
+
+def parse_status_uid(data):
+    i = data.find(b"\nUid:")
+    if i < 0:
+        return None
+    return int(data[i + 5 : data.find(b"\n", i + 5)].split()[0])
+
+
+class ProcRecord:
+    __slots__ = ("pid", "fd", "raw", "start", "ticks", "at", "idle", "cpu", "mem", "uid", "comm", "row")
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.fd = None
+        self.raw = b""
+        self.start = 0
+        self.ticks = 0
+        self.at = None
+        self.idle = 0
+        self.cpu = 0.0
+        self.mem = 0.0
+        self.uid = None
+        self.comm = ""
+        self.row = None
+
+
+# In-process replacement for `ps -eo pid,user,pcpu,pmem,comm` on Linux. CPU%
+# is computed from jiffy deltas between scans, so it reflects the last
+# interval instead of the process' lifetime average. `root` can point at a
+# fake procfs tree.
+#
+# Records persist across refreshes: each pid's stat file stays open (up to an
+# fd budget) and is re-read with pread, records whose stat bytes did not
+# change are left alone, dead pids are dropped, and top() only selects the
+# rows that are actually shown. Idle pids are re-read only every IDLE_EVERY
+# scans (staggered by pid), so after the directory listing a scan costs
+# about one pread per busy process plus a slice of the idle ones; a sleeper
+# that wakes up shows up at most IDLE_EVERY scans late. CPU% is taken over
+# each record's own interval between reads.
+class ProcScanner:
+    def __init__(self, root="/proc", max_fds=MAX_PID_FDS):
+        self.root = root
+        self.clk_tck = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.page_kb = (os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096) // 1024
+        try:
+            soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+            if soft != resource.RLIM_INFINITY:
+                max_fds = min(max_fds, soft // 2)
+        except (ValueError, OSError):
+            pass
+        self.max_fds = max_fds
+        self.open_fds = 0
+        self.records = {}
+        self.scans = 0
+        self.users = {}
+        self.top_cache = {}
+        self.changed = 0
+        self.reads = 0
+
+    def available(self):
+        return IS_LINUX and os.path.exists(os.path.join(self.root, "stat"))
+
+    def username(self, uid):
+        name = self.users.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self.users[uid] = name
+        return name
+
+    def _uptime(self):
+        try:
+            return float(_read_bytes(os.path.join(self.root, "uptime")).split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _mem_total_kb(self):
+        try:
+            data = _read_bytes(os.path.join(self.root, "meminfo"))
+        except OSError:
+            return 1
+        return _meminfo_field(data, b"MemTotal:") or 1
+
+    def _drop(self, pid):
+        rec = self.records.pop(pid, None)
+        if rec is not None and rec.fd is not None:
+            try:
+                os.close(rec.fd)
+            except OSError:
+                pass
+            self.open_fds -= 1
+
+    def _read_stat(self, rec):
+        path = f"{self.root}/{rec.pid}/stat"
+        if rec.fd is None and self.open_fds < self.max_fds:
+            rec.fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+            self.open_fds += 1
+        if rec.fd is not None:
+            return os.pread(rec.fd, 1024, 0)
+        return _read_bytes(path)
+
+    def _update(self, rec, raw, now, mem_total):
+        comm, ticks, start, rss = parse_pid_stat(raw)
+        hz = float(self.clk_tck)
+        if rec.raw and start == rec.start and now is not None and rec.at is not None and now > rec.at:
+            rec.cpu = 100.0 * (ticks - rec.ticks) / hz / (now - rec.at)
+        elif now is not None:
+            # First sighting: fall back to the lifetime average like ps does.
+            rec.cpu = 100.0 * ticks / hz / max(1e-3, now - start / hz)
+        else:
+            rec.cpu = 0.0
+        if rec.uid is None or start != rec.start:
+            rec.uid = parse_status_uid(_read_bytes(f"{self.root}/{rec.pid}/status"))
+        rec.raw = raw
+        rec.start = start
+        rec.ticks = ticks
+        rec.at = now
+        rec.comm = comm
+        rec.mem = 100.0 * rss * self.page_kb / mem_total
+        rec.row = None
+
+    def refresh(self):
+        now = self._uptime()
+        mem_total = self._mem_total_kb()
+        pids = {int(name) for name in os.listdir(self.root) if name.isdigit()}
+        for pid in self.records.keys() - pids:
+            self._drop(pid)
+
+        changed = 0
+        reads = 0
+        records = self.records
+        scan = self.scans
+        for pid in pids:
+            rec = records.get(pid)
+            if rec is None:
+                rec = records[pid] = ProcRecord(pid)
+            elif rec.idle >= IDLE_SCANS and (scan + pid) % IDLE_EVERY:
+                continue
+            try:
+                raw = self._read_stat(rec)
+                reads += 1
+                if raw == rec.raw:
+                    rec.idle += 1
+                    rec.at = now
+                    if rec.cpu:
+                        rec.cpu = 0.0
+                        rec.row = None
+                        changed += 1
+                    continue
+                rec.idle = 0
+                self._update(rec, raw, now, mem_total)
+                changed += 1
+            except (OSError, ValueError, IndexError):
+                self._drop(pid)
+
+        self.scans = scan + 1
+        self.reads = reads
+        self.changed = changed
+        self.top_cache = {}
+
+    def top(self, limit=None):
+        rows = self.top_cache.get(limit)
+        if rows is not None:
+            return rows
+        if limit is None:
+            picked = sorted(self.records.values(), key=_cpu_key, reverse=True)
+        else:
+            picked = heapq.nlargest(limit, self.records.values(), key=_cpu_key)
+        rows = []
+        for rec in picked:
+            if rec.row is None:
+                user = self.username(rec.uid) if rec.uid is not None else "?"
+                rec.row = (str(rec.pid), user, f"{rec.cpu:.1f}", f"{rec.mem:.1f}", rec.comm)
+            rows.append(rec.row)
+        self.top_cache[limit] = rows
+        return rows
+
+    def scan(self, limit=None):
+        self.refresh()
+        return self.top(limit)
+
+    def close(self):
+        for pid in list(self.records):
+            self._drop(pid)
+
+
+_cpu_key = operator.attrgetter("cpu")
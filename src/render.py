@@ -0,0 +1,164 @@
+import json
+import math
+import random
+import shutil
+import subprocess
+import time
+import wave
+
+from sampler import EMPTY_SNAPSHOT
+
+
+# Deterministic stand-in for live metrics: a few slow sines per metric with
+# seeded periods and phases, plus occasional CPU/GPU bursts.
+class SyntheticMetrics:
+    def __init__(self, seed=0):
+        rng = random.Random(seed)
+        self.waves = {
+            name: [(rng.uniform(20.0, 180.0), rng.uniform(0.0, 2 * math.pi)) for _ in range(3)]
+            for name in ("cpu", "ram", "gpu", "vram")
+        }
+        self.base = {"cpu": 30.0, "ram": 45.0, "gpu": 25.0, "vram": 35.0}
+        self.rng = random.Random(seed + 1)
+        self.burst_until = 0.0
+        self.next_burst = self.rng.uniform(20.0, 90.0)
+
+    def at(self, t):
+        if t >= self.next_burst:
+            self.burst_until = t + self.rng.uniform(4.0, 15.0)
+            self.next_burst = self.burst_until + self.rng.uniform(30.0, 120.0)
+        vals = {}
+        for name, waves in self.waves.items():
+            v = self.base[name] + sum(12.0 * math.sin(2 * math.pi * t / period + phase) for period, phase in waves)
+            if name in ("cpu", "gpu") and t < self.burst_until:
+                v += 50.0
+            vals[name] = max(0.0, min(100.0, v))
+        return EMPTY_SNAPSHOT._replace(**vals)
+
+
+# Replays metrics recorded as JSON lines with ts/cpu/ram/gpu/vram, such as
+# the output of `linuxlofi-music subscribe`. The trace loops when the render
+# is longer than the recording.
+class TraceMetrics:
+    def __init__(self, path):
+        self.samples = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("ok "):
+                    line = line[3:]
+                if not line.startswith("{"):
+                    continue
+                data = json.loads(line)
+                self.samples.append(
+                    (
+                        float(data.get("ts", 0.0)),
+                        EMPTY_SNAPSHOT._replace(
+                            **{k: float(data.get(k, 0.0)) for k in ("cpu", "ram", "gpu", "vram")}
+                        ),
+                    )
+                )
+        if not self.samples:
+            raise ValueError(f"no metrics in trace {path}")
+        t0 = self.samples[0][0]
+        self.samples = [(ts - t0, snap) for ts, snap in self.samples]
+        self.length = self.samples[-1][0] + 1e-3
+        self.i = 0
+
+    def at(self, t):
+        t %= self.length
+        if t < self.samples[self.i][0]:
+            self.i = 0
+        while self.i + 1 < len(self.samples) and self.samples[self.i + 1][0] <= t:
+            self.i += 1
+        return self.samples[self.i][1]
+
+
+class RawOutput:
+    def __init__(self, path):
+        self.f = open(path, "wb")
+
+    def write(self, pcm):
+        self.f.write(pcm)
+
+    def close(self):
+        self.f.close()
+
+
+class WavOutput:
+    def __init__(self, path, fmt):
+        if fmt.sample != "s16":
+            raise ValueError("WAV output is 16-bit only; use a raw file for f32")
+        self.w = wave.open(path, "wb")
+        self.w.setnchannels(fmt.channels)
+        self.w.setsampwidth(2)
+        self.w.setframerate(fmt.rate)
+
+    def write(self, pcm):
+        self.w.writeframesraw(pcm)
+
+    def close(self):
+        self.w.close()
+
+
+# FLAC has no stdlib encoder; pipe raw PCM through flac or ffmpeg.
+class FlacOutput:
+    def __init__(self, path, fmt):
+        if fmt.sample != "s16":
+            raise ValueError("FLAC output is 16-bit only; use a raw file for f32")
+        sr, ch = fmt.rate, fmt.channels
+        if shutil.which("flac"):
+            cmd = [
+                "flac", "--silent", "--force", "--force-raw-format", "--endian=little", "--sign=signed",
+                f"--channels={ch}", "--bps=16", f"--sample-rate={sr}", "-o", path, "-",
+            ]
+        elif shutil.which("ffmpeg"):
+            cmd = [
+                "ffmpeg", "-loglevel", "error", "-y", "-f", "s16le", "-ar", str(sr), "-ac", str(ch), "-i", "-", path,
+            ]
+        else:
+            raise RuntimeError("FLAC output needs flac or ffmpeg on PATH")
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, pcm):
+        self.proc.stdin.write(pcm)
+
+    def close(self):
+        self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError("FLAC encoder failed")
+
+
+def open_output(path, fmt):
+    lower = path.lower()
+    if lower.endswith(".wav"):
+        return WavOutput(path, fmt)
+    if lower.endswith(".flac"):
+        return FlacOutput(path, fmt)
+    return RawOutput(path)
+
+
+def render_offline(engine, metrics, out, duration, commands=None):
+    # Runs the engine on a virtual clock as fast as it can go. The last
+    # step is trimmed so the output is exactly `duration` seconds long.
+    # `commands`, if given, maps an engine frame to the control commands
+    # due by then. Returns (audio seconds, wall seconds).
+    total = int(engine.sr * duration)
+    done = 0
+    t0 = time.perf_counter()
+    try:
+        while done < total:
+            t = done / engine.sr
+            if commands is not None:
+                for cmd, arg in commands(engine.frames):
+                    engine.command(cmd, arg)
+            pcm, _payload = engine.render_step(t, metrics.at(t))
+            frames = len(pcm) // engine.frame_bytes
+            if done + frames > total:
+                pcm = pcm[: engine.frame_bytes * (total - done)]
+                frames = total - done
+            out.write(pcm)
+            done += frames
+    finally:
+        out.close()
+    return done / engine.sr, time.perf_counter() - t0
@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import namedtuple
+
+Snapshot = namedtuple("Snapshot", "cpu ram gpu vram cpu_ts ram_ts gpu_ts")
+EMPTY_SNAPSHOT = Snapshot(0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+
+# Samples each metrics source on its own thread and cadence and publishes the
+# result as an immutable Snapshot. Readers just load `sampler.snapshot`; the
+# attribute is swapped in one assignment, so they never take a lock and a slow
+# source can never hold up the audio loop.
+class MetricsSampler:
+    def __init__(self, times=None):
+        # `times` is an optional perf.StageTimes with a "sample_<name>" stage
+        # per source.
+        self.times = times
+        self.snapshot = EMPTY_SNAPSHOT
+        self.sources = []
+        self.overruns = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def add(self, name, read, interval, timeout):
+        # `read(timeout)` returns a dict of Snapshot fields; `name` selects the
+        # timestamp field that gets bumped after each successful read.
+        self.sources.append((name, read, interval, timeout))
+        self.overruns[name] = 0
+
+    def prime(self, *names):
+        for name, read, _interval, timeout in self.sources:
+            if name in names:
+                self._sample(name, read, timeout)
+
+    def start(self):
+        for name, read, interval, timeout in self.sources:
+            t = threading.Thread(
+                target=self._loop,
+                args=(name, read, interval, timeout),
+                name=f"linuxlofi-sampler-{name}",
+                daemon=True,
+            )
+            t.start()
+            self.threads.append(t)
+
+    def stop(self):
+        self.stop_event.set()
+        for t in self.threads:
+            t.join(timeout=1.0)
+        for _name, read, _interval, _timeout in self.sources:
+            close = getattr(read, "close", None)
+            if close is not None:
+                close()
+
+    def _sample(self, name, read, timeout):
+        t0 = time.monotonic()
+        try:
+            vals = read(timeout)
+        except Exception:
+            vals = None
+        t1 = time.monotonic()
+        if self.times is not None:
+            self.times.add("sample_" + name, t1 - t0)
+        if t1 - t0 > timeout:
+            self.overruns[name] += 1
+        if vals:
+            vals[f"{name}_ts"] = t1
+            with self.lock:
+                self.snapshot = self.snapshot._replace(**vals)
+        return t1 - t0
+
+    def _loop(self, name, read, interval, timeout):
+        while not self.stop_event.is_set():
+            spent = self._sample(name, read, timeout)
+            self.stop_event.wait(max(0.0, interval - spent))
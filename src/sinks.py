@@ -0,0 +1,505 @@
+import ctypes
+import errno
+import os
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import time
+
+import alsa
+from audiofmt import AudioFormat, negotiate
+from output import PACE_MIN_SLEEP, PACE_TRIES, PIPE_PAGE, block_bytes, pipe_queued, size_pipe, write_views
+
+IS_TERMUX = bool(os.environ.get("TERMUX_VERSION")) or "com.termux" in os.environ.get("PREFIX", "")
+DEFAULT_FORMAT = AudioFormat(48000, 2, "s16")
+DEFAULT_SINKS = ("player",)
+DEFAULT_ALSA_PERIOD_MS = 25
+LATENCY_SMOOTHING = 0.1
+
+# Sample format names per player.
+PLAYER_SAMPLES = {
+    "pw-play": {"s16": "s16", "f32": "f32"},
+    "aplay": {"s16": "S16_LE", "f32": "FLOAT_LE"},
+    "mpv": {"s16": "s16le", "f32": "floatle"},
+    "ffplay": {"s16": "s16le", "f32": "f32le"},
+}
+
+
+def pipewire_rate(default=48000):
+    # The graph clock rate, so pw-play never has to resample.
+    try:
+        out = subprocess.run(
+            ["pw-metadata", "-n", "settings", "0", "clock.rate"], capture_output=True, text=True, timeout=1.0
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return default
+    match = re.search(r"value:'(\d+)'", out)
+    return int(match.group(1)) if match else default
+
+
+def preferred_format(name, overrides):
+    # PipeWire mixes in float32 at the graph rate; ALSA dmix and the
+    # ffmpeg-based players are happiest with 48 kHz s16.
+    if name == "pw-play":
+        rate = overrides.get("rate") or pipewire_rate()
+        return AudioFormat(rate, 2, "f32")
+    return DEFAULT_FORMAT
+
+
+def player_command(name, fmt):
+    sample = PLAYER_SAMPLES[name][fmt.sample]
+    rate, channels = str(fmt.rate), str(fmt.channels)
+    if name == "pw-play":
+        return ["pw-play", "--rate", rate, "--channels", channels, "--format", sample, "-"]
+    if name == "aplay":
+        return ["aplay", "-q", "-f", sample, "-r", rate, "-c", channels]
+    if name == "mpv":
+        return [
+            "mpv",
+            "--no-video",
+            "--really-quiet",
+            "--audio-display=no",
+            "--demuxer=rawaudio",
+            f"--demuxer-rawaudio-format={sample}",
+            f"--demuxer-rawaudio-rate={rate}",
+            f"--demuxer-rawaudio-channels={channels}",
+            "-",
+        ]
+    return ["ffplay", "-v", "error", "-nostats", "-nodisp", "-f", sample, "-ar", rate, "-ac", channels, "-i", "-"]
+
+
+def forced_backend():
+    return os.environ.get("LINUXLOFI_AUDIO_BACKEND", "").strip().lower()
+
+
+def get_player_candidates():
+    forced = forced_backend()
+
+    # Termux tends to work best with mpv; prefer it there.
+    if IS_TERMUX:
+        ordered = ["mpv", "ffplay", "pw-play", "aplay"]
+    else:
+        ordered = ["pw-play", "aplay", "mpv", "ffplay"]
+
+    if forced:
+        ordered = [n for n in ordered if n == forced]
+    return ordered
+
+
+def start_player(overrides=None):
+    # Returns (process, backend name, AudioFormat). Each backend gets its
+    # preferred format with the env/CLI overrides applied on top.
+    overrides = overrides or {}
+    for name in get_player_candidates():
+        if not shutil.which(name):
+            continue
+        fmt = negotiate(preferred_format(name, overrides), overrides, tuple(PLAYER_SAMPLES[name]))
+        if fmt is None:
+            continue
+        proc = None
+        try:
+            proc = subprocess.Popen(
+                player_command(name, fmt), stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            if proc.stdin is None:
+                continue
+            proc.stdin.write(b"\x00" * 4096)
+            proc.stdin.flush()
+            return proc, name, fmt
+        except Exception:
+            try:
+                proc.terminate()
+            except Exception:
+                pass
+            continue
+    forced = forced_backend()
+    if forced:
+        raise RuntimeError(f"Forced backend '{forced}' is unavailable or failed to start")
+    raise RuntimeError("No working audio backend found (tried pw-play, aplay, mpv, ffplay)")
+
+
+# Where rendered blocks go. The writer calls wait(size) before publishing
+# the block's state, so the visualizer still lines up with what is heard,
+# then write(views). wait() returns how many times it slept. Sinks never
+# copy the views; write() may consume the list it is given. Each keeps a
+# smoothed write latency and a count of blocks it had to drop. delay() is
+# how much audio, in seconds, is queued ahead of the speaker as far as the
+# sink can tell, out of buffer_seconds it holds at most.
+class Sink:
+    name = "sink"
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self.latency = 0.0
+        self.drops = 0
+        self.buffer_seconds = 0.0
+
+    def wait(self, size):
+        return 0
+
+    def delay(self):
+        return 0.0
+
+    def write(self, views):
+        t0 = time.monotonic()
+        self._write(views)
+        self.latency += LATENCY_SMOOTHING * (time.monotonic() - t0 - self.latency)
+
+    def _write(self, views):
+        raise NotImplementedError
+
+    def stats(self):
+        return {self.name: {"latency_ms": 1000.0 * self.latency, "drops": self.drops}}
+
+    def close(self):
+        pass
+
+
+# A player subprocess fed through its stdin pipe. The pipe is sized to hold
+# two blocks and each block waits until it fits, so the writev never blocks
+# halfway.
+class PlayerSink(Sink):
+    def __init__(self, proc, name, fmt, block):
+        super().__init__(fmt)
+        self.proc = proc
+        self.name = name
+        self.fd = proc.stdin.fileno()
+        self.pipe_size = size_pipe(self.fd, 2 * block)
+        self.buffer_seconds = (self.pipe_size or 0) / fmt.bytes_per_sec
+
+    def wait(self, size):
+        # Sleep until the player has drained enough of the pipe for size
+        # more bytes. Players read in bursts, so the estimate is rechecked
+        # a few times before falling back to a blocking write; a page is
+        # held back for the partly read one at the head of the pipe.
+        if self.pipe_size is None:
+            return 0
+        for tries in range(PACE_TRIES):
+            try:
+                queued = pipe_queued(self.fd)
+            except OSError:
+                self.pipe_size = None
+                return tries
+            wait = (queued + size + PIPE_PAGE - self.pipe_size) / self.fmt.bytes_per_sec
+            if wait <= 0:
+                return tries
+            time.sleep(max(wait, PACE_MIN_SLEEP))
+        return PACE_TRIES
+
+    def delay(self):
+        # Only what is still in the pipe; the player's own buffer is hidden.
+        try:
+            return pipe_queued(self.fd) / self.fmt.bytes_per_sec
+        except OSError:
+            return 0.0
+
+    def _write(self, views):
+        write_views(self.fd, views)
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.proc.terminate()
+        except Exception:
+            pass
+
+
+# Throws the audio away at the rate a sound card would take it, so headless
+# hosts still step the engine in real time and publish state and levels.
+# Stays up to `ahead_bytes` in front of the monotonic clock, about what a
+# player pipe would hold.
+class NullSink(Sink):
+    name = "null"
+
+    def __init__(self, fmt, ahead_bytes):
+        super().__init__(fmt)
+        self.ahead = ahead_bytes / fmt.bytes_per_sec
+        self.buffer_seconds = self.ahead
+        self.clock_start = None
+        self.written = 0
+
+    def wait(self, size):
+        now = time.monotonic()
+        if self.clock_start is None:
+            self.clock_start = now
+        due = self.clock_start + self.written / self.fmt.bytes_per_sec
+        if due < now:
+            # Fell behind (or just started): restart the clock from here
+            # rather than rushing to catch up.
+            self.clock_start = now
+            self.written = 0
+            return 0
+        due += size / self.fmt.bytes_per_sec
+        if due - now <= self.ahead:
+            return 0
+        time.sleep(max(due - now - self.ahead, PACE_MIN_SLEEP))
+        return 1
+
+    def delay(self):
+        if self.clock_start is None:
+            return 0.0
+        due = self.clock_start + self.written / self.fmt.bytes_per_sec
+        return max(0.0, due - time.monotonic())
+
+    def _write(self, views):
+        self.written += sum(len(view) for view in views)
+
+
+# Plays in-process through libasound (see alsa.py): no player subprocess,
+# no pipe and no context switch per block. The period is
+# LINUXLOFI_ALSA_PERIOD_MS and the buffer holds two blocks, like the player
+# pipe. Blocks are gathered into one staging buffer for writei, and drops
+# count the xruns recovered from. Devices that don't keep time, such as
+# ALSA's "null", report an empty buffer right after a write; those are
+# paced on the null sink's clock instead.
+class AlsaSink(NullSink):
+    def __init__(self, device, fmt, block, period_ms):
+        frames = block // fmt.frame_bytes
+        period = max(16, min(frames, int(fmt.rate * period_ms / 1000.0)))
+        self.pcm = alsa.AlsaPcm(device, fmt, period, 2 * frames)
+        fmt = fmt._replace(rate=self.pcm.rate)
+        super().__init__(fmt, self.pcm.buffer * fmt.frame_bytes)
+        self.name = "alsa" if device == "default" else f"alsa:{device}"
+        self.untimed = False
+        self._stage(2 * block)
+
+    def _stage(self, size):
+        self.staging = bytearray(size)
+        self.staging_c = (ctypes.c_char * size).from_buffer(self.staging)
+        self.address = ctypes.addressof(self.staging_c)
+
+    def wait(self, size):
+        if self.untimed:
+            return super().wait(size)
+        frames = size // self.fmt.frame_bytes
+        for tries in range(PACE_TRIES):
+            room = self.pcm.avail()
+            if room >= frames:
+                return tries
+            time.sleep(max((frames - room) / self.fmt.rate, PACE_MIN_SLEEP))
+        return PACE_TRIES
+
+    def delay(self):
+        if self.untimed:
+            return super().delay()
+        return self.pcm.delay() / self.fmt.rate
+
+    def _write(self, views):
+        size = sum(len(view) for view in views)
+        if size > len(self.staging):
+            del self.staging_c
+            self._stage(size)
+        pos = 0
+        for view in views:
+            self.staging[pos : pos + len(view)] = view
+            pos += len(view)
+        self.written += size
+        self.drops += self.pcm.write(self.address, size // self.fmt.frame_bytes)
+        if not self.untimed and self.pcm.avail() >= self.pcm.buffer:
+            self.untimed = True
+
+    def close(self):
+        self.pcm.close()
+
+
+# Raw PCM into a regular file or a FIFO, paced like the null sink when it is
+# the only one. FIFOs are opened read-write so a missing reader never blocks
+# the daemon, and written non-blocking: when the reader falls behind, whole
+# blocks are dropped. A block that only partly fits is finished before the
+# next one goes out, so the stream stays frame aligned.
+class FileSink(NullSink):
+    def __init__(self, path, fmt, ahead_bytes):
+        super().__init__(fmt, ahead_bytes)
+        self.path = path
+        self.name = "file:" + os.path.basename(path)
+        try:
+            self.fifo = stat.S_ISFIFO(os.stat(path).st_mode)
+        except FileNotFoundError:
+            self.fifo = False
+        if self.fifo:
+            self.fd = os.open(path, os.O_RDWR | os.O_NONBLOCK | getattr(os, "O_CLOEXEC", 0))
+        else:
+            self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_CLOEXEC", 0), 0o644)
+        self.pending = []
+
+    def _write(self, views):
+        self.written += sum(len(view) for view in views)
+        if not self.fifo:
+            write_views(self.fd, views)
+            return
+        if self.pending and not self._flush(self.pending):
+            self.drops += 1
+            return
+        self.pending = views
+        self._flush(self.pending)
+
+    def _flush(self, views):
+        # True once all of views has gone out; trims what was written.
+        try:
+            n = os.writev(self.fd, views)
+        except BlockingIOError:
+            return False
+        except OSError as exc:
+            if exc.errno != errno.EAGAIN:
+                raise
+            return False
+        while views and n >= len(views[0]):
+            n -= len(views[0])
+            views.pop(0)
+        if n:
+            views[0] = views[0][n:]
+        return not views
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+# Feeds the same views to several sinks. The first one is the clock: its
+# wait() paces the writer and its errors stop the daemon. The others get the
+# block after it and are dropped from the tee if they fail.
+class TeeSink(Sink):
+    def __init__(self, sinks):
+        super().__init__(sinks[0].fmt)
+        self.sinks = list(sinks)
+        self.name = "+".join(sink.name for sink in self.sinks)
+        self.buffer_seconds = sinks[0].buffer_seconds
+        self.failed = {}
+
+    def wait(self, size):
+        return self.sinks[0].wait(size)
+
+    def delay(self):
+        return self.sinks[0].delay()
+
+    def write(self, views):
+        clock, *rest = self.sinks
+        clock.write(list(views))
+        for sink in rest:
+            if sink.name in self.failed:
+                sink.drops += 1
+                continue
+            try:
+                sink.write(list(views))
+            except OSError as exc:
+                print(f"[linuxlofi] sink {sink.name} failed: {exc}", file=sys.stderr)
+                self.failed[sink.name] = exc
+                sink.close()
+
+    def stats(self):
+        out = {}
+        for sink in self.sinks:
+            out.update(sink.stats())
+        return out
+
+    def close(self):
+        for sink in self.sinks:
+            if sink.name not in self.failed:
+                sink.close()
+
+
+def parse_sinks(spec):
+    # "player", "alsa[:DEVICE]", "null" or "file:PATH", comma separated; the
+    # first is the clock. Empty means the default.
+    out = [part.strip() for part in (spec or "").split(",") if part.strip()]
+    for part in out:
+        if part in ("player", "alsa", "null"):
+            continue
+        if part.startswith(("alsa:", "file:")) and len(part) > 5:
+            continue
+        raise ValueError(f"bad sink {part!r}, expected player, alsa[:DEVICE], null or file:PATH")
+    return out
+
+
+def is_device(spec):
+    return spec == "player" or spec.split(":", 1)[0] == "alsa"
+
+
+def get_alsa_period_ms():
+    try:
+        return int(os.environ.get("LINUXLOFI_ALSA_PERIOD_MS", DEFAULT_ALSA_PERIOD_MS))
+    except ValueError:
+        return DEFAULT_ALSA_PERIOD_MS
+
+
+def sink_specs(cli_specs=None):
+    # --sink wins over LINUXLOFI_SINKS.
+    specs = []
+    for spec in cli_specs or ():
+        specs += parse_sinks(spec)
+    specs = specs or parse_sinks(os.environ.get("LINUXLOFI_SINKS", "")) or list(DEFAULT_SINKS)
+    if any(is_device(spec) for spec in specs[1:]):
+        raise ValueError("player and alsa sinks have to come first")
+    return specs
+
+
+def open_alsa(device, overrides, block_ms):
+    fmt = negotiate(DEFAULT_FORMAT, overrides)
+    sink = AlsaSink(device, fmt, block_bytes(block_ms, fmt.bytes_per_sec, fmt.frame_bytes), get_alsa_period_ms())
+    return sink, sink.fmt
+
+
+def open_player(overrides, block_ms):
+    # In-process ALSA when libasound is there, then the player subprocesses.
+    # LINUXLOFI_AUDIO_BACKEND=alsa insists on the former, any player name
+    # on that player.
+    forced = forced_backend()
+    if forced in ("", "alsa") and alsa.available():
+        try:
+            return open_alsa("default", overrides, block_ms)
+        except OSError as exc:
+            if forced:
+                raise RuntimeError(f"Forced backend 'alsa' failed to start: {exc}") from exc
+    proc, name, fmt = start_player(overrides)
+    return PlayerSink(proc, name, fmt, block_bytes(block_ms, fmt.bytes_per_sec, fmt.frame_bytes)), fmt
+
+
+def open_sinks(specs, overrides, block_ms):
+    # Returns (sink, AudioFormat). The first sink negotiates the format and
+    # the rest take it as is. Without a working player, and none forced, a
+    # headless host falls back to the null sink.
+    sinks = []
+    fmt = None
+    try:
+        for spec in specs:
+            if spec == "player":
+                try:
+                    sink, fmt = open_player(overrides, block_ms)
+                except RuntimeError as exc:
+                    if forced_backend():
+                        raise
+                    print(f"[linuxlofi] {exc}; playing to the null sink", file=sys.stderr)
+                    spec = "null"
+                else:
+                    sinks.append(sink)
+                    continue
+            elif spec.startswith("alsa"):
+                sink, fmt = open_alsa(spec[5:] or "default", overrides, block_ms)
+                sinks.append(sink)
+                continue
+            if fmt is None:
+                fmt = negotiate(DEFAULT_FORMAT, overrides)
+            ahead = 2 * block_bytes(block_ms, fmt.bytes_per_sec, fmt.frame_bytes)
+            if spec == "null":
+                sinks.append(NullSink(fmt, ahead))
+            else:
+                sinks.append(FileSink(spec[5:], fmt, ahead))
+    except Exception:
+        for sink in sinks:
+            sink.close()
+        raise
+    names = [sink.name for sink in sinks]
+    if len(set(names)) != len(names):
+        for sink in sinks:
+            sink.close()
+        raise ValueError(f"duplicate sinks: {', '.join(names)}")
+    if len(sinks) == 1:
+        return sinks[0], fmt
+    return TeeSink(sinks), fmt
@@ -0,0 +1,215 @@
+import errno
+import mmap
+import os
+import stat
+import struct
+
+MAGIC = b"LLST"
+VERSION = 7
+STATE_NAME = "linuxlofi-state.bin"
+
+HEADER = struct.Struct("<4sIQ")
+SEQ_OFFSET = 8
+
+# (name, struct code) in layout order. Nested payload dicts are flattened
+# with a "dict.key" name; fixed-size strings are NUL padded.
+FIELDS = [
+    ("ts", "d"),
+    ("tempo", "d"),
+    ("cpu", "d"),
+    ("ram", "d"),
+    ("gpu", "d"),
+    ("vram", "d"),
+    ("next_in", "d"),
+    ("preset_index", "i"),
+    ("levels", "8d"),
+    ("components.cpu_drive", "d"),
+    ("components.ram_warmth", "d"),
+    ("components.gpu_motion", "d"),
+    ("components.vram_spark", "d"),
+    ("underruns", "Q"),
+    ("buffer_ms", "d"),
+    ("buffer_fill", "d"),
+    ("block_ms", "d"),
+    ("wakeups_per_sec", "d"),
+    ("sink_latency_ms", "d"),
+    ("sink_drops", "Q"),
+    ("output_delay_ms", "d"),
+    ("output_buffer_ms", "d"),
+    ("drum_cache.hits", "Q"),
+    ("drum_cache.misses", "Q"),
+    ("drum_cache.entries", "I"),
+    ("sampler_overruns.cpu", "I"),
+    ("sampler_overruns.ram", "I"),
+    ("sampler_overruns.gpu", "I"),
+    ("tempo_bias", "d"),
+    ("paused", "B"),
+    ("perf.sample_cpu_p50", "d"),
+    ("perf.sample_cpu_p99", "d"),
+    ("perf.sample_ram_p50", "d"),
+    ("perf.sample_ram_p99", "d"),
+    ("perf.sample_gpu_p50", "d"),
+    ("perf.sample_gpu_p99", "d"),
+    ("perf.synth_p50", "d"),
+    ("perf.synth_p99", "d"),
+    ("perf.write_p50", "d"),
+    ("perf.write_p99", "d"),
+    ("perf.state_p50", "d"),
+    ("perf.state_p99", "d"),
+    ("perf.self_cpu", "d"),
+    ("preset", "32s"),
+    ("audio_backend", "32s"),
+    ("audio_format", "16s"),
+]
+
+BODY = struct.Struct("<" + "".join(code for _name, code in FIELDS))
+SIZE = HEADER.size + BODY.size
+SEQ = struct.Struct("<Q")
+
+
+def runtime_dir():
+    path = os.environ.get("XDG_RUNTIME_DIR", "")
+    if path and os.path.isdir(path) and os.access(path, os.W_OK):
+        return path
+    return "/tmp"
+
+
+def state_path():
+    return os.path.join(runtime_dir(), STATE_NAME)
+
+
+def _flatten(payload):
+    out = []
+    for name, code in FIELDS:
+        if "." in name:
+            outer, inner = name.split(".", 1)
+            value = (payload.get(outer) or {}).get(inner, 0)
+        else:
+            value = payload.get(name, 0)
+        if code == "8d":
+            levels = list(value or [])[:8]
+            out.extend(float(x) for x in levels + [0.0] * (8 - len(levels)))
+        elif code.endswith("s"):
+            out.append(str(value or "").encode("utf-8")[: int(code[:-1])])
+        elif code == "d":
+            out.append(float(value))
+        else:
+            out.append(max(0, int(value)))
+    return out
+
+
+def _unflatten(vals):
+    data = {}
+    i = 0
+    for name, code in FIELDS:
+        if code == "8d":
+            value = list(vals[i : i + 8])
+            i += 8
+        else:
+            value = vals[i]
+            i += 1
+            if code.endswith("s"):
+                value = value.rstrip(b"\0").decode("utf-8", "replace")
+        if "." in name:
+            outer, inner = name.split(".", 1)
+            data.setdefault(outer, {})[inner] = value
+        else:
+            data[name] = value
+    return data
+
+
+def _open_state_file(path):
+    # runtime_dir() can fall back to the shared /tmp, so never follow a
+    # symlink planted at path or write into a file someone else owns or
+    # has linked elsewhere; replace either with a fresh file of our own.
+    flags = os.O_RDWR | os.O_NOFOLLOW | getattr(os, "O_CLOEXEC", 0)
+    try:
+        fd = os.open(path, flags | os.O_CREAT, 0o644)
+    except OSError as exc:
+        if exc.errno != errno.ELOOP:
+            raise
+    else:
+        st = os.fstat(fd)
+        if stat.S_ISREG(st.st_mode) and st.st_uid == os.geteuid() and st.st_nlink == 1:
+            return fd
+        os.close(fd)
+    os.unlink(path)
+    return os.open(path, flags | os.O_CREAT | os.O_EXCL, 0o644)
+
+
+# Fixed-layout binary state block in an mmap-ed file, guarded by a seqlock:
+# the writer makes the sequence odd, writes the body, then makes it even.
+# Readers retry when they see an odd or changed sequence.
+class StateWriter:
+    def __init__(self, path=None):
+        self.path = path or state_path()
+        fd = _open_state_file(self.path)
+        try:
+            # Reuse the file in place so readers that already mapped it keep
+            # working across daemon restarts.
+            if os.fstat(fd).st_size != SIZE:
+                os.ftruncate(fd, SIZE)
+            self.map = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        magic, version, seq = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            seq = 0
+        self.seq = seq + (seq & 1)
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, self.seq)
+
+    def write(self, payload):
+        vals = _flatten(payload)
+        self.seq += 1
+        SEQ.pack_into(self.map, SEQ_OFFSET, self.seq)
+        BODY.pack_into(self.map, HEADER.size, *vals)
+        self.seq += 1
+        SEQ.pack_into(self.map, SEQ_OFFSET, self.seq)
+
+    def close(self):
+        try:
+            self.map.close()
+        except (BufferError, ValueError):
+            pass
+
+
+class StateReader:
+    def __init__(self, path=None):
+        self.path = path or state_path()
+        self.map = None
+        self.seq = 0
+
+    def _open(self):
+        try:
+            fd = os.open(self.path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+        except OSError:
+            return False
+        try:
+            if os.fstat(fd).st_size < SIZE:
+                return False
+            self.map = mmap.mmap(fd, SIZE, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        finally:
+            os.close(fd)
+        return True
+
+    def read(self):
+        # Returns (data, changed) where data is None if there is no valid
+        # state block yet and changed is True when the writer published
+        # something since the previous read().
+        if self.map is None and not self._open():
+            return None, False
+        for _ in range(4):
+            magic, version, seq1 = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or version != VERSION:
+                return None, False
+            if seq1 & 1:
+                continue
+            vals = BODY.unpack_from(self.map, HEADER.size)
+            if SEQ.unpack_from(self.map, SEQ_OFFSET)[0] != seq1:
+                continue
+            changed = seq1 != self.seq
+            self.seq = seq1
+            return _unflatten(vals), changed
+        return None, False
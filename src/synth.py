@@ -0,0 +1,335 @@
+import math
+import sys
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TWO_PI = 2.0 * math.pi
+
+DRUM_QUANTUM = 32
+DRUM_CACHE_SIZE = 48
+ENVELOPE_CACHE_SIZE = 64
+ENVELOPE_EXP_STEP = 0.01
+
+# Oscillator phases are 32-bit fixed-point turns that wrap for free, so they
+# never lose precision however long the daemon runs. The top TABLE_BITS pick
+# the wavetable entry; at 64K entries the truncation error is at most
+# 2*pi/2**16 of the amplitude, about 3 LSB on a full-scale 16-bit sine.
+# Rendering drums at DRUM_QUANTUM-rounded lengths adds more (up to ~40 LSB
+# against an exact-length render).
+PHASE_BITS = 32
+PHASE_MASK = (1 << PHASE_BITS) - 1
+TABLE_BITS = 16
+TABLE_SHIFT = PHASE_BITS - TABLE_BITS
+
+# (partials as (weight, hz), decay, pitch glide) for each drum one-shot.
+DRUMS = {
+    "kick": (((1.0, 145.0),), 13.0, -95.0),
+    "snare": (((0.7, 180.0), (0.3, 330.0)), 22.0, 0.0),
+    "hat": (((0.65, 5200.0), (0.35, 7200.0)), 56.0, 0.0),
+}
+
+_SINE = array("d", [math.sin(TWO_PI * i / (1 << TABLE_BITS)) for i in range(1 << TABLE_BITS)])
+_SINE_NP = np.frombuffer(_SINE, dtype=np.float64) if np is not None else None
+
+
+def phase_inc(hz, sr):
+    return int(round(hz / sr * (1 << PHASE_BITS))) & PHASE_MASK
+
+
+# Bounded least-recently-used cache of rendered buffers.
+class LruCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key, render, *args):
+        buf = self.entries.get(key)
+        if buf is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return buf
+        self.misses += 1
+        buf = render(*args)
+        self.entries[key] = buf
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return buf
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+# Unit-amplitude drum one-shots, keyed by voice and step length rounded up to
+# DRUM_QUANTUM samples. The tempo drifts continuously, so old lengths are
+# evicted least-recently-used first.
+class DrumCache(LruCache):
+    def __init__(self, sr, use_numpy, quantum=DRUM_QUANTUM, max_entries=DRUM_CACHE_SIZE):
+        super().__init__(max_entries)
+        self.sr = sr
+        self.use_numpy = use_numpy
+        self.quantum = quantum
+
+    def get(self, voice, n):
+        q = -(-n // self.quantum) * self.quantum
+        return self.lookup((voice, q), self._render, voice, q)
+
+    def _render(self, voice, n):
+        partials, decay, glide = DRUMS[voice]
+        sr = self.sr
+        if self.use_numpy:
+            idx = np.arange(n, dtype=np.float64)
+            g = idx / n
+            t = idx / sr
+            out = np.zeros(n)
+            for weight, hz in partials:
+                out += weight * np.sin(TWO_PI * (hz + glide * g) * t)
+            out *= np.exp(-decay * g)
+            return out
+        sin = math.sin
+        exp = math.exp
+        out = array("d", bytes(8 * n))
+        for weight, hz in partials:
+            for i in range(n):
+                out[i] += weight * sin(TWO_PI * (hz + glide * (i / n)) * (i / sr))
+        for i in range(n):
+            out[i] *= exp(-decay * (i / n))
+        return out
+
+
+# Decay curves (1 - i/n) ** exp per (step length, exponent). The pad
+# exponent follows RAM warmth, so it is rounded to ENVELOPE_EXP_STEP to keep
+# the key space small.
+class EnvelopeCache(LruCache):
+    def __init__(self, use_numpy, max_entries=ENVELOPE_CACHE_SIZE):
+        super().__init__(max_entries)
+        self.use_numpy = use_numpy
+
+    def get(self, n, exponent):
+        q = round(exponent / ENVELOPE_EXP_STEP)
+        return self.lookup((n, q), self._render, n, q * ENVELOPE_EXP_STEP)
+
+    def _render(self, n, exponent):
+        if self.use_numpy:
+            return (1.0 - np.arange(n, dtype=np.float64) / n) ** exponent
+        return array("d", [(1.0 - i / n) ** exponent for i in range(n)])
+
+
+# Stereo position of each voice, -1 (left) to 1 (right).
+VOICE_PAN = {
+    "bass": 0.0,
+    "pad0": -0.45,
+    "pad1": 0.0,
+    "pad2": 0.45,
+    "key": 0.3,
+    "kick": 0.0,
+    "snare": -0.2,
+    "hat": 0.35,
+}
+
+
+def pan_gains(pan):
+    # Equal-power pan, scaled so a centred voice keeps unit gain per side.
+    angle = (pan + 1.0) * math.pi / 4.0
+    return math.sqrt(2.0) * math.cos(angle), math.sqrt(2.0) * math.sin(angle)
+
+
+PAN_GAINS = {voice: pan_gains(pan) for voice, pan in VOICE_PAN.items()}
+
+
+# Renders one whole sequencer step per voice instead of sample by sample,
+# from a shared sine table with fixed-point phase accumulators and cached
+# envelopes, straight into the output format: mono or stereo (each voice
+# panned on a two-channel bus), s16 or f32 little-endian. NumPy is used
+# when available; otherwise array-module buffers.
+class BlockSynth:
+    def __init__(self, sr, use_numpy=None, channels=1, sample="s16"):
+        self.sr = sr
+        self.channels = channels
+        self.sample = sample
+        self.use_numpy = np is not None if use_numpy is None else (use_numpy and np is not None)
+        self.ph_bass = 0
+        self.ph_sub = 0
+        self.ph_pad = [0, 0, 0]
+        self.ph_key = 0
+        self.drums = DrumCache(sr, self.use_numpy)
+        self.envelopes = EnvelopeCache(self.use_numpy)
+
+    def render(self, n, v):
+        sr = self.sr
+        incs = {
+            "bass": phase_inc(v["bass_hz"], sr),
+            "sub": phase_inc(v["sub_hz"], sr),
+            "pad": [phase_inc(hz, sr) for hz in v["pad_hz"]],
+            "key": phase_inc(v["key_hz"], sr) if v["key_hz"] is not None else None,
+        }
+        if self.use_numpy:
+            out = self._encode_numpy(self._mix(self._voices_numpy(n, v, incs), n))
+        else:
+            out = self._encode_array(self._mix(self._voices_array(n, v, incs), n))
+        self._advance(n, incs)
+        return out
+
+    def _advance(self, n, incs):
+        self.ph_bass = (self.ph_bass + incs["bass"] * n) & PHASE_MASK
+        self.ph_sub = (self.ph_sub + incs["sub"] * n) & PHASE_MASK
+        for j in range(3):
+            self.ph_pad[j] = (self.ph_pad[j] + incs["pad"][j] * n) & PHASE_MASK
+        if incs["key"] is not None:
+            self.ph_key = (self.ph_key + incs["key"] * n) & PHASE_MASK
+
+    def _voices_numpy(self, n, v, incs):
+        # [(voice, samples)] for every voice that sounds in this step.
+        steps = np.arange(1, n + 1, dtype=np.uint64)
+        mask = np.uint64(PHASE_MASK)
+        shift = np.uint64(TABLE_SHIFT)
+        table = _SINE_NP
+
+        def phases(ph, inc):
+            return (np.uint64(ph) + np.uint64(inc) * steps) & mask
+
+        def osc(ph, inc):
+            return table[phases(ph, inc) >> shift]
+
+        bass = osc(self.ph_bass, incs["bass"]) * v["bass_gain"]
+        bass += osc(self.ph_sub, incs["sub"]) * v["sub_gain"]
+        bass *= self.envelopes.get(n, 1.08)
+        voices = [("bass", bass)]
+
+        pad_env = self.envelopes.get(n, v["pad_exp"]) * (v["pad_gain"] / 3.0)
+        if self.channels == 1:
+            pad = osc(self.ph_pad[0], incs["pad"][0])
+            pad += osc(self.ph_pad[1], incs["pad"][1])
+            pad += osc(self.ph_pad[2], incs["pad"][2])
+            pad *= pad_env
+            voices.append(("pad1", pad))
+        else:
+            for j in range(3):
+                voices.append((f"pad{j}", osc(self.ph_pad[j], incs["pad"][j]) * pad_env))
+
+        if incs["key"] is not None:
+            ph = phases(self.ph_key, incs["key"])
+            key = table[ph >> shift] + 0.45 * table[((ph << np.uint64(1)) & mask) >> shift]
+            voices.append(("key", key * (self.envelopes.get(n, 1.9) * v["key_gain"])))
+
+        for voice in DRUMS:
+            amp = v[voice + "_amp"]
+            if amp:
+                voices.append((voice, self.drums.get(voice, n)[:n] * amp))
+        return voices
+
+    def _voices_array(self, n, v, incs):
+        T = _SINE
+        M = PHASE_MASK
+        S = TABLE_SHIFT
+        rng = range(1, n + 1)
+
+        pb, ib, gb = self.ph_bass, incs["bass"], v["bass_gain"]
+        ps, is_, gs = self.ph_sub, incs["sub"], v["sub_gain"]
+        voices = [(
+            "bass",
+            [
+                (T[((pb + ib * i) & M) >> S] * gb + T[((ps + is_ * i) & M) >> S] * gs) * e
+                for i, e in zip(rng, self.envelopes.get(n, 1.08))
+            ],
+        )]
+
+        pad_env = self.envelopes.get(n, v["pad_exp"])
+        pg = v["pad_gain"] / 3.0
+        if self.channels == 1:
+            p0, p1, p2 = self.ph_pad
+            i0, i1, i2 = incs["pad"]
+            voices.append((
+                "pad1",
+                [
+                    (T[((p0 + i0 * i) & M) >> S] + T[((p1 + i1 * i) & M) >> S] + T[((p2 + i2 * i) & M) >> S]) * pg * e
+                    for i, e in zip(rng, pad_env)
+                ],
+            ))
+        else:
+            for j in range(3):
+                pp, ip = self.ph_pad[j], incs["pad"][j]
+                voices.append((f"pad{j}", [T[((pp + ip * i) & M) >> S] * pg * e for i, e in zip(rng, pad_env)]))
+
+        if incs["key"] is not None:
+            pk, ik, gk = self.ph_key, incs["key"], v["key_gain"]
+            voices.append((
+                "key",
+                [
+                    (T[((pk + ik * i) & M) >> S] + 0.45 * T[(((pk + ik * i) << 1) & M) >> S]) * gk * e
+                    for i, e in zip(rng, self.envelopes.get(n, 1.9))
+                ],
+            ))
+
+        for voice in DRUMS:
+            amp = v[voice + "_amp"]
+            if amp:
+                voices.append((voice, [d * amp for d in self.drums.get(voice, n)[:n]]))
+        return voices
+
+    def _mix(self, voices, n):
+        # Sums voices into one buffer per channel. Centred voices are added
+        # once and shared by both sides.
+        use_numpy = self.use_numpy
+
+        def add(acc, buf, gain=1.0):
+            if acc is None:
+                if gain == 1.0:
+                    return buf
+                return buf * gain if use_numpy else [x * gain for x in buf]
+            if use_numpy:
+                acc += buf * gain if gain != 1.0 else buf
+                return acc
+            if gain == 1.0:
+                return [a + x for a, x in zip(acc, buf)]
+            return [a + x * gain for a, x in zip(acc, buf)]
+
+        if self.channels == 1:
+            mix = None
+            for _voice, buf in voices:
+                mix = add(mix, buf)
+            return [mix]
+
+        center = left = right = None
+        for voice, buf in voices:
+            if VOICE_PAN[voice] == 0.0:
+                center = add(center, buf)
+            else:
+                gl, gr = PAN_GAINS[voice]
+                left = add(left, buf, gl)
+                right = add(right, buf, gr)
+        if left is None:
+            return [center, center]
+        return [add(left, center), add(right, center)]
+
+    def _encode_numpy(self, chans):
+        if len(chans) == 1:
+            mix = chans[0]
+        else:
+            mix = np.empty((len(chans[0]), len(chans)))
+            for c, buf in enumerate(chans):
+                mix[:, c] = buf
+        out = np.clip(np.tanh(mix * 1.35) * 0.72, -1.0, 1.0)
+        if self.sample == "f32":
+            return out.astype("<f4").tobytes()
+        return (out * 32767).astype("<i2").tobytes()
+
+    def _encode_array(self, chans):
+        tanh = math.tanh
+        if len(chans) == 1:
+            mix = chans[0]
+        else:
+            mix = [x for frame in zip(*chans) for x in frame]
+        if self.sample == "f32":
+            out = array("f", [tanh(m * 1.35) * 0.72 for m in mix])
+        else:
+            out = array("h", [int(tanh(m * 1.35) * 0.72 * 32767) for m in mix])
+        if sys.byteorder != "little":
+            out.byteswap()
+        return out.tobytes()
@@ -0,0 +1,127 @@
+import struct
+
+from audiofmt import AudioFormat
+from sampler import EMPTY_SNAPSHOT
+
+MAGIC = b"LLTR"
+VERSION = 3
+
+# magic, version, starting preset index, RNG seed and the audio format the
+# engine ran at (rate, channels, sample), then records led by a kind byte:
+# METRICS on each metrics change, with engine time in seconds and
+# cpu/ram/gpu/vram percentages, and COMMAND for each control command the
+# engine applied, with the engine frame it ran before. Values are stored
+# exactly so a replay feeds the engine bit-identical inputs; the format
+# matters too, since step boundaries fall on whole frames.
+HEADER = struct.Struct("<4sHHQIH4s")
+METRICS = struct.Struct("<c5d")
+COMMAND = struct.Struct("<cQBd")
+
+# Command codes, and the pause modes stored in a pause command's argument.
+COMMANDS = ("next", "prev", "set-preset", "set-tempo-bias", "pause")
+PAUSE_MODES = ("toggle", "on", "off")
+
+
+def _encode_arg(cmd, arg):
+    if cmd == "pause":
+        return float(PAUSE_MODES.index(arg))
+    return 0.0 if arg is None else float(arg)
+
+
+def _decode_arg(cmd, value):
+    if cmd == "pause":
+        return PAUSE_MODES[int(value)]
+    if cmd == "set-preset":
+        return int(value)
+    if cmd == "set-tempo-bias":
+        return value
+    return None
+
+
+def is_trace(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class TraceWriter:
+    def __init__(self, path, seed, preset_index, fmt):
+        self.f = open(path, "wb")
+        self.f.write(
+            HEADER.pack(MAGIC, VERSION, preset_index, seed, fmt.rate, fmt.channels, fmt.sample.encode("ascii"))
+        )
+        self.last = None
+
+    def record(self, t, snap):
+        # Only changes are stored; the sampler updates far less often than
+        # the engine steps.
+        vals = (snap.cpu, snap.ram, snap.gpu, snap.vram)
+        if vals == self.last:
+            return
+        self.last = vals
+        self.f.write(METRICS.pack(b"M", t, *vals))
+
+    def command(self, frame, cmd, arg):
+        self.f.write(COMMAND.pack(b"C", frame, COMMANDS.index(cmd), _encode_arg(cmd, arg)))
+
+    def close(self):
+        self.f.close()
+
+
+class TraceReader:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError(f"{path} is not a linuxlofi trace")
+        magic, version, self.preset_index, self.seed, rate, channels, sample = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a linuxlofi trace (version {version})")
+        self.format = AudioFormat(rate, channels, sample.rstrip(b"\0").decode("ascii"))
+        self.samples = []
+        self.commands = []
+        # A recording cut short can end in a partial record; drop it.
+        pos = HEADER.size
+        while pos < len(data):
+            kind = data[pos : pos + 1]
+            if kind == b"M" and pos + METRICS.size <= len(data):
+                _kind, t, cpu, ram, gpu, vram = METRICS.unpack_from(data, pos)
+                self.samples.append((t, EMPTY_SNAPSHOT._replace(cpu=cpu, ram=ram, gpu=gpu, vram=vram)))
+                pos += METRICS.size
+            elif kind == b"C" and pos + COMMAND.size <= len(data):
+                _kind, frame, code, value = COMMAND.unpack_from(data, pos)
+                if code >= len(COMMANDS):
+                    raise ValueError(f"unknown command {code} in trace {path}")
+                cmd = COMMANDS[code]
+                self.commands.append((frame, cmd, _decode_arg(cmd, value)))
+                pos += COMMAND.size
+            elif kind in (b"M", b"C"):
+                break
+            else:
+                raise ValueError(f"corrupt record at byte {pos} in trace {path}")
+        if not self.samples:
+            raise ValueError(f"no metrics in trace {path}")
+        self.length = self.samples[-1][0]
+        self.i = 0
+        self.j = 0
+
+    def at(self, t):
+        # Latest sample at or before engine time t; the first sample covers
+        # anything earlier, the last one anything after the recording.
+        samples = self.samples
+        if t < samples[self.i][0]:
+            self.i = 0
+        while self.i + 1 < len(samples) and samples[self.i + 1][0] <= t:
+            self.i += 1
+        return samples[self.i][1]
+
+    def commands_until(self, frame):
+        # The recorded (cmd, arg) pairs due at or before engine frame
+        # `frame` that haven't been returned yet, in recorded order.
+        commands = self.commands
+        start = self.j
+        while self.j < len(commands) and commands[self.j][0] <= frame:
+            self.j += 1
+        return [(cmd, arg) for _frame, cmd, arg in commands[start : self.j]]
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import socket
+import struct
+import sys
+import time
+from collections import deque
+
+import control
+from audiofmt import AudioFormat
+from statechan import StateReader
+
+DEFAULT_PORT = 4173
+WEBUI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "webui")
+MAX_HEADER = 8192
+IDLE_TIMEOUT = 15.0
+STATE_FRESH_SECONDS = 2.0
+METRICS_CACHE_SECONDS = 0.25
+STREAM_RETRY_SECONDS = 2.0
+STREAM_FALLBACK_SECONDS = 1.0
+STREAM_SNDBUF = 8192
+AUDIO_RING_SECONDS = 1.0
+AUDIO_CONNECT_TIMEOUT = 2.0
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".json": "application/json",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".ico": "image/x-icon",
+}
+COMPRESSIBLE = (".html", ".js", ".css", ".json", ".svg")
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    431: "Request Header Fields Too Large",
+    503: "Service Unavailable",
+}
+
+
+class StaticFile:
+    def __init__(self, body, content_type, gz=None):
+        self.body = body
+        self.gz = gz
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+
+
+def load_static(root):
+    # Every asset is read once at startup, along with a gzip copy for the
+    # text types: a prebuilt `<name>.gz` next to it when there is one,
+    # otherwise compressed here. Requests never touch the disk.
+    files = {}
+    root = os.path.realpath(root)
+    for dirpath, _dirs, names in os.walk(root):
+        for name in names:
+            if name.endswith(".gz"):
+                continue
+            path = os.path.join(dirpath, name)
+            ext = os.path.splitext(name)[1].lower()
+            with open(path, "rb") as f:
+                body = f.read()
+            gz = None
+            if ext in COMPRESSIBLE:
+                if os.path.exists(path + ".gz"):
+                    with open(path + ".gz", "rb") as f:
+                        gz = f.read()
+                else:
+                    gz = gzip.compress(body, 9, mtime=0)
+                if len(gz) >= len(body):
+                    gz = None
+            url = "/" + os.path.relpath(path, root).replace(os.sep, "/")
+            files[url] = StaticFile(body, CONTENT_TYPES.get(ext, "application/octet-stream"), gz)
+    if "/index.html" in files:
+        files["/"] = files["/index.html"]
+    return files
+
+
+# /api/metrics body, rebuilt at most every METRICS_CACHE_SECONDS no matter
+# how many clients poll. The music daemon's state channel is used while it
+# is running, so the web UI adds no /proc reads of its own; otherwise a
+# MetricsSampler is started on first use.
+class MetricsCache:
+    def __init__(self):
+        self.state = StateReader()
+        self.sampler = None
+        self.body = None
+        self.built_at = 0.0
+
+    def _daemon_metrics(self):
+        data, _changed = self.state.read()
+        if data is None or time.monotonic() - data.get("ts", 0.0) > STATE_FRESH_SECONDS:
+            return None
+        out = {key: data[key] for key in ("cpu", "ram", "gpu", "vram", "tempo", "preset")}
+        out["source"] = "daemon"
+        return out
+
+    def _sampler_metrics(self):
+        if self.sampler is None:
+            import fractal_music
+
+            self.sampler = fractal_music.make_sampler()
+            self.sampler.prime("ram")
+            self.sampler.start()
+        snap = self.sampler.snapshot
+        return {"cpu": snap.cpu, "ram": snap.ram, "gpu": snap.gpu, "vram": snap.vram, "source": "sampler"}
+
+    def get(self):
+        now = time.monotonic()
+        if self.body is None or now - self.built_at >= METRICS_CACHE_SECONDS:
+            metrics = self._daemon_metrics() or self._sampler_metrics()
+            self.body = json.dumps(metrics, separators=(",", ":")).encode("utf-8")
+            self.built_at = now
+        return self.body
+
+    def close(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+
+
+# Fans the music daemon's state out to /api/stream subscribers as
+# Server-Sent Events, at the step rate. The daemon already serializes each
+# update once for its control socket subscribers; the hub frames that line
+# once and every client is sent the same bytes. A client only ever holds the
+# newest frame: while it is still draining an older one, new frames just
+# replace it, so slow clients skip updates instead of queueing them. Without
+# a daemon the stream carries the /api/metrics body once a second.
+class StateHub:
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.frame = None
+        self.version = 0
+        self.cond = asyncio.Condition()
+        self.clients = 0
+        self.task = None
+
+    async def publish(self, data):
+        self.frame = b"data: " + data + b"\n\n"
+        self.version += 1
+        async with self.cond:
+            self.cond.notify_all()
+
+    async def _follow_daemon(self):
+        try:
+            reader, writer = await asyncio.open_unix_connection(control.socket_path())
+        except OSError:
+            return
+        try:
+            writer.write(b"subscribe\n")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b"{"):
+                    await self.publish(line.rstrip(b"\n"))
+        except (OSError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._follow_daemon()
+            retry_at = loop.time() + STREAM_RETRY_SECONDS
+            while loop.time() < retry_at:
+                await self.publish(self.metrics.get())
+                await asyncio.sleep(STREAM_FALLBACK_SECONDS)
+
+    async def stream(self, writer):
+        # Runs for one subscriber until it disconnects. The feed task only
+        # runs while someone is listening.
+        self.clients += 1
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        seen = 0
+        try:
+            while True:
+                async with self.cond:
+                    await self.cond.wait_for(lambda: self.version != seen)
+                seen = self.version
+                writer.write(self.frame)
+                await writer.drain()
+        finally:
+            self.clients -= 1
+            if not self.clients and self.task is not None:
+                self.task.cancel()
+                self.task = None
+
+
+def wav_header(fmt):
+    # Streaming WAV: the RIFF and data sizes are left at their maximum since
+    # the length isn't known.
+    tag, bits = (3, 32) if fmt.sample == "f32" else (1, 16)
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, tag, fmt.channels, fmt.rate, fmt.bytes_per_sec, fmt.frame_bytes, bits)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+
+class AudioListener:
+    def __init__(self, limit):
+        self.blocks = deque()
+        self.size = 0
+        self.limit = limit
+        self.drops = 0
+        self.ready = asyncio.Event()
+
+    def push(self, block):
+        # Oldest blocks go first when the listener is more than `limit`
+        # bytes behind.
+        self.blocks.append(block)
+        self.size += len(block)
+        while self.size > self.limit and len(self.blocks) > 1:
+            self.size -= len(self.blocks.popleft())
+            self.drops += 1
+        self.ready.set()
+
+
+# "Listen along": one audio connection to the daemon's control socket, shared
+# by every browser on /api/audio.wav. The daemon renders once and sends one
+# copy here; each listener gets the same frame-aligned blocks through its
+# own ring of AUDIO_RING_SECONDS. The upstream is only open while someone is
+# listening.
+class AudioRelay:
+    def __init__(self):
+        self.listeners = set()
+        self.format = None
+        self.task = None
+        self.lock = asyncio.Lock()
+
+    async def open(self):
+        # A new listener attached to the relay, or None when no daemon is
+        # playing. Attaching here, under the lock, keeps the relay from
+        # being torn down between open() and stream().
+        async with self.lock:
+            # A relay that is finishing (its last listener just left) is
+            # not reused; it would end right after this listener attached.
+            if self.task is None or self.task.done():
+                self.task = None
+                if not await self._connect():
+                    return None
+            listener = AudioListener(int(self.format.bytes_per_sec * AUDIO_RING_SECONDS))
+            self.listeners.add(listener)
+            return listener
+
+    async def _connect(self):
+        # Opens the daemon's audio stream and starts the relay task.
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(control.socket_path()), AUDIO_CONNECT_TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        try:
+            writer.write(b"audio\n")
+            reply = await asyncio.wait_for(reader.readline(), AUDIO_CONNECT_TIMEOUT)
+            self.format = AudioFormat(**json.loads(reply[3:])) if reply.startswith(b"ok ") else None
+        except (OSError, ValueError, TypeError, asyncio.TimeoutError):
+            self.format = None
+        if self.format is None:
+            writer.close()
+            return False
+        self.task = asyncio.create_task(self._pump(reader, writer))
+        return True
+
+    async def _pump(self, reader, writer):
+        frame = self.format.frame_bytes
+        rest = b""
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                if rest:
+                    data = rest + data
+                cut = len(data) - len(data) % frame
+                block, rest = data[:cut], data[cut:]
+                if block:
+                    for listener in self.listeners:
+                        listener.push(block)
+        except OSError:
+            pass
+        finally:
+            writer.close()
+            if self.task is asyncio.current_task():
+                self.task = None
+                for listener in self.listeners:
+                    listener.ready.set()
+
+    async def stream(self, listener, writer):
+        try:
+            while self.task is not None or listener.blocks:
+                await listener.ready.wait()
+                listener.ready.clear()
+                while listener.blocks:
+                    block = listener.blocks.popleft()
+                    listener.size -= len(block)
+                    writer.write(block)
+                    await writer.drain()
+        finally:
+            self.leave(listener)
+
+    def leave(self, listener):
+        self.listeners.discard(listener)
+        if not self.listeners and self.task is not None:
+            # Detach right away so the next open() starts a new relay
+            # instead of joining this one while it is cancelled.
+            self.task.cancel()
+            self.task = None
+
+
+# Minimal HTTP/1.1 server for the web UI: GET/HEAD only, keep-alive by
+# default, one coroutine per connection. /api/stream and /api/audio.wav
+# turn the connection into an endless response until the client goes away.
+class WebServer:
+    def __init__(self, root=WEBUI_DIR):
+        self.files = load_static(root)
+        self.metrics = MetricsCache()
+        self.hub = StateHub(self.metrics)
+        self.audio = AudioRelay()
+        self.routes = {"/api/metrics": self._api_metrics}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    writer.write(self._response(431, b"", "text/plain", keep_alive=False))
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                request = self._parse(head)
+                if request is None:
+                    writer.write(self._response(400, b"", "text/plain", keep_alive=False))
+                    break
+                method, path, headers, keep_alive = request
+                if path == "/api/stream" and method == "GET":
+                    # Keep the socket and transport buffers to a few frames so
+                    # a slow client falls behind by dropping, not queueing.
+                    sock = writer.get_extra_info("socket")
+                    if sock is not None:
+                        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, STREAM_SNDBUF)
+                    writer.transport.set_write_buffer_limits(high=0)
+                    writer.write(self._event_stream_head())
+                    await self._until_closed(reader, self.hub.stream(writer))
+                    break
+                if path == "/api/audio.wav" and method == "GET":
+                    listener = await self.audio.open()
+                    if listener is None:
+                        writer.write(self._response(503, b"music daemon is not playing\n", "text/plain", False))
+                        break
+                    try:
+                        writer.write(self._audio_head() + wav_header(self.audio.format))
+                        await self._until_closed(reader, self.audio.stream(listener, writer))
+                    finally:
+                        self.audio.leave(listener)
+                    break
+                writer.write(self._dispatch(method, path, headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _parse(self, head):
+        try:
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        conn = headers.get("connection", "").lower()
+        keep_alive = conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+        return method, target.split("?", 1)[0], headers, keep_alive
+
+    async def _until_closed(self, reader, coro):
+        # Runs a stream coroutine for one client. The client sends nothing
+        # after the request, so EOF on the read side means it went away even
+        # when nothing is being written.
+        stream = asyncio.ensure_future(coro)
+        eof = asyncio.ensure_future(reader.read())
+        try:
+            await asyncio.wait((stream, eof), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stream.cancel()
+            eof.cancel()
+            await asyncio.gather(stream, eof, return_exceptions=True)
+
+    def _dispatch(self, method, path, headers, keep_alive):
+        if method not in ("GET", "HEAD"):
+            return self._response(405, b"", "text/plain", keep_alive, extra=("Allow: GET, HEAD",))
+        route = self.routes.get(path)
+        if route is not None:
+            status, body, ctype, extra = route()
+        else:
+            status, body, ctype, extra = self._static(path, headers)
+        return self._response(status, body, ctype, keep_alive, extra, head_only=method == "HEAD")
+
+    def _api_metrics(self):
+        return 200, self.metrics.get(), "application/json", ("Cache-Control: no-store",)
+
+    def _event_stream_head(self):
+        return (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream\r\n"
+            "Cache-Control: no-store\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+            "retry: 2000\n\n"
+        ).encode("latin-1")
+
+    def _audio_head(self):
+        return (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: audio/wav\r\n"
+            "Cache-Control: no-store\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+        ).encode("latin-1")
+
+    def _static(self, path, headers):
+        entry = self.files.get(path)
+        if entry is None:
+            return 404, b"not found\n", "text/plain", ()
+        extra = ["Cache-Control: no-cache", "ETag: " + entry.etag]
+        if entry.gz is not None:
+            extra.append("Vary: Accept-Encoding")
+        if headers.get("if-none-match") == entry.etag:
+            return 304, b"", entry.content_type, tuple(extra)
+        if entry.gz is not None and "gzip" in headers.get("accept-encoding", ""):
+            extra.append("Content-Encoding: gzip")
+            return 200, entry.gz, entry.content_type, tuple(extra)
+        return 200, entry.body, entry.content_type, tuple(extra)
+
+    def _response(self, status, body, ctype, keep_alive, extra=(), head_only=False):
+        lines = [
+            f"HTTP/1.1 {status} {REASONS[status]}",
+            "Content-Type: " + ctype,
+            f"Content-Length: {len(body)}",
+            "Connection: " + ("keep-alive" if keep_alive else "close"),
+        ]
+        lines.extend(extra)
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        if head_only or status == 304:
+            return head
+        return head + body
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER, backlog=512)
+        async with server:
+            await server.serve_forever()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="linuxlofi web UI server")
+    parser.add_argument("port", nargs="?", type=int, default=DEFAULT_PORT, help=f"port (default {DEFAULT_PORT})")
+    parser.add_argument("--bind", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("--root", default=WEBUI_DIR, help="directory with the web UI assets")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = WebServer(args.root)
+    print(f"[linuxlofi] web UI at http://{args.bind}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.bind, args.port))
+    except KeyboardInterrupt:
+        pass
+    except OSError as exc:
+        print(f"[linuxlofi] {exc}", file=sys.stderr)
+        return 1
+    finally:
+        server.metrics.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
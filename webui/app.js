@@ -30,6 +30,11 @@ const state = {
   baseTempo: 96,
   liveTempo: 96,
   liveMetrics: null,
+  metricsAt: 0,
+  metricsSource: null,
+  levels: null,
+  levelFrame: 0,
+  listenAudio: null,
   stepsPerBar: 16,
   scheduleAheadTime: 0.12,
   lookaheadMs: 25
@@ -56,10 +61,12 @@ const ui = {
   insHat: document.getElementById("insHat"),
   adaptiveBpm: document.getElementById("adaptiveBpm"),
   perfReadout: document.getElementById("perfReadout"),
+  levelMeter: document.getElementById("levelMeter"),
   initAudio: document.getElementById("initAudio"),
   generate: document.getElementById("generate"),
   play: document.getElementById("play"),
   stop: document.getElementById("stop"),
+  listen: document.getElementById("listen"),
   status: document.getElementById("status"),
   patternView: document.getElementById("patternView")
 };
@@ -119,22 +126,51 @@ function metricsToTempo(baseTempo, metrics) {
   return clamp(baseTempo + delta, 54, 128);
 }
 
+function drawLevels() {
+  state.levelFrame = 0;
+  const bars = ui.levelMeter.children;
+  for (let i = 0; i < bars.length; i++) {
+    const v = state.levels ? clamp(state.levels[i] || 0, 0.04, 1) : 0.04;
+    bars[i].style.transform = `scaleY(${v.toFixed(3)})`;
+  }
+}
+
+function applyMetrics(metrics) {
+  // Metrics arrive once a second from /api/metrics or at the step rate from
+  // /api/stream; smoothing by elapsed time keeps the tempo glide the same.
+  const now = performance.now();
+  const dt = state.metricsAt ? Math.min(2, (now - state.metricsAt) / 1000) : 1;
+  state.metricsAt = now;
+  state.liveMetrics = metrics;
+  const targetTempo = metricsToTempo(state.baseTempo, metrics);
+  state.liveTempo += (1 - Math.exp(-dt / 4.5)) * (targetTempo - state.liveTempo);
+  state.liveTempo = clamp(state.liveTempo, 54, 128);
+  const rounded = String(Math.round(state.liveTempo));
+  if (ui.tempo.value !== rounded) {
+    ui.tempo.value = rounded;
+    ui.tempoValue.textContent = rounded;
+  }
+  updatePerfReadout();
+  if (Array.isArray(metrics.levels)) {
+    state.levels = metrics.levels;
+    if (!state.levelFrame) state.levelFrame = requestAnimationFrame(drawLevels);
+  }
+}
+
+function dropMetrics() {
+  state.liveMetrics = null;
+  state.metricsAt = 0;
+  state.liveTempo += 0.1 * (state.baseTempo - state.liveTempo);
+  updatePerfReadout();
+}
+
 async function fetchMetricsAndUpdateTempo() {
   try {
     const res = await fetch("/api/metrics", { cache: "no-store" });
     if (!res.ok) throw new Error(`metrics HTTP ${res.status}`);
-    const metrics = await res.json();
-    state.liveMetrics = metrics;
-    const targetTempo = metricsToTempo(state.baseTempo, metrics);
-    state.liveTempo += 0.2 * (targetTempo - state.liveTempo);
-    state.liveTempo = clamp(state.liveTempo, 54, 128);
-    ui.tempo.value = String(Math.round(state.liveTempo));
-    ui.tempoValue.textContent = ui.tempo.value;
-    updatePerfReadout();
+    applyMetrics(await res.json());
   } catch (_err) {
-    state.liveMetrics = null;
-    state.liveTempo += 0.1 * (state.baseTempo - state.liveTempo);
-    updatePerfReadout();
+    dropMetrics();
   }
 }
 
@@ -143,17 +179,52 @@ function stopAdaptiveTempo() {
     clearInterval(state.adaptiveTimerId);
     state.adaptiveTimerId = null;
   }
+  if (state.metricsSource) {
+    state.metricsSource.close();
+    state.metricsSource = null;
+  }
   state.liveMetrics = null;
+  state.metricsAt = 0;
+  state.levels = null;
   state.liveTempo = state.baseTempo;
+  drawLevels();
   updatePerfReadout();
 }
 
 function startAdaptiveTempo() {
   stopAdaptiveTempo();
+  // Prefer the server's push stream; fall back to polling when the browser
+  // or the server (plain http.server) can't do it.
+  if (window.EventSource) {
+    const source = new EventSource("/api/stream");
+    source.onmessage = (event) => {
+      try {
+        applyMetrics(JSON.parse(event.data));
+      } catch (_err) {
+        // Ignore a malformed frame; the next one replaces it.
+      }
+    };
+    source.onerror = () => {
+      if (source.readyState !== EventSource.CLOSED) {
+        dropMetrics();
+        return;
+      }
+      state.metricsSource = null;
+      state.adaptiveTimerId = setInterval(fetchMetricsAndUpdateTempo, 1000);
+    };
+    state.metricsSource = source;
+    return;
+  }
   state.adaptiveTimerId = setInterval(fetchMetricsAndUpdateTempo, 1000);
   fetchMetricsAndUpdateTempo();
 }
 
+function buildLevelMeter() {
+  for (let i = 0; i < 8; i++) {
+    ui.levelMeter.appendChild(document.createElement("span"));
+  }
+}
+
 function midiToFreq(midi) {
   return 440 * Math.pow(2, (midi - 69) / 12);
 }
@@ -691,6 +762,7 @@ function startPlayback() {
     generateFromUI();
   }
   if (state.isPlaying) return;
+  stopListening("Stopped listening.");
 
   if (state.audioCtx.state === "suspended") {
     state.audioCtx.resume();
@@ -712,6 +784,33 @@ function stopPlayback() {
   setStatus("Stopped.");
 }
 
+function stopListening(message) {
+  if (!state.listenAudio) return;
+  state.listenAudio.pause();
+  state.listenAudio.removeAttribute("src");
+  state.listenAudio.load();
+  state.listenAudio = null;
+  ui.listen.textContent = "Listen Along";
+  setStatus(message);
+}
+
+function toggleListening() {
+  // Plays the terminal daemon's own output, streamed by linuxlofi-webui,
+  // instead of synthesizing in the browser.
+  if (state.listenAudio) {
+    stopListening("Stopped listening.");
+    return;
+  }
+  stopPlayback();
+  const audio = new Audio("/api/audio.wav");
+  audio.addEventListener("error", () => stopListening("Music daemon audio is unavailable."));
+  state.listenAudio = audio;
+  ui.listen.textContent = "Stop Listening";
+  audio.play()
+    .then(() => setStatus("Listening along to the music daemon."))
+    .catch((err) => stopListening(`Listen failed: ${err.message}`));
+}
+
 function wireUI() {
   const bindLiveValue = (input, output) => {
     const update = () => {
@@ -748,6 +847,14 @@ function wireUI() {
     }
   });
 
+  ui.adaptiveBpm.addEventListener("change", () => {
+    if (ui.adaptiveBpm.checked) {
+      startAdaptiveTempo();
+    } else {
+      stopAdaptiveTempo();
+    }
+  });
+
   ui.generate.addEventListener("click", () => {
     generateFromUI();
   });
@@ -759,9 +866,14 @@ function wireUI() {
   ui.stop.addEventListener("click", () => {
     stopPlayback();
   });
+
+  ui.listen.addEventListener("click", () => {
+    toggleListening();
+  });
 }
 
 populatePresets();
+buildLevelMeter();
 applyPreset(PRESETS[0]);
 wireUI();
 generateFromUI();